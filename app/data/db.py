@@ -1,14 +1,73 @@
 # -*- coding: utf-8 -*-
 import sqlite3
 import os
+import base64
+import binascii
 import hashlib
 import hmac
 import secrets
+import threading
 import time
-from typing import Optional, List, Tuple
+import itertools
+import json
+import logging
+import queue
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, List, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "inventario_app.db")
-_conn: Optional[sqlite3.Connection] = None
+# Máximo de conexiones abiertas a la vez (una por hilo activo)
+POOL_SIZE = int(os.environ.get("APP_DB_POOL_SIZE", "8"))
+# Segundos que espera un hilo cuando todas las conexiones están ocupadas
+POOL_TIMEOUT = float(os.environ.get("APP_DB_POOL_TIMEOUT", "10"))
+# Segundos entre comprobaciones de salud de una conexión ya asignada
+HEALTH_CHECK_INTERVAL = 30.0
+_pool: Optional["ConnectionPool"] = None
+_pool_lock = threading.Lock()
+_memory_ids = itertools.count(1)
+_pool_generations = itertools.count(1)
+# Versión del esquema; se guarda en PRAGMA user_version tras migrar
+SCHEMA_VERSION = 26
+# Perfiles de rendimiento de SQLite aplicados a cada conexión
+PERFORMANCE_PROFILES: dict[str, dict[str, object]] = {
+    "desktop": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "server": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 15000,
+    },
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -256000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+DEFAULT_PROFILE = "desktop"
+# Ventana de agrupación (segundos) y tamaño máximo de lote del escritor
+WRITER_WINDOW = float(os.environ.get("APP_DB_WRITER_WINDOW", "0.005"))
+WRITER_MAX_BATCH = 500
+_writer: Optional["GroupCommitWriter"] = None
+# Estado por hilo: profundidad de escrituras anidadas en curso
+_write_state = threading.local()
+
+T = TypeVar("T")
 
 
 def hash_password(password: str, salt: bytes | None = None) -> Tuple[str, str]:
@@ -35,21 +94,541 @@ def verify_password(password: str, password_hash: str, salt: str) -> bool:
     new_hash, _ = hash_password(password, bytes.fromhex(salt))
     return hmac.compare_digest(new_hash, password_hash)
 
+
+def _apply_pragmas(conn: sqlite3.Connection, profile: str | None = None) -> bool:
+    """Apply the connection settings shared by every pooled connection.
+
+    ``profile`` names an entry of :data:`PERFORMANCE_PROFILES`. The journal
+    mode is left untouched while a transaction is open, since SQLite refuses
+    to switch it there. Returns False when the journal mode could not be
+    set, so the caller applies the profile again later.
+    """
+    conn.execute("PRAGMA foreign_keys = ON")
+    if profile is None:
+        return True
+    complete = True
+    for pragma, value in PERFORMANCE_PROFILES[profile].items():
+        if pragma == "journal_mode":
+            if conn.in_transaction:
+                complete = False
+                continue
+            try:
+                conn.execute(f"PRAGMA journal_mode = {value}").fetchone()
+            except sqlite3.OperationalError as exc:
+                logger.warning("Could not set journal_mode = %s: %s", value, exc)
+                complete = False
+            continue
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return complete
+
+
+def _resolve_profile(conn: sqlite3.Connection) -> str:
+    """Return the profile selected by APP_DB_PROFILE or the config table."""
+    name = os.environ.get("APP_DB_PROFILE")
+    if not name:
+        row = conn.execute(
+            "SELECT valor FROM config WHERE clave = 'db_profile' AND sucursal_id IS NULL"
+        ).fetchone()
+        name = row[0] if row else DEFAULT_PROFILE
+    return name if name in PERFORMANCE_PROFILES else DEFAULT_PROFILE
+
+
+class ConnectionPool:
+    """Pool of SQLite connections handed out per thread.
+
+    Each thread gets its own connection the first time it touches the
+    database and keeps it until it calls :meth:`release` or finishes. At most
+    ``size`` connections are open at once; connections left behind by
+    finished threads are recycled for new ones. ``:memory:`` databases use a
+    named shared-cache URI so every thread sees the same data.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._uri = False
+        if path == ":memory:":
+            self.path = f"file:app_mateo_mem_{next(_memory_ids)}?mode=memory&cache=shared"
+            self._uri = True
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._owners: dict[sqlite3.Connection, threading.Thread] = {}
+        self._idle: List[sqlite3.Connection] = []
+        self._closed = False
+        self.generation = next(_pool_generations)
+        self.profile = DEFAULT_PROFILE
+        # Perfil aplicado a cada conexión; se reaplica solo si cambia
+        self._applied: dict[sqlite3.Connection, str] = {}
+        # Keeps a shared in-memory database alive while the pool is open
+        self._keepalive: Optional[sqlite3.Connection] = None
+        if self._uri:
+            self._keepalive = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            uri=self._uri,
+        )
+        self._prepare(conn)
+        return conn
+
+    def _prepare(self, conn: sqlite3.Connection) -> None:
+        """Apply the current profile to ``conn`` unless it already has it."""
+        if self._applied.get(conn) != self.profile and _apply_pragmas(conn, self.profile):
+            self._applied[conn] = self.profile
+
+    def set_profile(self, name: str) -> None:
+        """Switch the performance profile; connections pick it up on next use."""
+        if name not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown database profile: {name}")
+        self.profile = name
+
+    def _is_healthy(self, conn: sqlite3.Connection, *, reset: bool = True) -> bool:
+        try:
+            if conn.in_transaction:
+                if not reset:
+                    return True
+                conn.rollback()
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        self._owners.pop(conn, None)
+        self._applied.pop(conn, None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _reclaim_dead(self) -> None:
+        """Move connections owned by finished threads back to the idle list."""
+        for conn, owner in list(self._owners.items()):
+            if not owner.is_alive():
+                del self._owners[conn]
+                self._idle.append(conn)
+
+    def acquire(self) -> sqlite3.Connection:
+        """Return the connection assigned to the calling thread."""
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._prepare(conn)
+            if time.monotonic() - self._local.checked < HEALTH_CHECK_INTERVAL:
+                return conn
+            with self._cond:
+                if self._is_healthy(conn, reset=False):
+                    self._local.checked = time.monotonic()
+                    return conn
+                self._discard(conn)
+                self._local.conn = None
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Cannot operate on a closed database pool.")
+                if not self._idle and len(self._owners) >= self.size:
+                    self._reclaim_dead()
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._is_healthy(candidate):
+                        conn = candidate
+                        self._prepare(conn)
+                        break
+                    self._discard(candidate)
+                if conn is None and len(self._owners) < self.size:
+                    conn = self._connect()
+                if conn is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"Connection pool exhausted ({self.size} connections in use)"
+                    )
+                self._cond.wait(min(remaining, 0.05))
+            self._owners[conn] = threading.current_thread()
+        self._local.conn = conn
+        self._local.checked = time.monotonic()
+        return conn
+
+    def holds_connection(self) -> bool:
+        """Whether the calling thread currently has a connection checked out."""
+        return getattr(self._local, "conn", None) is not None
+
+    def release(self) -> None:
+        """Return the calling thread's connection to the pool."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._cond:
+            if self._owners.pop(conn, None) is None or self._closed:
+                return
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of connections in use and idle."""
+        with self._cond:
+            return {"size": self.size, "in_use": len(self._owners), "idle": len(self._idle)}
+
+    def close(self) -> None:
+        """Close every connection, including those owned by other threads."""
+        with self._cond:
+            self._closed = True
+            for conn in list(self._owners) + self._idle:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._owners.clear()
+            self._idle.clear()
+            self._applied.clear()
+            if self._keepalive is not None:
+                self._keepalive.close()
+                self._keepalive = None
+            self._cond.notify_all()
+
+
+class WriteResult(NamedTuple):
+    lastrowid: Optional[int]
+    rowcount: int
+
+
+class GroupCommitWriter:
+    """Single writer thread that commits queued mutations in batches.
+
+    Every job that arrives within ``window`` seconds of the first job of a
+    batch (up to ``max_batch`` jobs) runs in the same transaction, each inside
+    its own savepoint so a failing job does not discard the others. Callers
+    receive a :class:`~concurrent.futures.Future` that resolves once the
+    batch has been committed.
+    """
+
+    def __init__(self, window: float = WRITER_WINDOW, max_batch: int = WRITER_MAX_BATCH):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Optional[Tuple[Callable[[sqlite3.Connection], object], Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def is_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, op: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        """Queue ``op`` to run on the writer connection."""
+        future: Future = Future()
+        with self._lock:
+            if self._stopping:
+                raise RuntimeError("The database writer has been stopped")
+            self._queue.put((op, future))
+        return future
+
+    def stop(self) -> None:
+        """Commit every queued job and stop the writer thread."""
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first) -> Tuple[list, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _commit_batch(self, batch: list) -> None:
+        conn = _ensure_conn()
+        results: list = []
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute("BEGIN")
+            for op, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    value = op(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write_job")
+                    results.append((future, None, exc))
+                else:
+                    results.append((future, value, None))
+                conn.execute("RELEASE write_job")
+            conn.commit()
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for _op, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for future, value, exc in results:
+            if exc is None:
+                future.set_result(value)
+            else:
+                future.set_exception(exc)
+        _after_commit()
+
+    def _run(self) -> None:
+        # Las escrituras anidadas dentro de un trabajo se ejecutan en línea
+        _write_state.depth = 1
+        stop = False
+        try:
+            while not stop:
+                job = self._queue.get()
+                if job is None:
+                    break
+                batch, stop = self._collect(job)
+                self._commit_batch(batch)
+        finally:
+            _write_state.depth = 0
+            release_conn()
+
+
+def start_writer(window: float = WRITER_WINDOW, max_batch: int = WRITER_MAX_BATCH) -> None:
+    """Route mutations through a single group-commit writer thread.
+
+    Writes arriving from any thread within ``window`` seconds share one
+    transaction, so bursts of small inserts cost a single fsync.
+    """
+    global _writer
+    if _writer is None:
+        _writer = GroupCommitWriter(window, max_batch)
+
+
+def stop_writer() -> None:
+    """Flush pending writes and return to committing on the caller's thread."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def flush_writes() -> None:
+    """Block until every write queued so far has been committed."""
+    writer = _writer
+    if writer is not None and not writer.is_writer_thread():
+        writer.submit(lambda conn: None).result()
+
+
+def _run_write(op: Callable[[sqlite3.Connection], T], *, wait: bool = True) -> Optional[T]:
+    """Run a mutation and commit it.
+
+    With the group-commit writer active the operation is queued and, unless
+    ``wait`` is false, the caller blocks until its batch is committed; errors
+    of writes nobody waits for are logged. Nested calls (a mutation invoked
+    from inside another) run in line inside a savepoint and are committed
+    together with the outermost one; if they raise, their partial writes are
+    undone before the error propagates.
+    """
+    writer = _writer
+    if getattr(_write_state, "depth", 0) == 0 and writer is not None and not writer.is_writer_thread():
+        future = writer.submit(op)
+        if wait:
+            return future.result()
+        future.add_done_callback(_log_write_failure)
+        return None
+    conn = _ensure_conn()
+    depth = getattr(_write_state, "depth", 0)
+    if depth:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        name = f"nested_write_{depth}"
+        conn.execute(f"SAVEPOINT {name}")
+        _write_state.depth = depth + 1
+        try:
+            result = op(conn)
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        else:
+            conn.execute(f"RELEASE {name}")
+        finally:
+            _write_state.depth = depth
+        return result
+    _write_state.depth = 1
+    try:
+        result = op(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _write_state.depth = 0
+    _after_commit()
+    return result
+
+
+def _log_write_failure(future: Future) -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.exception("Queued write failed", exc_info=exc)
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run several db calls as a single unit of work.
+
+    Mutations made inside the block skip their own commit; everything is
+    committed once when the block exits and rolled back if it raises. Nested
+    blocks use savepoints, so an inner failure can be caught without losing
+    the outer work. The block runs on the calling thread's connection even
+    when the group-commit writer is active.
+    """
+    conn = _ensure_conn()
+    depth = getattr(_write_state, "depth", 0)
+    if depth:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        name = f"unit_of_work_{depth}"
+        conn.execute(f"SAVEPOINT {name}")
+        _write_state.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        else:
+            conn.execute(f"RELEASE {name}")
+        finally:
+            _write_state.depth = depth
+        return
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    _write_state.depth = 1
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _write_state.depth = 0
+    _after_commit()
+
+
+@contextmanager
+def read_only() -> Iterator[sqlite3.Connection]:
+    """Run reads on the calling thread's connection with writes refused.
+
+    Every query in the block sees the same snapshot of the database. If the
+    thread had no connection before, the one taken for the block goes back
+    to the pool afterwards, so this suits worker threads such as exports.
+    """
+    held = holds_connection()
+    conn = _ensure_conn()
+    if conn.in_transaction:
+        raise sqlite3.ProgrammingError("read_only() cannot run inside a transaction")
+    conn.execute("PRAGMA query_only = ON")
+    try:
+        conn.execute("BEGIN")
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("PRAGMA query_only = OFF")
+        if not held:
+            release_conn()
+
+
+def _statement(sql: str, params=()) -> Callable[[sqlite3.Connection], WriteResult]:
+    def op(conn: sqlite3.Connection) -> WriteResult:
+        cur = conn.execute(sql, params)
+        return WriteResult(cur.lastrowid, cur.rowcount)
+
+    return op
+
+
+def _execute_write(sql: str, params=(), *, wait: bool = True) -> Optional[WriteResult]:
+    """Execute a single mutating statement through :func:`_run_write`."""
+    return _run_write(_statement(sql, params), wait=wait)
+
+
+def submit_write(sql: str, params=()) -> "Future[WriteResult]":
+    """Queue a mutating statement and return a future with its result.
+
+    Without the writer thread the statement runs immediately and the returned
+    future is already resolved.
+    """
+    writer = _writer
+    if writer is not None and not writer.is_writer_thread() and not getattr(_write_state, "depth", 0):
+        return writer.submit(_statement(sql, params))
+    future: Future = Future()
+    try:
+        future.set_result(_execute_write(sql, params))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
 def _ensure_conn() -> sqlite3.Connection:
-    global _conn
-    if _conn is None:
-        _conn = sqlite3.connect(DB_PATH)
-        _conn.execute("PRAGMA foreign_keys = ON")
-        _create_tables(_conn)
-    return _conn
+    pool = _pool
+    if pool is None:
+        pool = _open_pool()
+    return pool.acquire()
+
+
+def _open_pool(size: int | None = None) -> "ConnectionPool":
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(DB_PATH, size if size is not None else POOL_SIZE)
+            try:
+                conn = pool.acquire()
+                _ensure_schema(conn)
+                pool.set_profile(_resolve_profile(conn))
+            except BaseException:
+                pool.close()
+                raise
+            _pool = pool
+        return _pool
+
+
+def holds_connection() -> bool:
+    """Return whether the current thread has a pooled connection checked out."""
+    return _pool is not None and _pool.holds_connection()
+
+
+def release_conn() -> None:
+    """Return the current thread's connection to the pool.
+
+    Worker threads (report timer, portal requests) should call this when they
+    finish so another thread can reuse the connection right away.
+    """
+    if _pool is not None:
+        _pool.release()
 
 
 def close_db() -> None:
-    """Close the global database connection if it exists."""
-    global _conn
-    if _conn is not None:
-        _conn.close()
-        _conn = None
+    """Stop the writer thread and close every pooled database connection."""
+    global _pool
+    stop_writer()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
 
 def _create_tables(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
@@ -287,12 +866,11 @@ def _create_tables(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    # Tablas con una carga masiva en curso (ver _bulk_load). La fila solo
+    # existe dentro de esa transacción, así que las demás conexiones no la ven
+    cur.execute("CREATE TABLE IF NOT EXISTS bulk_load (tabla TEXT PRIMARY KEY)")
 
-    # Índices
-    try:
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes(nombre)")
-    except sqlite3.OperationalError:
-        pass
+    # Índices (la búsqueda por nombre de cliente usa idx_clientes_nombre_unique)
     try:
         cur.execute("CREATE INDEX IF NOT EXISTS idx_dispositivos_cliente ON dispositivos(cliente_id)")
     except sqlite3.OperationalError:
@@ -318,7 +896,7 @@ def _create_tables(conn: sqlite3.Connection) -> None:
     except sqlite3.OperationalError:
         pass
 
-    conn.commit()
+    _commit(conn)
 
 
 def _ensure_stock_min_column(conn: sqlite3.Connection) -> None:
@@ -331,7 +909,7 @@ def _ensure_stock_min_column(conn: sqlite3.Connection) -> None:
             cur.execute(
                 "ALTER TABLE inventario ADD COLUMN stock_min INTEGER DEFAULT 0"
             )
-            conn.commit()
+            _commit(conn)
         except sqlite3.OperationalError:
             pass
 
@@ -349,7 +927,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
     cur.execute("SELECT COUNT(*) FROM meta")
     if cur.fetchone()[0] == 0:
         cur.execute("INSERT INTO meta(schema_version) VALUES (1)")
-        conn.commit()
+        _commit(conn)
 
     cur.execute("SELECT schema_version FROM meta")
     version = cur.fetchone()[0]
@@ -367,7 +945,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             except sqlite3.OperationalError:
                 pass
         cur.execute("UPDATE meta SET schema_version = 2")
-        conn.commit()
+        _commit(conn)
         version = 2
 
     if version < 3:
@@ -384,7 +962,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             except sqlite3.OperationalError:
                 pass
         cur.execute("UPDATE meta SET schema_version = 3")
-        conn.commit()
+        _commit(conn)
         version = 3
 
     if version < 4:
@@ -409,7 +987,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
         except sqlite3.OperationalError:
             pass
         cur.execute("UPDATE meta SET schema_version = 4")
-        conn.commit()
+        _commit(conn)
         version = 4
 
     if version < 5:
@@ -433,7 +1011,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             except sqlite3.OperationalError:
                 pass
         cur.execute("UPDATE meta SET schema_version = 5")
-        conn.commit()
+        _commit(conn)
 
     if version < 6:
         try:
@@ -441,7 +1019,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
         except sqlite3.OperationalError:
             pass
         cur.execute("UPDATE meta SET schema_version = 6")
-        conn.commit()
+        _commit(conn)
 
     if version < 7:
         cur.execute(
@@ -463,7 +1041,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
                 ("admin", pwd_hash, salt, "admin"),
             )
         cur.execute("UPDATE meta SET schema_version = 7")
-        conn.commit()
+        _commit(conn)
 
     if version < 8:
         cur.execute(
@@ -512,7 +1090,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
         except sqlite3.OperationalError:
             pass
         cur.execute("UPDATE meta SET schema_version = 8")
-        conn.commit()
+        _commit(conn)
 
     if version < 9:
         try:
@@ -522,7 +1100,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
         except sqlite3.OperationalError:
             pass
         cur.execute("UPDATE meta SET schema_version = 9")
-        conn.commit()
+        _commit(conn)
 
     if version < 10:
         cur.execute(
@@ -567,7 +1145,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             """
         )
         cur.execute("UPDATE meta SET schema_version = 10")
-        conn.commit()
+        _commit(conn)
 
     if version < 11:
         cur.execute(
@@ -582,7 +1160,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             """
         )
         cur.execute("UPDATE meta SET schema_version = 11")
-        conn.commit()
+        _commit(conn)
 
     if version < 12:
         cur.execute(
@@ -609,7 +1187,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             """
         )
         cur.execute("UPDATE meta SET schema_version = 12")
-        conn.commit()
+        _commit(conn)
 
     if version < 13:
         cur.execute(
@@ -643,7 +1221,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             """
         )
         cur.execute("UPDATE meta SET schema_version = 13")
-        conn.commit()
+        _commit(conn)
 
     if version < 14:
         cur.execute(
@@ -659,7 +1237,7 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             """
         )
         cur.execute("UPDATE meta SET schema_version = 14")
-        conn.commit()
+        _commit(conn)
 
     if version < 15:
         cur.execute(
@@ -675,190 +1253,1217 @@ def migrate_if_needed(conn: sqlite3.Connection) -> None:
             """
         )
         cur.execute("UPDATE meta SET schema_version = 15")
-        conn.commit()
-
-# API pública
-def init_db(path: str = DB_PATH) -> None:
-    global DB_PATH
-    if _conn is not None:
-        close_db()
-    DB_PATH = path
-    conn = _ensure_conn()
-    _ensure_stock_min_column(conn)
-    migrate_if_needed(conn)
-
-def contar_clientes(sucursal_id: int | None = None) -> int:
-    cur = _ensure_conn().cursor()
-    if sucursal_id is None:
-        cur.execute("SELECT COUNT(*) FROM clientes")
-    else:
+        _commit(conn)
+
+    if version < 16:
+        _create_search_index(cur)
+        cur.execute("UPDATE meta SET schema_version = 16")
+        _commit(conn)
+
+    if version < 17:
+        # Índices para las consultas frecuentes señaladas por tools/index_advisor.py
+        # y para las claves foráneas usadas en borrados en cascada.
+        for name, target in [
+            ("idx_reparaciones_fecha", "reparaciones(fecha)"),
+            ("idx_reparaciones_sucursal_estado", "reparaciones(sucursal_id, estado)"),
+            ("idx_reparaciones_dispositivo", "reparaciones(dispositivo_id)"),
+            ("idx_reparacion_repuestos_repuesto", "reparacion_repuestos(repuesto_id)"),
+            ("idx_facturas_cliente", "facturas(cliente_id)"),
+            ("idx_facturas_reparacion", "facturas(reparacion_id)"),
+            ("idx_pagos_factura", "pagos(factura_id)"),
+            ("idx_presupuestos_reparacion", "presupuestos(reparacion_id)"),
+            ("idx_garantias_reparacion", "garantias(reparacion_id)"),
+            ("idx_devoluciones_factura", "devoluciones(factura_id)"),
+            ("idx_ticket_estados_ticket_fecha", "ticket_estados(ticket_id, fecha)"),
+            ("idx_ticket_fotos_ticket", "ticket_fotos(ticket_id)"),
+            ("idx_dispositivos_n_serie", "dispositivos(n_serie)"),
+            ("idx_auditoria_usuario", "auditoria(usuario)"),
+            ("idx_notificaciones_destinatario", "notificaciones(destinatario)"),
+            ("idx_password_resets_token", "password_resets(token)"),
+            ("idx_repuestos_nombre_sucursal", "repuestos(nombre, sucursal_id)"),
+        ]:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+        cur.execute("UPDATE meta SET schema_version = 17")
+        _commit(conn)
+
+    if version < 18:
+        _create_financial_rollup(cur)
+        _fill_financial_rollup(cur)
+        cur.execute("UPDATE meta SET schema_version = 18")
+        _commit(conn)
+
+    if version < 19:
+        _create_change_counters(cur)
+        cur.execute("UPDATE meta SET schema_version = 19")
+        _commit(conn)
+
+    if version < 20:
+        # Índices NOCASE para los filtros por prefijo (LIKE 'texto%') de los listados
+        for name, target in [
+            ("idx_clientes_nombre_nocase", "clientes(nombre COLLATE NOCASE)"),
+            ("idx_clientes_telefono_nocase", "clientes(telefono COLLATE NOCASE)"),
+            ("idx_clientes_email_nocase", "clientes(email COLLATE NOCASE)"),
+            ("idx_inventario_nombre_nocase", "inventario(nombre COLLATE NOCASE)"),
+            ("idx_inventario_sku_nocase", "inventario(sku COLLATE NOCASE)"),
+            ("idx_inventario_categoria_nocase", "inventario(categoria COLLATE NOCASE)"),
+            ("idx_inventario_proveedor_nocase", "inventario(proveedor COLLATE NOCASE)"),
+            ("idx_dispositivos_marca_nocase", "dispositivos(marca COLLATE NOCASE)"),
+            ("idx_dispositivos_modelo_nocase", "dispositivos(modelo COLLATE NOCASE)"),
+            ("idx_dispositivos_imei_nocase", "dispositivos(imei COLLATE NOCASE)"),
+        ]:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+        cur.execute("UPDATE meta SET schema_version = 20")
+        _commit(conn)
+
+    if version < 21:
+        # Las claves únicas de UNIQUE_KEYS se crean en la migración 25
+        cur.execute("UPDATE meta SET schema_version = 21")
+        _commit(conn)
+
+    if version < 22:
+        _create_change_log(cur)
+        cur.execute("UPDATE meta SET schema_version = 22")
+        _commit(conn)
+
+    if version < 23:
+        _create_ticket_trigrams(cur)
+        cur.execute("UPDATE meta SET schema_version = 23")
+        _commit(conn)
+
+    if version < 24:
+        # El resumen pasa a céntimos enteros y guarda el grupo sin fecha
+        for table in ROLLUP_SOURCES:
+            for suffix in ("ai", "au", "ad"):
+                cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_resumen_{suffix}")
+        cur.execute("DROP TABLE IF EXISTS resumen_mensual")
+        _create_financial_rollup(cur)
+        _fill_financial_rollup(cur)
+        cur.execute("UPDATE meta SET schema_version = 24")
+        _commit(conn)
+
+    if version < 25:
+        _rename_duplicate_keys(cur)
+        _create_unique_keys(cur)
+        cur.execute("UPDATE meta SET schema_version = 25")
+        _commit(conn)
+
+    if version < 26:
+        # Los triggers por fila pasan a saltarse durante las cargas masivas
+        for table in TRACKED_TABLES:
+            for family in ("version", "changes", "search"):
+                for suffix in ("ai", "au", "ad"):
+                    cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{family}_{suffix}")
+        _create_change_counters(cur)
+        _create_change_log(cur)
+        _create_search_index(cur)
+        # Duplica idx_clientes_nombre_unique y solo encarece cada alta
+        cur.execute("DROP INDEX IF EXISTS idx_clientes_nombre")
+        cur.execute("UPDATE meta SET schema_version = 26")
+        _commit(conn)
+
+
+# Claves naturales usadas por las altas masivas (ON CONFLICT):
+# (índice, tabla, columnas, WHERE, columna renombrada en los duplicados previos)
+UNIQUE_KEYS = (
+    ("idx_clientes_nombre_unique", "clientes", "nombre", "", "nombre"),
+    (
+        "idx_dispositivos_clave_unique",
+        "dispositivos",
+        "cliente_id, marca, modelo, ifnull(imei, '')",
+        "",
+        "modelo",
+    ),
+    (
+        "idx_dispositivos_n_serie_unique",
+        "dispositivos",
+        "n_serie",
+        "n_serie IS NOT NULL AND n_serie != ''",
+        "n_serie",
+    ),
+    ("idx_inventario_sku_unique", "inventario", "sku", "sku IS NOT NULL AND sku != ''", "sku"),
+    ("idx_repuestos_clave_unique", "repuestos", "nombre, ifnull(sucursal_id, 0)", "", "nombre"),
+)
+
+
+def _rename_duplicate_keys(cur: sqlite3.Cursor) -> None:
+    """Make existing rows satisfy :data:`UNIQUE_KEYS`.
+
+    Until these keys existed, direct SQL or ``update_cliente`` could store
+    duplicates. The oldest row of each group keeps its value and the others
+    get `` (id)`` appended to the renamed column, so nothing is merged or
+    deleted and the rows can be reviewed by hand afterwards.
+    """
+    for name, table, columns, where, column in UNIQUE_KEYS:
+        condition = f"WHERE {where}" if where else ""
         cur.execute(
+            f"""
+            UPDATE {table} SET {column} = {column} || ' (' || id || ')'
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (PARTITION BY {columns} ORDER BY id) AS n
+                    FROM {table} {condition}
+                )
+                WHERE n > 1
+            )
             """
-            SELECT COUNT(DISTINCT c.id)
-            FROM clientes c
-            JOIN dispositivos d ON d.cliente_id = c.id
-            JOIN reparaciones r ON r.dispositivo_id = d.id AND r.sucursal_id = ?
-            """,
-            (sucursal_id,),
         )
-    return cur.fetchone()[0]
-
-def contar_dispositivos(sucursal_id: int | None = None) -> int:
-    cur = _ensure_conn().cursor()
-    if sucursal_id is None:
-        cur.execute("SELECT COUNT(*) FROM dispositivos")
-    else:
-        cur.execute(
-            """
-            SELECT COUNT(DISTINCT d.id)
-            FROM dispositivos d
-            JOIN reparaciones r ON r.dispositivo_id = d.id AND r.sucursal_id = ?
-            """,
-            (sucursal_id,),
+        if cur.rowcount > 0:
+            logger.warning("Renamed %d duplicate %s rows before creating %s", cur.rowcount, table, name)
+
+
+def _create_unique_keys(cur: sqlite3.Cursor) -> None:
+    """Create the unique indexes of :data:`UNIQUE_KEYS`."""
+    for name, table, columns, where, _ in UNIQUE_KEYS:
+        condition = f"WHERE {where}" if where else ""
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table}({columns}) {condition}")
+
+
+# Tablas con contador de cambios en table_versions
+TRACKED_TABLES = (
+    "clientes",
+    "dispositivos",
+    "inventario",
+    "repuestos",
+    "reparaciones",
+    "reparacion_repuestos",
+    "presupuestos",
+    "facturas",
+    "pagos",
+    "tickets",
+    "ticket_estados",
+    "garantias",
+    "devoluciones",
+    "sucursales",
+    "usuarios",
+    "config",
+)
+
+
+def _unless_bulk_load(table: str) -> str:
+    """``WHEN`` clause that skips a per-row trigger while ``table`` is bulk loaded."""
+    return f"WHEN NOT EXISTS (SELECT 1 FROM bulk_load WHERE tabla = '{table}')"
+
+
+def _create_change_counters(cur: sqlite3.Cursor) -> None:
+    """Create ``table_versions`` and the triggers that bump it on every change."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            tabla TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
         )
-    return cur.fetchone()[0]
+        """
+    )
+    for table in TRACKED_TABLES:
+        cur.execute("INSERT OR IGNORE INTO table_versions (tabla, version) VALUES (?, 0)", (table,))
+        bump = f"UPDATE table_versions SET version = version + 1 WHERE tabla = '{table}';"
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{suffix} AFTER {event} ON {table} "
+                f"{_unless_bulk_load(table)} BEGIN {bump} END"
+            )
 
-def contar_productos(sucursal_id: int | None = None) -> int:
-    cur = _ensure_conn().cursor()
-    if sucursal_id is None:
-        cur.execute("SELECT COUNT(*) FROM inventario")
-    else:
-        cur.execute(
-            "SELECT COUNT(*) FROM inventario WHERE sucursal_id = ?",
-            (sucursal_id,),
-        )
-    return cur.fetchone()[0]
 
-def contar_reparaciones_pendientes(sucursal_id: int | None = None) -> int:
-    cur = _ensure_conn().cursor()
-    if sucursal_id is None:
-        cur.execute("SELECT COUNT(*) FROM reparaciones WHERE estado = 'Pendiente'")
-    else:
-        cur.execute(
-            "SELECT COUNT(*) FROM reparaciones WHERE estado = 'Pendiente' AND sucursal_id = ?",
-            (sucursal_id,),
-        )
-    return cur.fetchone()[0]
+# Tablas con registro de cambios por fila para exportaciones incrementales
+# (las que tienen columna id)
+DELTA_TABLES = tuple(t for t in TRACKED_TABLES if t not in ("reparacion_repuestos", "config"))
 
-def get_low_stock_products(limit: int = 8, sucursal_id: int | None = None) -> List[Tuple[str, int, int]]:
-    cur = _ensure_conn().cursor()
-    if sucursal_id is None:
-        cur.execute(
-            "SELECT nombre, cantidad, stock_min FROM inventario "
-            "WHERE cantidad <= stock_min "
-            "ORDER BY cantidad ASC, nombre ASC LIMIT ?",
-            (limit,),
-        )
-    else:
-        cur.execute(
-            "SELECT nombre, cantidad, stock_min FROM inventario "
-            "WHERE cantidad <= stock_min AND sucursal_id = ? "
-            "ORDER BY cantidad ASC, nombre ASC LIMIT ?",
-            (sucursal_id, limit),
-        )
-    return cur.fetchall()
 
+def _create_change_log(cur: sqlite3.Cursor) -> None:
+    """Create ``row_changes``, ``export_watermarks`` and the change-log triggers.
 
-def get_recent_repairs(limit: int = 8) -> List[Tuple[str, str, str, str, float]]:
-    cur = _ensure_conn().cursor()
+    ``row_changes`` keeps one entry per row: the sequence number of its last
+    change, the one at which it was created (0 if it predates the log) and
+    whether it is deleted. Its size is thus bounded by the rows ever stored.
+    """
     cur.execute(
         """
-        SELECT r.fecha, c.nombre, d.marca || ' ' || d.modelo, r.estado, r.total
-        FROM reparaciones r
-        JOIN dispositivos d ON r.dispositivo_id = d.id
-        JOIN clientes c ON d.cliente_id = c.id
-        ORDER BY r.fecha DESC
-        LIMIT ?
-        """,
-        (limit,),
-    )
-    return cur.fetchall()
-
-def listar_clientes():
-    cur = _ensure_conn().cursor()
-    cur.execute("SELECT id, nombre FROM clientes ORDER BY id")
-    return cur.fetchall()
-
-def listar_clientes_detallado() -> List[Tuple[int, str, Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]]:
-    cur = _ensure_conn().cursor()
-    cur.execute(
-        "SELECT id, nombre, telefono, email, direccion, nif, notas FROM clientes ORDER BY id"
+        CREATE TABLE IF NOT EXISTS row_changes (
+            tabla TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL UNIQUE,
+            creado INTEGER NOT NULL DEFAULT 0,
+            borrado INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabla, fila_id)
+        )
+        """
     )
-    return cur.fetchall()
-
-
-def add_cliente(
-    nombre: str,
-    *,
-    telefono: Optional[str] = None,
-    email: Optional[str] = None,
-    direccion: Optional[str] = None,
-    nif: Optional[str] = None,
-    notas: Optional[str] = None,
-) -> Optional[int]:
-    existing_id = find_client_by_name(nombre)
-    if existing_id is not None:
-        return None
-    conn = _ensure_conn()
-    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_row_changes_tabla_seq ON row_changes(tabla, seq)")
     cur.execute(
-        "INSERT INTO clientes (nombre, telefono, email, direccion, nif, notas) VALUES (?, ?, ?, ?, ?, ?)",
-        (nombre, telefono, email, direccion, nif, notas),
+        """
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            destino TEXT NOT NULL,
+            tabla TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            fecha TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (destino, tabla)
+        )
+        """
     )
-    conn.commit()
-    return cur.lastrowid
+    next_seq = "(SELECT ifnull(max(seq), 0) + 1 FROM row_changes)"
+    for table in DELTA_TABLES:
+        for suffix, event, row, creado, borrado, on_conflict in (
+            ("ai", "INSERT", "NEW", next_seq, 0, "creado = excluded.creado, borrado = 0"),
+            ("au", "UPDATE", "NEW", "0", 0, "borrado = 0"),
+            ("ad", "DELETE", "OLD", "0", 1, "borrado = 1"),
+        ):
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_{suffix} AFTER {event} ON {table} "
+                f"{_unless_bulk_load(table)} BEGIN INSERT INTO row_changes (tabla, fila_id, seq, creado, borrado) "
+                f"VALUES ('{table}', {row}.id, {next_seq}, {creado}, {borrado}) "
+                f"ON CONFLICT (tabla, fila_id) DO UPDATE SET seq = excluded.seq, {on_conflict}; END"
+            )
 
 
-def update_cliente(cliente_id: int, **campos) -> bool:
-    if not campos:
-        return False
-    fields = []
-    params: List[object] = []
-    for key, value in campos.items():
-        if key not in {"nombre", "telefono", "email", "direccion", "nif", "notas"}:
-            continue
-        fields.append(f"{key} = ?")
-        params.append(value)
-    if not fields:
-        return False
-    params.append(cliente_id)
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(f"UPDATE clientes SET {', '.join(fields)} WHERE id = ?", params)
-    conn.commit()
-    return cur.rowcount > 0
+# Resumen financiero mensual materializado, mantenido por triggers. Cada fuente
+# aporta (columna de importe, columna contador, expresión del importe).
+# Los importes se acumulan en céntimos enteros para que sumar y restar no
+# acumule error; sucursal_id = 0 agrupa los registros sin sucursal y
+# periodo = '' los que no tienen una fecha válida.
+ROLLUP_SOURCES: dict[str, Tuple[str, str, str, Tuple[str, ...]]] = {
+    # tabla: (importe, contador, expresión, columnas que lo modifican)
+    "facturas": ("ingresos_cents", "n_facturas", "{row}.total", ("fecha", "sucursal_id", "total")),
+    "reparaciones": (
+        "costos_cents",
+        "n_reparaciones",
+        "COALESCE({row}.costo, 0) + COALESCE({row}.costo_mano_obra, 0)",
+        ("fecha", "sucursal_id", "costo", "costo_mano_obra"),
+    ),
+}
 
-def delete_cliente(cliente_id: int) -> bool:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
-    conn.commit()
-    return cur.rowcount > 0
 
+def _rollup_period(row: str) -> str:
+    return f"COALESCE(strftime('%Y-%m', {row}.fecha), '')"
 
-# --- Dispositivos y Reparaciones ---
 
-def find_client_by_name(nombre: str) -> Optional[int]:
-    cur = _ensure_conn().cursor()
-    cur.execute("SELECT id FROM clientes WHERE nombre = ?", (nombre,))
-    row = cur.fetchone()
-    return row[0] if row else None
+def _rollup_cents(table: str, row: str) -> str:
+    return f"CAST(ROUND(COALESCE({ROLLUP_SOURCES[table][2].format(row=row)}, 0) * 100) AS INTEGER)"
 
 
-def add_client(nombre: str) -> int:
-    cid = find_client_by_name(nombre)
-    if cid is not None:
-        return cid
-    return add_cliente(nombre)
+def _rollup_delta(table: str, row: str, sign: str) -> str:
+    amount_col, count_col, _, _ = ROLLUP_SOURCES[table]
+    return (
+        f"INSERT INTO resumen_mensual (periodo, sucursal_id, {amount_col}, {count_col}) "
+        f"VALUES ({_rollup_period(row)}, COALESCE({row}.sucursal_id, 0), {sign}{_rollup_cents(table, row)}, {sign}1) "
+        f"ON CONFLICT (periodo, sucursal_id) DO UPDATE SET "
+        f"{amount_col} = {amount_col} + excluded.{amount_col}, "
+        f"{count_col} = {count_col} + excluded.{count_col};"
+    )
 
 
-def find_device(cliente_id: int, marca: str, modelo: str, imei: Optional[str] = None) -> Optional[int]:
-    cur = _ensure_conn().cursor()
+def _create_financial_rollup(cur: sqlite3.Cursor) -> None:
+    """Create the monthly rollup table and the triggers that keep it current."""
     cur.execute(
         """
-        SELECT id FROM dispositivos
-        WHERE cliente_id = ? AND marca = ? AND modelo = ? AND (imei = ? OR (imei IS NULL AND ? IS NULL))
-        """,
+        CREATE TABLE IF NOT EXISTS resumen_mensual (
+            periodo TEXT NOT NULL,
+            sucursal_id INTEGER NOT NULL DEFAULT 0,
+            ingresos_cents INTEGER NOT NULL DEFAULT 0,
+            costos_cents INTEGER NOT NULL DEFAULT 0,
+            n_facturas INTEGER NOT NULL DEFAULT 0,
+            n_reparaciones INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (periodo, sucursal_id)
+        )
+        """
+    )
+    for table, (_, _, _, columns) in ROLLUP_SOURCES.items():
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_resumen_ai AFTER INSERT ON {table} "
+            f"BEGIN {_rollup_delta(table, 'new', '+')} END"
+        )
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_resumen_au AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"BEGIN {_rollup_delta(table, 'old', '-')} {_rollup_delta(table, 'new', '+')} END"
+        )
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_resumen_ad AFTER DELETE ON {table} "
+            f"BEGIN {_rollup_delta(table, 'old', '-')} END"
+        )
+
+
+def _fill_financial_rollup(cur: sqlite3.Cursor) -> None:
+    cur.execute("DELETE FROM resumen_mensual")
+    for table, (amount_col, count_col, _, _) in ROLLUP_SOURCES.items():
+        cur.execute(
+            f"""
+            INSERT INTO resumen_mensual (periodo, sucursal_id, {amount_col}, {count_col})
+            SELECT {_rollup_period('t')}, COALESCE(t.sucursal_id, 0), SUM({_rollup_cents(table, 't')}), COUNT(*)
+            FROM {table} t
+            GROUP BY 1, 2
+            ON CONFLICT (periodo, sucursal_id) DO UPDATE SET
+                {amount_col} = excluded.{amount_col}, {count_col} = excluded.{count_col}
+            """
+        )
+
+
+def rebuild_financial_rollup() -> int:
+    """Recompute ``resumen_mensual`` from invoices and repairs.
+
+    Returns the number of (period, branch) rows written.
+    """
+
+    def op(conn: sqlite3.Connection) -> int:
+        cur = conn.cursor()
+        _create_financial_rollup(cur)
+        _fill_financial_rollup(cur)
+        cur.execute("SELECT COUNT(*) FROM resumen_mensual")
+        return cur.fetchone()[0]
+
+    return _run_write(op)
+
+
+# Índice de búsqueda de texto completo. Cada fila usa rowid = id * 4 + código
+# para que los triggers actualicen por rowid sin recorrer el índice.
+SEARCH_KINDS: dict[str, Tuple[int, Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]] = {
+    # tipo: (código, columnas título, columnas detalle, columnas extra)
+    "tickets": (0, ("cliente",), ("dispositivo",), ("descripcion",)),
+    "clientes": (1, ("nombre",), ("telefono", "email", "nif"), ()),
+    "dispositivos": (2, ("marca", "modelo"), ("imei", "n_serie"), ()),
+    "reparaciones": (3, ("descripcion",), ("diagnostico",), ()),
+}
+
+
+def _search_text(alias: str, columns: Tuple[str, ...]) -> str:
+    if not columns:
+        return "''"
+    return " || ' ' || ".join(f"COALESCE({alias}.{col}, '')" for col in columns)
+
+
+def _search_rows(table: str) -> str:
+    """``SELECT`` of the search index entries for the rows of ``table`` (alias ``t``)."""
+    code, titulo, detalle, extra = SEARCH_KINDS[table]
+    return (
+        f"SELECT t.id * 4 + {code}, '{table}', {_search_text('t', titulo)}, "
+        f"{_search_text('t', detalle)}, {_search_text('t', extra)} FROM {table} t"
+    )
+
+
+def _create_search_index(cur: sqlite3.Cursor) -> None:
+    """Create the FTS5 search index, its sync triggers and backfill it.
+
+    Does nothing when the SQLite build lacks FTS5; :func:`search` then falls
+    back to ``LIKE`` queries.
+    """
+    try:
+        cur.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                kind UNINDEXED, titulo, detalle, extra,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        return
+    for table, (code, titulo, detalle, extra) in SEARCH_KINDS.items():
+        skip = _unless_bulk_load(table)
+        new_values = (
+            f"new.id * 4 + {code}, '{table}', {_search_text('new', titulo)}, "
+            f"{_search_text('new', detalle)}, {_search_text('new', extra)}"
+        )
+        insert = f"INSERT INTO search_index (rowid, kind, titulo, detalle, extra) VALUES ({new_values});"
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ai AFTER INSERT ON {table} "
+            f"{skip} BEGIN {insert} END"
+        )
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_au AFTER UPDATE ON {table} "
+            f"{skip} BEGIN DELETE FROM search_index WHERE rowid = old.id * 4 + {code}; {insert} END"
+        )
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ad AFTER DELETE ON {table} "
+            f"{skip} BEGIN DELETE FROM search_index WHERE rowid = old.id * 4 + {code}; END"
+        )
+        cur.execute(f"DELETE FROM search_index WHERE kind = '{table}'")
+        cur.execute(f"INSERT INTO search_index (rowid, kind, titulo, detalle, extra) {_search_rows(table)}")
+
+
+def _create_ticket_trigrams(cur: sqlite3.Cursor) -> None:
+    """Create the trigram index behind :func:`search_tickets` and backfill it.
+
+    ``LIKE '%texto%'`` on the index returns the same rows as on ``tickets``
+    but without scanning the table. Does nothing when the SQLite build lacks
+    FTS5 or its trigram tokenizer; :func:`search_tickets` then runs ``LIKE``
+    on the table.
+    """
+    try:
+        cur.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index_tickets USING fts5(
+                cliente, dispositivo,
+                content = 'tickets', content_rowid = 'id', tokenize = 'trigram'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        return
+    insert = (
+        "INSERT INTO search_index_tickets (rowid, cliente, dispositivo) "
+        "VALUES (new.id, new.cliente, new.dispositivo);"
+    )
+    delete = (
+        "INSERT INTO search_index_tickets (search_index_tickets, rowid, cliente, dispositivo) "
+        "VALUES ('delete', old.id, old.cliente, old.dispositivo);"
+    )
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_tickets_trigram_ai AFTER INSERT ON tickets BEGIN {insert} END")
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_tickets_trigram_au AFTER UPDATE ON tickets BEGIN {delete} {insert} END"
+    )
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_tickets_trigram_ad AFTER DELETE ON tickets BEGIN {delete} END")
+    cur.execute("INSERT INTO search_index_tickets (search_index_tickets) VALUES ('rebuild')")
+
+
+def _has_search_index(name: str = "search_index") -> bool:
+    cur = _ensure_conn().cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cur.fetchone() is not None
+
+
+def _match_expression(text: str, column: str | None = None) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    terms = [word.replace('"', "") for word in text.split()]
+    expr = " AND ".join(f'"{term}"*' for term in terms if term)
+    if expr and column:
+        return f"{column} : ({expr})"
+    return expr
+
+
+def _commit(conn: sqlite3.Connection) -> None:
+    """Commit unless the caller is grouping statements in one transaction."""
+    if not getattr(_write_state, "depth", 0):
+        conn.commit()
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create or upgrade the schema unless it is already current.
+
+    An up-to-date database is detected with a single ``PRAGMA user_version``
+    read. Otherwise table creation and every pending migration run inside
+    one transaction and ``user_version`` is stamped with
+    :data:`SCHEMA_VERSION`. A database written by a newer version of the
+    application is refused untouched instead of being stamped down.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == SCHEMA_VERSION:
+        return
+    if version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {version} is newer than the supported version {SCHEMA_VERSION}"
+        )
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    _write_state.depth = 1
+    try:
+        # Otro proceso pudo migrar mientras esperábamos el bloqueo
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            _create_tables(conn)
+            _ensure_stock_min_column(conn)
+            migrate_if_needed(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _write_state.depth = 0
+
+
+class Page(NamedTuple):
+    rows: List[tuple]
+    next_cursor: Optional[str]
+
+
+PAGE_SIZE = 100
+
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid page cursor") from None
+
+
+def _like_prefix(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+class _PrefixKey(NamedTuple):
+    """Prefix filter that drives a ``(column, id)`` keyset."""
+
+    column: str
+    prefix: str
+    # Posición de la columna en las filas devueltas
+    index: int
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _add_prefix_filters(
+    conditions: List[str], params: List[object], filters: dict[str, Tuple[Optional[str], int]]
+) -> Optional[_PrefixKey]:
+    """Append a case-insensitive ``column LIKE 'text%'`` for each non-empty filter.
+
+    ``filters`` maps each column to ``(text, position in the row)``. The
+    first active filter is returned: :func:`_fetch_page` turns it into an
+    index range and pages by ``(column, id)``. The ``LIKE`` terms are kept
+    out of index selection (unary ``+``) so that range drives the plan.
+    """
+    key = None
+    for column, (value, index) in filters.items():
+        if value:
+            if key is None:
+                key = _PrefixKey(column, value, index)
+            conditions.append(f"+{column} LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(value))
+    return key
+
+
+def _encode_key_cursor(value: str, last_id: int) -> str:
+    data = json.dumps([value, last_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _decode_key_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid page cursor") from None
+    if not isinstance(value, str) or not isinstance(last_id, int):
+        raise ValueError("Invalid page cursor")
+    return value, last_id
+
+
+def _fetch_page(
+    select: str,
+    id_column: str,
+    conditions: List[str],
+    params: List[object],
+    cursor: Optional[str],
+    limit: int,
+    prefix_key: Optional[_PrefixKey] = None,
+) -> Page:
+    """Run a keyset-paginated query (``id_column > ? ORDER BY id_column``).
+
+    ``select`` must return the id as its first column. The returned
+    ``next_cursor`` is ``None`` on the last page. With ``prefix_key`` rows
+    are ordered by that column (NOCASE) and then id, and each page is an
+    index range seek on the column's NOCASE index, so no page sorts or
+    skips the rows before it.
+    """
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    cur = _ensure_conn().cursor()
+    if prefix_key is None:
+        where = " AND ".join([f"{id_column} > ?", *conditions])
+        cur.execute(
+            f"{select} WHERE {where} ORDER BY {id_column} LIMIT ?",
+            [_decode_cursor(cursor), *params, limit + 1],
+        )
+        rows = cur.fetchall()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return Page(rows, _encode_cursor(rows[-1][0]))
+        return Page(rows, None)
+
+    column = f"{prefix_key.column} COLLATE NOCASE"
+    prefix = prefix_key.prefix.translate(_ASCII_LOWER)
+    if cursor:
+        value, last_id = _decode_key_cursor(cursor)
+        bounds = [f"{column} >= ?", f"({column} > ? OR {id_column} > ?)"]
+        bound_params: List[object] = [value, value, last_id]
+    else:
+        bounds = [f"{column} >= ?"]
+        bound_params = [prefix]
+    if ord(prefix[-1]) < 0x10FFFF:
+        bounds.append(f"{column} < ?")
+        bound_params.append(prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    where = " AND ".join([*bounds, *conditions])
+    cur.execute(
+        f"{select} WHERE {where} ORDER BY {column}, {id_column} LIMIT ?",
+        [*bound_params, *params, limit + 1],
+    )
+    rows = cur.fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return Page(rows, _encode_key_cursor(rows[-1][prefix_key.index], rows[-1][0]))
+    return Page(rows, None)
+
+
+STREAM_CHUNK_SIZE = 1000
+
+
+def _iter_query(sql: str, params=(), chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[tuple]:
+    """Yield the rows of ``sql`` fetched ``chunk_size`` at a time."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    cur = _ensure_conn().cursor()
+    cur.execute(sql, params)
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+
+def _check_table(table: str) -> None:
+    cur = _ensure_conn().cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    if cur.fetchone() is None:
+        raise ValueError(f"Invalid table name: {table}")
+
+
+# Tablas internas o derivadas (resumen_mensual se recalcula con rebuild_financial_rollup)
+_INTERNAL_TABLES = ("meta", "table_versions", "resumen_mensual", "row_changes", "export_watermarks", "bulk_load")
+
+
+def data_tables() -> List[str]:
+    """Return the application tables, without SQLite, search or bookkeeping ones."""
+    cur = _ensure_conn().cursor()
+    cur.execute(
+        f"""
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'search_index%'
+          AND name NOT IN ({", ".join("?" * len(_INTERNAL_TABLES))})
+        ORDER BY name
+        """,
+        _INTERNAL_TABLES,
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+class ColumnInfo(NamedTuple):
+    name: str
+    type: str
+    default: Optional[str]
+
+
+def table_schema(table: str) -> List[ColumnInfo]:
+    """Return name, declared type and default of each column of ``table``."""
+    _check_table(table)
+    cur = _ensure_conn().cursor()
+    cur.execute(f'PRAGMA table_info("{table}")')
+    return [ColumnInfo(row[1], (row[2] or "").upper(), row[4]) for row in cur.fetchall()]
+
+
+def table_columns(table: str) -> List[str]:
+    """Return the column names of ``table`` in declaration order."""
+    return [column.name for column in table_schema(table)]
+
+
+def load_rows(
+    table: str,
+    columns: List[str],
+    rows: Iterable[tuple],
+    *,
+    upsert: bool = False,
+    clear: bool = False,
+) -> List[Tuple[int, str]]:
+    """Insert a batch of raw rows into ``table`` in one transaction.
+
+    ``columns`` must be columns of ``table``. With ``clear`` the table is
+    emptied first, in the same transaction. With ``upsert`` a row that hits
+    the primary key or a unique key updates the existing row instead. Rows
+    that break a constraint are skipped; returns ``(position, message)`` for
+    each of them.
+    """
+    known = set(table_columns(table))
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+    names = ", ".join(f'"{column}"' for column in columns)
+    sql = f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" * len(columns))})'
+    if upsert:
+        updates = ", ".join(f'"{column}" = excluded."{column}"' for column in columns if column != "id")
+        sql += f" ON CONFLICT DO UPDATE SET {updates}" if updates else " ON CONFLICT DO NOTHING"
+    rows = list(rows)
+
+    def op(conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+        cur = conn.cursor()
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        if clear:
+            cur.execute(f'DELETE FROM "{table}"')
+        cur.execute("SAVEPOINT load_rows")
+        try:
+            cur.executemany(sql, rows)
+        except sqlite3.IntegrityError:
+            # Se repite fila a fila para aislar las que fallan
+            cur.execute("ROLLBACK TO load_rows")
+        else:
+            cur.execute("RELEASE load_rows")
+            return []
+        cur.execute("RELEASE load_rows")
+        errors: List[Tuple[int, str]] = []
+        for position, row in enumerate(rows):
+            try:
+                cur.execute(sql, row)
+            except sqlite3.IntegrityError as exc:
+                errors.append((position, str(exc)))
+        return errors
+
+    return _run_write(op)
+
+
+# API pública
+def init_db(path: str = DB_PATH, *, pool_size: int | None = None) -> None:
+    global DB_PATH
+    if _pool is not None:
+        close_db()
+    DB_PATH = path
+    _open_pool(pool_size)
+    # Fija las versiones de partida y avisa a los suscriptores del cambio de base
+    check_for_changes()
+    if os.environ.get("APP_DB_GROUP_COMMIT") == "1":
+        start_writer()
+
+def contar_clientes(sucursal_id: int | None = None) -> int:
+    cur = _ensure_conn().cursor()
+    if sucursal_id is None:
+        cur.execute("SELECT COUNT(*) FROM clientes")
+    else:
+        cur.execute(
+            """
+            SELECT COUNT(DISTINCT c.id)
+            FROM clientes c
+            JOIN dispositivos d ON d.cliente_id = c.id
+            JOIN reparaciones r ON r.dispositivo_id = d.id AND r.sucursal_id = ?
+            """,
+            (sucursal_id,),
+        )
+    return cur.fetchone()[0]
+
+def contar_dispositivos(sucursal_id: int | None = None) -> int:
+    cur = _ensure_conn().cursor()
+    if sucursal_id is None:
+        cur.execute("SELECT COUNT(*) FROM dispositivos")
+    else:
+        cur.execute(
+            """
+            SELECT COUNT(DISTINCT d.id)
+            FROM dispositivos d
+            JOIN reparaciones r ON r.dispositivo_id = d.id AND r.sucursal_id = ?
+            """,
+            (sucursal_id,),
+        )
+    return cur.fetchone()[0]
+
+def contar_productos(sucursal_id: int | None = None) -> int:
+    cur = _ensure_conn().cursor()
+    if sucursal_id is None:
+        cur.execute("SELECT COUNT(*) FROM inventario")
+    else:
+        cur.execute(
+            "SELECT COUNT(*) FROM inventario WHERE sucursal_id = ?",
+            (sucursal_id,),
+        )
+    return cur.fetchone()[0]
+
+def contar_reparaciones_pendientes(sucursal_id: int | None = None) -> int:
+    cur = _ensure_conn().cursor()
+    if sucursal_id is None:
+        cur.execute("SELECT COUNT(*) FROM reparaciones WHERE estado = 'Pendiente'")
+    else:
+        cur.execute(
+            "SELECT COUNT(*) FROM reparaciones WHERE estado = 'Pendiente' AND sucursal_id = ?",
+            (sucursal_id,),
+        )
+    return cur.fetchone()[0]
+
+def get_dashboard_counts(sucursal_id: int | None = None) -> Tuple[int, int, int, int]:
+    """Return the four dashboard counters in a single query.
+
+    Same values as ``contar_clientes``, ``contar_dispositivos``,
+    ``contar_productos`` and ``contar_reparaciones_pendientes``.
+    """
+    cur = _ensure_conn().cursor()
+    if sucursal_id is None:
+        cur.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM clientes),
+                   (SELECT COUNT(*) FROM dispositivos),
+                   (SELECT COUNT(*) FROM inventario),
+                   (SELECT COUNT(*) FROM reparaciones WHERE estado = 'Pendiente')
+            """
+        )
+    else:
+        cur.execute(
+            """
+            WITH en_sucursal AS (
+                SELECT DISTINCT d.id, d.cliente_id
+                FROM reparaciones r
+                JOIN dispositivos d ON d.id = r.dispositivo_id
+                WHERE r.sucursal_id = :s
+            )
+            SELECT (SELECT COUNT(DISTINCT e.cliente_id)
+                    FROM en_sucursal e JOIN clientes c ON c.id = e.cliente_id),
+                   (SELECT COUNT(*) FROM en_sucursal),
+                   (SELECT COUNT(*) FROM inventario WHERE sucursal_id = :s),
+                   (SELECT COUNT(*) FROM reparaciones WHERE estado = 'Pendiente' AND sucursal_id = :s)
+            """,
+            {"s": sucursal_id},
+        )
+    return tuple(cur.fetchone())
+
+
+def data_version() -> Tuple[int, int, int, int]:
+    """Return a token that changes whenever the database is modified.
+
+    Combines ``PRAGMA data_version`` (commits from other connections) with the
+    calling connection's own change count, so it is only meaningful for the
+    thread that obtained it.
+    """
+    conn = _ensure_conn()
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    return _pool.generation, id(conn), version, conn.total_changes
+
+
+_version_state = threading.local()
+_subscribers: List[Tuple[Callable[[dict[str, int]], None], Optional[frozenset]]] = []
+_subscribers_lock = threading.Lock()
+# Últimas versiones notificadas y generación del pool a la que pertenecen
+_notified_versions: dict[str, int] = {}
+_notified_generation = 0
+
+
+def table_versions() -> dict[str, int]:
+    """Return the change counter of every tracked table.
+
+    The counters are re-read only when :func:`data_version` reports a change,
+    so polling this is cheap.
+    """
+    token = data_version()
+    if getattr(_version_state, "token", None) != token:
+        cur = _ensure_conn().execute("SELECT tabla, version FROM table_versions")
+        _version_state.versions = dict(cur.fetchall())
+        _version_state.token = token
+    return dict(_version_state.versions)
+
+
+def table_version(name: str) -> int:
+    """Return the change counter of ``name``; it grows on every row change."""
+    if name not in TRACKED_TABLES:
+        raise ValueError(f"Table not tracked: {name}")
+    return table_versions().get(name, 0)
+
+
+def change_token(*tables: str) -> Tuple[int, ...]:
+    """Return a value that changes when any of ``tables`` changes.
+
+    Also changes when the database is reopened, so it can key caches.
+    """
+    versions = table_versions()
+    return (_pool.generation, *(versions.get(t, 0) for t in tables))
+
+
+def subscribe(
+    callback: Callable[[dict[str, int]], None], tables: Optional[Iterable[str]] = None
+) -> Callable[[], None]:
+    """Call ``callback({table: version})`` when any of ``tables`` changes.
+
+    Changes are detected after every commit made through this module and by
+    :func:`check_for_changes`, which picks up writes from other processes.
+    Callbacks run on the thread that detected the change. Returns a function
+    that removes the subscription.
+    """
+    entry = (callback, frozenset(tables) if tables is not None else None)
+    with _subscribers_lock:
+        _subscribers.append(entry)
+
+    def unsubscribe() -> None:
+        with _subscribers_lock:
+            if entry in _subscribers:
+                _subscribers.remove(entry)
+
+    return unsubscribe
+
+
+def check_for_changes() -> dict[str, int]:
+    """Notify subscribers of tables changed since the last check.
+
+    Returns the changed tables with their new versions.
+    """
+    global _notified_generation
+    current = table_versions()
+    with _subscribers_lock:
+        if _notified_generation != _pool.generation:
+            _notified_versions.clear()
+            _notified_generation = _pool.generation
+        changed = {t: v for t, v in current.items() if v > _notified_versions.get(t, -1)}
+        _notified_versions.update(changed)
+        listeners = list(_subscribers)
+    if changed:
+        for callback, tables in listeners:
+            relevant = changed if tables is None else {t: v for t, v in changed.items() if t in tables}
+            if relevant:
+                try:
+                    callback(relevant)
+                except Exception:
+                    logger.exception("Error in change callback %r", callback)
+    return changed
+
+
+def _after_commit() -> None:
+    if _subscribers:
+        try:
+            check_for_changes()
+        except sqlite3.Error:
+            logger.exception("Could not check table versions")
+
+
+# --- Exportaciones incrementales ---
+
+CHANGE_INSERT = "insert"
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+
+
+class RowChange(NamedTuple):
+    op: str
+    id: int
+    # Fila completa (None en los borrados)
+    row: Optional[tuple]
+
+
+def change_log_position() -> int:
+    """Return the sequence number of the latest row change."""
+    cur = _ensure_conn().cursor()
+    cur.execute("SELECT ifnull(max(seq), 0) FROM row_changes")
+    return cur.fetchone()[0]
+
+
+def iter_changes(table: str, since: int, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[RowChange]:
+    """Stream the rows of ``table`` changed after sequence number ``since``.
+
+    Each row appears once, with its current content, as an insert if it was
+    created after ``since`` and as an update otherwise; deleted rows only
+    carry their id. Rows created and deleted in between are left out.
+    """
+    if table not in DELTA_TABLES:
+        raise ValueError(f"Table has no change log: {table}")
+    rows = _iter_query(
+        f"""
+        SELECT c.fila_id, c.creado > ?, c.borrado, t.*
+        FROM row_changes c LEFT JOIN "{table}" t ON t.id = c.fila_id
+        WHERE c.tabla = ? AND c.seq > ?
+        ORDER BY c.seq
+        """,
+        (since, table, since),
+        chunk_size,
+    )
+    for row_id, created, deleted, *row in rows:
+        if deleted:
+            if not created:
+                yield RowChange(CHANGE_DELETE, row_id, None)
+        else:
+            yield RowChange(CHANGE_INSERT if created else CHANGE_UPDATE, row_id, tuple(row))
+
+
+def export_watermark(destination: str, table: str) -> Optional[int]:
+    """Return the change-log position last exported to ``destination``, if any."""
+    cur = _ensure_conn().cursor()
+    cur.execute(
+        "SELECT seq FROM export_watermarks WHERE destino = ? AND tabla = ?", (destination, table)
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def set_export_watermark(destination: str, table: str, seq: int) -> None:
+    _execute_write(
+        """
+        INSERT INTO export_watermarks (destino, tabla, seq) VALUES (?, ?, ?)
+        ON CONFLICT (destino, tabla) DO UPDATE SET seq = excluded.seq, fecha = CURRENT_TIMESTAMP
+        """,
+        (destination, table, seq),
+    )
+
+
+def get_low_stock_products(limit: int = 8, sucursal_id: int | None = None) -> List[Tuple[str, int, int]]:
+    cur = _ensure_conn().cursor()
+    if sucursal_id is None:
+        cur.execute(
+            "SELECT nombre, cantidad, stock_min FROM inventario "
+            "WHERE cantidad <= stock_min "
+            "ORDER BY cantidad ASC, nombre ASC LIMIT ?",
+            (limit,),
+        )
+    else:
+        cur.execute(
+            "SELECT nombre, cantidad, stock_min FROM inventario "
+            "WHERE cantidad <= stock_min AND sucursal_id = ? "
+            "ORDER BY cantidad ASC, nombre ASC LIMIT ?",
+            (sucursal_id, limit),
+        )
+    return cur.fetchall()
+
+
+def get_recent_repairs(limit: int = 8) -> List[Tuple[str, str, str, str, float]]:
+    cur = _ensure_conn().cursor()
+    cur.execute(
+        """
+        SELECT r.fecha, c.nombre, d.marca || ' ' || d.modelo, r.estado, r.total
+        FROM reparaciones r
+        JOIN dispositivos d ON r.dispositivo_id = d.id
+        JOIN clientes c ON d.cliente_id = c.id
+        ORDER BY r.fecha DESC
+        LIMIT ?
+        """,
+        (limit,),
+    )
+    return cur.fetchall()
+
+def listar_clientes():
+    cur = _ensure_conn().cursor()
+    cur.execute("SELECT id, nombre FROM clientes ORDER BY id")
+    return cur.fetchall()
+
+
+_CLIENTES_DETALLE = "SELECT id, nombre, telefono, email, direccion, nif, notas FROM clientes"
+
+
+def get_cliente_detallado(cliente_id: int) -> Optional[tuple]:
+    """Return one client with the columns of :func:`listar_clientes_paginado`."""
+    cur = _ensure_conn().cursor()
+    cur.execute(f"{_CLIENTES_DETALLE} WHERE id = ?", (cliente_id,))
+    return cur.fetchone()
+
+
+def listar_clientes_detallado() -> List[Tuple[int, str, Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]]:
+    cur = _ensure_conn().cursor()
+    cur.execute(
+        "SELECT id, nombre, telefono, email, direccion, nif, notas FROM clientes ORDER BY id"
+    )
+    return cur.fetchall()
+
+
+def listar_clientes_paginado(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    nombre: Optional[str] = None,
+    telefono: Optional[str] = None,
+    email: Optional[str] = None,
+) -> Page:
+    """Return one page of detailed clients, optionally by name, phone or email prefix.
+
+    With a prefix filter rows come ordered by the first filtered column.
+    """
+    conditions: List[str] = []
+    params: List[object] = []
+    prefix_key = _add_prefix_filters(
+        conditions, params, {"nombre": (nombre, 1), "telefono": (telefono, 2), "email": (email, 3)}
+    )
+    return _fetch_page(
+        _CLIENTES_DETALLE,
+        "id",
+        conditions,
+        params,
+        cursor,
+        limit,
+        prefix_key,
+    )
+
+
+def add_cliente(
+    nombre: str,
+    *,
+    telefono: Optional[str] = None,
+    email: Optional[str] = None,
+    direccion: Optional[str] = None,
+    nif: Optional[str] = None,
+    notas: Optional[str] = None,
+) -> Optional[int]:
+    def op(conn: sqlite3.Connection) -> Optional[int]:
+        if find_client_by_name(nombre) is not None:
+            return None
+        cur = conn.execute(
+            "INSERT INTO clientes (nombre, telefono, email, direccion, nif, notas) VALUES (?, ?, ?, ?, ?, ?)",
+            (nombre, telefono, email, direccion, nif, notas),
+        )
+        return cur.lastrowid
+
+    return _run_write(op)
+
+
+def update_cliente(cliente_id: int, **campos) -> bool:
+    if not campos:
+        return False
+    fields = []
+    params: List[object] = []
+    for key, value in campos.items():
+        if key not in {"nombre", "telefono", "email", "direccion", "nif", "notas"}:
+            continue
+        fields.append(f"{key} = ?")
+        params.append(value)
+    if not fields:
+        return False
+    params.append(cliente_id)
+
+    def op(conn: sqlite3.Connection) -> bool:
+        cur = conn.cursor()
+        if "nombre" in campos:
+            # Nombre ya usado por otro cliente (idx_clientes_nombre_unique)
+            cur.execute("SELECT 1 FROM clientes WHERE nombre = ? AND id != ?", (campos["nombre"], cliente_id))
+            if cur.fetchone():
+                return False
+        cur.execute(f"UPDATE clientes SET {', '.join(fields)} WHERE id = ?", params)
+        return cur.rowcount > 0
+
+    return _run_write(op)
+
+def delete_cliente(cliente_id: int) -> bool:
+    return _execute_write("DELETE FROM clientes WHERE id = ?", (cliente_id,)).rowcount > 0
+
+
+def iter_table(table: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[tuple]:
+    """Stream all rows of ``table`` in constant memory.
+
+    Rows are fetched from SQLite ``chunk_size`` at a time; raises
+    ``ValueError`` for unknown tables.
+    """
+    _check_table(table)
+    return _iter_query(f'SELECT * FROM "{table}"', (), chunk_size)
+
+
+# --- Dispositivos y Reparaciones ---
+
+def find_client_by_name(nombre: str) -> Optional[int]:
+    cur = _ensure_conn().cursor()
+    cur.execute("SELECT id FROM clientes WHERE nombre = ?", (nombre,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def add_client(nombre: str) -> int:
+    def op(conn: sqlite3.Connection) -> int:
+        cid = find_client_by_name(nombre)
+        if cid is not None:
+            return cid
+        return add_cliente(nombre)
+
+    return _run_write(op)
+
+
+def find_device(cliente_id: int, marca: str, modelo: str, imei: Optional[str] = None) -> Optional[int]:
+    cur = _ensure_conn().cursor()
+    cur.execute(
+        """
+        SELECT id FROM dispositivos
+        WHERE cliente_id = ? AND marca = ? AND modelo = ? AND (imei = ? OR (imei IS NULL AND ? IS NULL))
+        """,
         (cliente_id, marca, modelo, imei, imei),
     )
     row = cur.fetchone()
@@ -896,22 +2501,22 @@ def add_device(
     If a device with same cliente/marca/modelo/imei exists or the serial number is
     already used, return None.
     """
-    did = find_device(cliente_id, marca, modelo, imei)
-    if did is not None:
-        return did
-    if n_serie and find_device_by_serial(n_serie) is not None:
-        return None
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO dispositivos (cliente_id, marca, modelo, imei, n_serie, color, accesorios)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (cliente_id, marca, modelo, imei, n_serie, color, accesorios),
-    )
-    conn.commit()
-    return cur.lastrowid
+    def op(conn: sqlite3.Connection) -> Optional[int]:
+        did = find_device(cliente_id, marca, modelo, imei)
+        if did is not None:
+            return did
+        if n_serie and find_device_by_serial(n_serie) is not None:
+            return None
+        cur = conn.execute(
+            """
+            INSERT INTO dispositivos (cliente_id, marca, modelo, imei, n_serie, color, accesorios)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (cliente_id, marca, modelo, imei, n_serie, color, accesorios),
+        )
+        return cur.lastrowid
+
+    return _run_write(op)
 
 
 def listar_dispositivos() -> List[Tuple[int, int, str, str, str, Optional[str]]]:
@@ -928,6 +2533,20 @@ def listar_dispositivos() -> List[Tuple[int, int, str, str, str, Optional[str]]]
     return cur.fetchall()
 
 
+_DISPOSITIVOS_DETALLE = """
+    SELECT d.id, d.cliente_id, c.nombre, d.marca, d.modelo, d.imei, d.n_serie, d.color, d.accesorios
+    FROM dispositivos d
+    JOIN clientes c ON d.cliente_id = c.id
+"""
+
+
+def get_dispositivo_detallado(device_id: int) -> Optional[tuple]:
+    """Return one device with the columns of :func:`listar_dispositivos_paginado`."""
+    cur = _ensure_conn().cursor()
+    cur.execute(f"{_DISPOSITIVOS_DETALLE} WHERE d.id = ?", (device_id,))
+    return cur.fetchone()
+
+
 def listar_dispositivos_detallado() -> List[
     Tuple[int, int, str, Optional[str], Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]
 ]:
@@ -943,6 +2562,48 @@ def listar_dispositivos_detallado() -> List[
     return cur.fetchall()
 
 
+def listar_dispositivos_paginado(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    cliente_id: Optional[int] = None,
+    marca: Optional[str] = None,
+    cliente: Optional[str] = None,
+    marca_prefix: Optional[str] = None,
+    modelo: Optional[str] = None,
+    imei: Optional[str] = None,
+) -> Page:
+    """Return one page of detailed devices.
+
+    Filters by client id, exact brand and by client name, brand, model or
+    IMEI prefix. With a prefix filter rows come ordered by the first
+    filtered column; when also filtered by client id, or by client name,
+    the client's devices are sorted per page.
+    """
+    conditions: List[str] = []
+    params: List[object] = []
+    if cliente_id is not None:
+        conditions.append("d.cliente_id = ?")
+        params.append(cliente_id)
+    if marca:
+        conditions.append("d.marca = ?")
+        params.append(marca)
+    prefix_key = _add_prefix_filters(
+        conditions,
+        params,
+        {"c.nombre": (cliente, 2), "d.marca": (marca_prefix, 3), "d.modelo": (modelo, 4), "d.imei": (imei, 5)},
+    )
+    return _fetch_page(
+        _DISPOSITIVOS_DETALLE,
+        "d.id",
+        conditions,
+        params,
+        cursor,
+        limit,
+        prefix_key,
+    )
+
+
 def listar_dispositivos_por_cliente(cliente_id: int) -> List[
     Tuple[int, int, str, Optional[str], Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]
 ]:
@@ -981,19 +2642,39 @@ def update_device(device_id: int, **campos) -> bool:
     if not fields:
         return False
     params.append(device_id)
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(f"UPDATE dispositivos SET {', '.join(fields)} WHERE id = ?", params)
-    conn.commit()
-    return cur.rowcount > 0
+
+    def op(conn: sqlite3.Connection) -> bool:
+        cur = conn.cursor()
+        if {"marca", "modelo", "imei"} & campos.keys():
+            # No puede coincidir con otro dispositivo del cliente (idx_dispositivos_clave_unique)
+            cur.execute("SELECT cliente_id, marca, modelo, imei FROM dispositivos WHERE id = ?", (device_id,))
+            row = cur.fetchone()
+            if row is None:
+                return False
+            cliente_id, marca, modelo, imei = row
+            cur.execute(
+                """
+                SELECT 1 FROM dispositivos
+                WHERE cliente_id = ? AND marca = ? AND modelo = ? AND ifnull(imei, '') = ifnull(?, '') AND id != ?
+                """,
+                (
+                    cliente_id,
+                    campos.get("marca", marca),
+                    campos.get("modelo", modelo),
+                    campos.get("imei", imei),
+                    device_id,
+                ),
+            )
+            if cur.fetchone():
+                return False
+        cur.execute(f"UPDATE dispositivos SET {', '.join(fields)} WHERE id = ?", params)
+        return cur.rowcount > 0
+
+    return _run_write(op)
 
 
 def delete_device(device_id: int) -> bool:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM dispositivos WHERE id = ?", (device_id,))
-    conn.commit()
-    return cur.rowcount > 0
+    return _execute_write("DELETE FROM dispositivos WHERE id = ?", (device_id,)).rowcount > 0
 
 
 def add_repair(
@@ -1019,42 +2700,43 @@ def add_repair(
     accesorios_entregados: str,
 ) -> int:
     """Insert a new repair with extended fields."""
-    cid = add_client(cliente_nombre)
-    did = add_device(cid, marca, modelo, None, None, None, None)
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO reparaciones (
-            dispositivo_id, descripcion, costo, estado, diagnostico, acciones,
-            piezas_usadas, costo_mano_obra, deposito_pagado, total, saldo,
-            prioridad, tecnico, tiempo_estimado, garantia_dias, pass_bloqueo,
-            respaldo_datos, accesorios_entregados
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            did,
-            descripcion,
-            costo_piezas,
-            estado,
-            diagnostico,
-            acciones,
-            piezas_usadas,
-            costo_mano_obra,
-            deposito_pagado,
-            total,
-            saldo,
-            prioridad,
-            tecnico,
-            tiempo_estimado,
-            garantia_dias,
-            pass_bloqueo,
-            int(respaldo_datos),
-            accesorios_entregados,
-        ),
-    )
-    conn.commit()
-    return cur.lastrowid
+
+    def op(conn: sqlite3.Connection) -> int:
+        cid = add_client(cliente_nombre)
+        did = add_device(cid, marca, modelo, None, None, None, None)
+        cur = conn.execute(
+            """
+            INSERT INTO reparaciones (
+                dispositivo_id, descripcion, costo, estado, diagnostico, acciones,
+                piezas_usadas, costo_mano_obra, deposito_pagado, total, saldo,
+                prioridad, tecnico, tiempo_estimado, garantia_dias, pass_bloqueo,
+                respaldo_datos, accesorios_entregados
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                did,
+                descripcion,
+                costo_piezas,
+                estado,
+                diagnostico,
+                acciones,
+                piezas_usadas,
+                costo_mano_obra,
+                deposito_pagado,
+                total,
+                saldo,
+                prioridad,
+                tecnico,
+                tiempo_estimado,
+                garantia_dias,
+                pass_bloqueo,
+                int(respaldo_datos),
+                accesorios_entregados,
+            ),
+        )
+        return cur.lastrowid
+
+    return _run_write(op)
 
 
 def update_repair(repair_id: int, **campos) -> bool:
@@ -1093,14 +2775,11 @@ def update_repair(repair_id: int, **campos) -> bool:
     if not fields:
         return False
     params.append(repair_id)
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         f"UPDATE reparaciones SET {', '.join(fields)} WHERE id = ?",
         params,
     )
-    conn.commit()
-    return cur.rowcount > 0
+    return result.rowcount > 0
 
 
 def assign_repair(
@@ -1118,12 +2797,35 @@ def assign_repair(
     )
 
 
+def _day(value: str) -> date:
+    # Acepta 'YYYY-MM-DD' o una marca de tiempo completa
+    return date.fromisoformat(value.strip()[:10])
+
+
 def get_tasks_by_date(fecha: str) -> List[Tuple[int, str, str]]:
-    """Return repairs scheduled for a specific date."""
+    """Return repairs scheduled for a specific date (none if it is malformed)."""
+    try:
+        day = _day(fecha)
+    except ValueError:
+        return []
+    cur = _ensure_conn().cursor()
+    cur.execute(
+        "SELECT id, descripcion, tecnico FROM reparaciones WHERE fecha >= ? AND fecha < ?",
+        (day.isoformat(), (day + timedelta(days=1)).isoformat()),
+    )
+    return cur.fetchall()
+
+
+def get_tasks_by_range(start: str, end: str) -> List[Tuple[int, str, str, str]]:
+    """Return repairs dated from ``start`` (inclusive) to ``end`` (exclusive).
+
+    Each tuple contains (id, descripcion, tecnico, fecha), ordered by date.
+    """
     cur = _ensure_conn().cursor()
     cur.execute(
-        "SELECT id, descripcion, tecnico FROM reparaciones WHERE date(fecha) = date(?)",
-        (fecha,),
+        "SELECT id, descripcion, tecnico, fecha FROM reparaciones "
+        "WHERE fecha >= ? AND fecha < ? ORDER BY fecha",
+        (_day(start).isoformat(), _day(end).isoformat()),
     )
     return cur.fetchall()
 
@@ -1195,68 +2897,54 @@ def get_productivity_metrics(sucursal_id: int | None = None) -> List[Tuple[str,
     return cur.fetchall()
 
 
-def get_financial_summary(sucursal_id: int | None = None) -> List[Tuple[str, float, float, float]]:
+def get_financial_summary(sucursal_id: int | None = None) -> List[Tuple[Optional[str], float, float, float]]:
     """Return financial summary per month.
 
     Each tuple contains:
         (period, ingresos, costos, margen)
+
+    Amounts are rounded to cents. Invoices and repairs without a valid date
+    are grouped under period ``None``, listed first.
     """
     cur = _ensure_conn().cursor()
-    # Ingresos por mes
-    if sucursal_id is None:
-        cur.execute(
-            """
-            SELECT strftime('%Y-%m', fecha) AS periodo, SUM(total)
-            FROM facturas
-            GROUP BY periodo
-            ORDER BY periodo
-            """
-        )
-    else:
-        cur.execute(
-            """
-            SELECT strftime('%Y-%m', fecha) AS periodo, SUM(total)
-            FROM facturas
-            WHERE sucursal_id = ?
-            GROUP BY periodo
-            ORDER BY periodo
-            """,
-            (sucursal_id,),
-        )
-    ingresos = {period: total or 0.0 for period, total in cur.fetchall()}
+    # Lee el resumen materializado en lugar de agregar facturas y reparaciones
+    query = "SELECT periodo, SUM(ingresos_cents), SUM(costos_cents) FROM resumen_mensual"
+    params: List[object] = []
+    if sucursal_id is not None:
+        query += " WHERE sucursal_id = ?"
+        params.append(sucursal_id)
+    query += " GROUP BY periodo HAVING SUM(n_facturas) + SUM(n_reparaciones) > 0 ORDER BY periodo"
+    cur.execute(query, params)
+    summary: List[Tuple[Optional[str], float, float, float]] = []
+    for period, ingresos, costos in cur.fetchall():
+        summary.append((period or None, ingresos / 100, costos / 100, (ingresos - costos) / 100))
+    return summary
 
-    # Costos por mes
+
+def iter_reparaciones(
+    sucursal_id: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[tuple]:
+    """Stream every column of the repairs, optionally for one branch."""
     if sucursal_id is None:
-        cur.execute(
-            """
-            SELECT strftime('%Y-%m', fecha) AS periodo,
-                   SUM(COALESCE(costo, 0) + COALESCE(costo_mano_obra, 0))
-            FROM reparaciones
-            GROUP BY periodo
-            ORDER BY periodo
-            """
-        )
-    else:
-        cur.execute(
-            """
-            SELECT strftime('%Y-%m', fecha) AS periodo,
-                   SUM(COALESCE(costo, 0) + COALESCE(costo_mano_obra, 0))
-            FROM reparaciones
-            WHERE sucursal_id = ?
-            GROUP BY periodo
-            ORDER BY periodo
-            """,
-            (sucursal_id,),
-        )
-    costos = {period: total or 0.0 for period, total in cur.fetchall()}
+        return _iter_query("SELECT * FROM reparaciones ORDER BY id", (), chunk_size)
+    return _iter_query(
+        "SELECT * FROM reparaciones WHERE sucursal_id = ? ORDER BY id",
+        (sucursal_id,),
+        chunk_size,
+    )
 
-    periods = sorted(set(ingresos) | set(costos))
-    summary: List[Tuple[str, float, float, float]] = []
-    for period in periods:
-        inc = ingresos.get(period, 0.0)
-        cost = costos.get(period, 0.0)
-        summary.append((period, inc, cost, inc - cost))
-    return summary
+
+def iter_facturas(
+    sucursal_id: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[tuple]:
+    """Stream every column of the invoices, optionally for one branch."""
+    if sucursal_id is None:
+        return _iter_query("SELECT * FROM facturas ORDER BY id", (), chunk_size)
+    return _iter_query(
+        "SELECT * FROM facturas WHERE sucursal_id = ? ORDER BY id",
+        (sucursal_id,),
+        chunk_size,
+    )
 
 
 # --- Inventario ---
@@ -1287,16 +2975,16 @@ def find_product_by_name(nombre: str, sucursal_id: int | None = None) -> Optiona
 
 
 def add_product(nombre: str, cantidad: int, *, sucursal_id: int | None = None) -> Optional[int]:
-    if find_product_by_name(nombre, sucursal_id) is not None:
-        return None
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO inventario (nombre, cantidad, sucursal_id) VALUES (?, ?, ?)",
-        (nombre, cantidad, sucursal_id),
-    )
-    conn.commit()
-    return cur.lastrowid
+    def op(conn: sqlite3.Connection) -> Optional[int]:
+        if find_product_by_name(nombre, sucursal_id) is not None:
+            return None
+        cur = conn.execute(
+            "INSERT INTO inventario (nombre, cantidad, sucursal_id) VALUES (?, ?, ?)",
+            (nombre, cantidad, sucursal_id),
+        )
+        return cur.lastrowid
+
+    return _run_write(op)
 
 
 def update_product(product_id: int, *, name: Optional[str] = None, quantity: Optional[int] = None) -> bool:
@@ -1311,19 +2999,25 @@ def update_product(product_id: int, *, name: Optional[str] = None, quantity: Opt
         fields.append("cantidad = ?")
         params.append(quantity)
     params.append(product_id)
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(f"UPDATE inventario SET {', '.join(fields)} WHERE id = ?", params)
-    conn.commit()
-    return cur.rowcount > 0
+    result = _execute_write(f"UPDATE inventario SET {', '.join(fields)} WHERE id = ?", params)
+    return result.rowcount > 0
 
 
 def delete_product(product_id: int) -> bool:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM inventario WHERE id = ?", (product_id,))
-    conn.commit()
-    return cur.rowcount > 0
+    return _execute_write("DELETE FROM inventario WHERE id = ?", (product_id,)).rowcount > 0
+
+
+_PRODUCTOS_DETALLE = """
+    SELECT id, sku, nombre, categoria, cantidad, stock_min, costo, precio, ubicacion, proveedor, notas
+    FROM inventario
+"""
+
+
+def get_producto_detallado(product_id: int) -> Optional[tuple]:
+    """Return one product with the columns of :func:`listar_productos_paginado`."""
+    cur = _ensure_conn().cursor()
+    cur.execute(f"{_PRODUCTOS_DETALLE} WHERE id = ?", (product_id,))
+    return cur.fetchone()
 
 
 def listar_productos_detallado() -> List[
@@ -1352,6 +3046,47 @@ def listar_productos_detallado() -> List[
     return cur.fetchall()
 
 
+def listar_productos_paginado(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    nombre: Optional[str] = None,
+    categoria: Optional[str] = None,
+    sucursal_id: int | None = None,
+    sku: Optional[str] = None,
+    categoria_prefix: Optional[str] = None,
+    proveedor: Optional[str] = None,
+) -> Page:
+    """Return one page of detailed products.
+
+    Filters by name, SKU, category or supplier prefix, by exact category
+    and by branch are optional. With a prefix filter rows come ordered by
+    the first filtered column.
+    """
+    conditions: List[str] = []
+    params: List[object] = []
+    if categoria:
+        conditions.append("categoria = ?")
+        params.append(categoria)
+    prefix_key = _add_prefix_filters(
+        conditions,
+        params,
+        {"nombre": (nombre, 2), "sku": (sku, 1), "categoria": (categoria_prefix, 3), "proveedor": (proveedor, 9)},
+    )
+    if sucursal_id is not None:
+        conditions.append("sucursal_id = ?")
+        params.append(sucursal_id)
+    return _fetch_page(
+        _PRODUCTOS_DETALLE,
+        "id",
+        conditions,
+        params,
+        cursor,
+        limit,
+        prefix_key,
+    )
+
+
 def add_product_ext(
     sku: Optional[str],
     nombre: str,
@@ -1364,38 +3099,37 @@ def add_product_ext(
     proveedor: Optional[str],
     notas: Optional[str],
 ) -> Optional[int]:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    if sku:
-        cur.execute("SELECT id FROM inventario WHERE sku = ?", (sku,))
-        if cur.fetchone():
-            return None
-    cur.execute(
-        """
-        INSERT INTO inventario (sku, nombre, categoria, cantidad, stock_min, costo, precio, ubicacion, proveedor, notas)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            sku or None,
-            nombre,
-            categoria or None,
-            cantidad,
-            stock_min,
-            costo,
-            precio,
-            ubicacion or None,
-            proveedor or None,
-            notas or None,
-        ),
-    )
-    conn.commit()
-    return cur.lastrowid
+    def op(conn: sqlite3.Connection) -> Optional[int]:
+        cur = conn.cursor()
+        if sku:
+            cur.execute("SELECT id FROM inventario WHERE sku = ?", (sku,))
+            if cur.fetchone():
+                return None
+        cur.execute(
+            """
+            INSERT INTO inventario (sku, nombre, categoria, cantidad, stock_min, costo, precio, ubicacion, proveedor, notas)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                sku or None,
+                nombre,
+                categoria or None,
+                cantidad,
+                stock_min,
+                costo,
+                precio,
+                ubicacion or None,
+                proveedor or None,
+                notas or None,
+            ),
+        )
+        return cur.lastrowid
 
+    return _run_write(op)
 
-def update_product_ext(product_id: int, **campos) -> bool:
-    if not campos:
-        return False
-    allowed = {
+
+_PRODUCT_FIELDS = frozenset(
+    {
         "sku",
         "nombre",
         "categoria",
@@ -1407,31 +3141,62 @@ def update_product_ext(product_id: int, **campos) -> bool:
         "proveedor",
         "notas",
     }
+)
+
+
+def _update_product(cur: sqlite3.Cursor, product_id: int, campos: dict) -> bool:
     fields: List[str] = []
     params: List[object] = []
-    if "sku" in campos and campos["sku"]:
-        cur = _ensure_conn().cursor()
-        cur.execute(
-            "SELECT id FROM inventario WHERE sku = ? AND id != ?",
-            (campos["sku"], product_id),
-        )
-        if cur.fetchone():
-            return False
     for key, value in campos.items():
-        if key not in allowed:
+        if key not in _PRODUCT_FIELDS:
             continue
         fields.append(f"{key} = ?")
         params.append(value)
     if not fields:
         return False
+    if campos.get("sku"):
+        cur.execute(
+            "SELECT id FROM inventario WHERE sku = ? AND id != ?",
+            (campos["sku"], product_id),
+        )
+        if cur.fetchone():
+            return False
     params.append(product_id)
-    conn = _ensure_conn()
-    cur = conn.cursor()
     cur.execute(f"UPDATE inventario SET {', '.join(fields)} WHERE id = ?", params)
-    conn.commit()
     return cur.rowcount > 0
 
 
+def update_product_ext(product_id: int, **campos) -> bool:
+    if not _PRODUCT_FIELDS.intersection(campos):
+        return False
+    return _run_write(lambda conn: _update_product(conn.cursor(), product_id, campos))
+
+
+def update_products_ext(changes: Iterable[Tuple[int, dict]]) -> List[bool]:
+    """Apply several :func:`update_product_ext` changes in one transaction.
+
+    ``changes`` holds ``(product_id, campos)`` pairs. Returns one flag per
+    pair: a pair fails for the same reasons as the single-row version or
+    when it breaks a constraint, and a failure does not undo the others.
+    """
+    changes = list(changes)
+    if not changes:
+        return []
+
+    def op(conn: sqlite3.Connection) -> List[bool]:
+        cur = conn.cursor()
+        results = []
+        for product_id, campos in changes:
+            try:
+                results.append(_update_product(cur, product_id, campos))
+            except sqlite3.IntegrityError:
+                # SQLite deshace solo la sentencia fallida, no la transacción
+                results.append(False)
+        return results
+
+    return _run_write(op)
+
+
 # --- Repuestos ---
 
 def add_repuesto(
@@ -1442,52 +3207,56 @@ def add_repuesto(
     stock_min: int = 0,
     *,
     sucursal_id: int | None = None,
-) -> int:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+) -> Optional[int]:
+    """Add a spare part and return its id.
+
+    A part is identified by its name within its branch; if that part already
+    exists nothing is written and ``None`` is returned, as in
+    :func:`add_cliente`.
+    """
+    result = _execute_write(
         """
         INSERT INTO repuestos (nombre, stock, stock_min, proveedor, precio, sucursal_id)
         VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
         """,
         (nombre, stock, stock_min, proveedor, precio, sucursal_id),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid if result.rowcount > 0 else None
 
 
 def use_repuesto(repuesto_id: int, cantidad: int = 1) -> bool:
-    cur = _ensure_conn().cursor()
-    cur.execute("SELECT stock FROM repuestos WHERE id = ?", (repuesto_id,))
-    row = cur.fetchone()
-    if not row or row[0] < cantidad:
-        return False
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE repuestos SET stock = stock - ? WHERE id = ?",
-        (cantidad, repuesto_id),
-    )
-    conn.commit()
-    return True
+    def op(conn: sqlite3.Connection) -> bool:
+        cur = conn.cursor()
+        cur.execute("SELECT stock FROM repuestos WHERE id = ?", (repuesto_id,))
+        row = cur.fetchone()
+        if not row or row[0] < cantidad:
+            return False
+        cur.execute(
+            "UPDATE repuestos SET stock = stock - ? WHERE id = ?",
+            (cantidad, repuesto_id),
+        )
+        return True
+
+    return _run_write(op)
 
 
 def assign_repuesto_to_repair(
     repair_id: int, repuesto_id: int, cantidad: int = 1
 ) -> bool:
-    if not use_repuesto(repuesto_id, cantidad):
-        return False
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO reparacion_repuestos (reparacion_id, repuesto_id, cantidad)
-        VALUES (?, ?, ?)
-        """,
-        (repair_id, repuesto_id, cantidad),
-    )
-    conn.commit()
-    return True
+    def op(conn: sqlite3.Connection) -> bool:
+        if not use_repuesto(repuesto_id, cantidad):
+            return False
+        conn.execute(
+            """
+            INSERT INTO reparacion_repuestos (reparacion_id, repuesto_id, cantidad)
+            VALUES (?, ?, ?)
+            """,
+            (repair_id, repuesto_id, cantidad),
+        )
+        return True
+
+    return _run_write(op)
 
 
 def get_low_stock_repuestos(limit: int = 8, sucursal_id: int | None = None) -> List[Tuple[str, int, int]]:
@@ -1511,44 +3280,406 @@ def transfer_repuesto(
     nombre: str, from_sucursal: int, to_sucursal: int, cantidad: int
 ) -> bool:
     """Transfer inventory of a part between branches."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, stock, stock_min, proveedor, precio FROM repuestos WHERE nombre = ? AND sucursal_id = ?",
-        (nombre, from_sucursal),
+
+    def op(conn: sqlite3.Connection) -> bool:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, stock, stock_min, proveedor, precio FROM repuestos WHERE nombre = ? AND sucursal_id = ?",
+            (nombre, from_sucursal),
+        )
+        row = cur.fetchone()
+        if not row or row[1] < cantidad:
+            return False
+        source_id, stock, stock_min, proveedor, precio = row
+        cur.execute("UPDATE repuestos SET stock = stock - ? WHERE id = ?", (cantidad, source_id))
+        cur.execute(
+            "SELECT id FROM repuestos WHERE nombre = ? AND sucursal_id = ?",
+            (nombre, to_sucursal),
+        )
+        dest = cur.fetchone()
+        if dest:
+            cur.execute("UPDATE repuestos SET stock = stock + ? WHERE id = ?", (cantidad, dest[0]))
+        else:
+            cur.execute(
+                """
+                INSERT INTO repuestos (nombre, stock, stock_min, proveedor, precio, sucursal_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (nombre, cantidad, stock_min, proveedor, precio, to_sucursal),
+            )
+        return True
+
+    return _run_write(op)
+
+
+# --- Altas masivas ---
+
+# Filas cargadas en la tabla temporal de staging por cada paso
+BULK_CHUNK_SIZE = 5000
+
+BULK_INSERTED = "inserted"
+BULK_UPDATED = "updated"
+BULK_EXISTING = "existing"
+BULK_REJECTED = "rejected"
+
+
+class BulkResult(NamedTuple):
+    """Outcome of one row of a bulk load: the row id and a ``BULK_*`` status.
+
+    With ``upsert``, a row that matches an existing one without changing any
+    of its fields is ``existing`` rather than ``updated``.
+    """
+
+    id: Optional[int]
+    status: str
+
+
+class _BulkSpec(NamedTuple):
+    table: str
+    # Columna -> conversión del valor recibido (orden de inserción)
+    columns: dict[str, Callable[[object], object]]
+    required: Tuple[str, ...]
+    # Valor usado al insertar si la columna llega vacía
+    defaults: dict[str, object]
+    # Índice único de la clave natural (ver UNIQUE_KEYS)
+    key_index: str
+    key_of: Callable[[dict], Optional[tuple]]
+    # Condición que une la tabla (t) con el staging (s) por la clave natural
+    key_join: str
+    updatable: Tuple[str, ...]
+    # (columna, tabla) de claves foráneas comprobadas antes de insertar
+    references: Tuple[Tuple[str, str], ...] = ()
+
+
+_UNIQUE_KEYS = {name: (table, columns, where) for name, table, columns, where, _ in UNIQUE_KEYS}
+
+_BULK_CLIENTES = _BulkSpec(
+    "clientes",
+    {"nombre": str, "telefono": str, "email": str, "direccion": str, "nif": str, "notas": str},
+    ("nombre",),
+    {},
+    "idx_clientes_nombre_unique",
+    lambda row: (row["nombre"],),
+    "t.nombre = s.nombre",
+    ("telefono", "email", "direccion", "nif", "notas"),
+)
+_BULK_DISPOSITIVOS = _BulkSpec(
+    "dispositivos",
+    {
+        "cliente_id": int,
+        "marca": str,
+        "modelo": str,
+        "imei": str,
+        "n_serie": str,
+        "color": str,
+        "accesorios": str,
+    },
+    ("cliente_id", "marca", "modelo"),
+    {},
+    "idx_dispositivos_clave_unique",
+    lambda row: (row["cliente_id"], row["marca"], row["modelo"], row["imei"] or ""),
+    "t.cliente_id = s.cliente_id AND t.marca = s.marca AND t.modelo = s.modelo "
+    "AND ifnull(t.imei, '') = ifnull(s.imei, '')",
+    (),
+    (("cliente_id", "clientes"),),
+)
+_BULK_PRODUCTOS = _BulkSpec(
+    "inventario",
+    {
+        "sku": str,
+        "nombre": str,
+        "categoria": str,
+        "cantidad": int,
+        "stock_min": int,
+        "costo": float,
+        "precio": float,
+        "ubicacion": str,
+        "proveedor": str,
+        "notas": str,
+    },
+    ("nombre",),
+    {"cantidad": 0, "stock_min": 0, "costo": 0.0, "precio": 0.0},
+    "idx_inventario_sku_unique",
+    lambda row: (row["sku"],) if row["sku"] else None,
+    "t.sku = s.sku",
+    ("nombre", "categoria", "cantidad", "stock_min", "costo", "precio", "ubicacion", "proveedor", "notas"),
+)
+_BULK_REPUESTOS = _BulkSpec(
+    "repuestos",
+    {"nombre": str, "stock": int, "stock_min": int, "proveedor": str, "precio": float, "sucursal_id": int},
+    ("nombre",),
+    {"stock": 0, "stock_min": 0, "precio": 0.0},
+    "idx_repuestos_clave_unique",
+    lambda row: (row["nombre"], row["sucursal_id"] or 0),
+    "t.nombre = s.nombre AND ifnull(t.sucursal_id, 0) = ifnull(s.sucursal_id, 0)",
+    ("stock", "stock_min", "proveedor", "precio"),
+    (("sucursal_id", "sucursales"),),
+)
+
+
+def _bulk_row(spec: _BulkSpec, row: dict) -> Optional[tuple]:
+    """Normalise one input mapping into column values; ``None`` if it cannot be inserted."""
+    for column in spec.required:
+        if row.get(column) in (None, ""):
+            return None
+    values = []
+    try:
+        for column, convert in spec.columns.items():
+            value = row.get(column)
+            if value is None or value == "":
+                value = None
+            elif type(value) is not convert:
+                value = convert(value)
+            values.append(value)
+    except (TypeError, ValueError):
+        return None
+    return tuple(values)
+
+
+def _bulk_statements(spec: _BulkSpec, upsert: bool) -> Tuple[str, str, str, Optional[str], Optional[str]]:
+    """Return the staging, insert, resolve, default-filling and changed-rows statements."""
+    staging = f"temp.bulk_{spec.table}"
+    columns = ", ".join(spec.columns)
+    stage = f"INSERT INTO {staging} (pos, {columns}) VALUES ({', '.join('?' * (len(spec.columns) + 1))})"
+    resolve = f"SELECT s.pos, t.id FROM {staging} s JOIN {spec.table} t ON {spec.key_join}"
+    if not upsert:
+        values = ", ".join(
+            f"ifnull({column}, {spec.defaults[column]!r})" if column in spec.defaults else column
+            for column in spec.columns
+        )
+        insert = (
+            f"INSERT INTO {spec.table} ({columns}) SELECT {values} FROM {staging} "
+            f"WHERE true ORDER BY pos ON CONFLICT DO NOTHING"
+        )
+        return stage, insert, resolve, None, None
+    _, key, where = _UNIQUE_KEYS[spec.key_index]
+    target = f"({key}) WHERE {where}" if where else f"({key})"
+    # Un valor vacío conserva el que ya había; los valores por defecto se
+    # aplican después, solo a las filas nuevas
+    updates = ", ".join(f"{column} = ifnull(excluded.{column}, {column})" for column in spec.updatable)
+    # Las filas a las que la carga no cambia nada no se tocan
+    differs = " OR ".join(
+        f"({{new}}.{column} IS NOT NULL AND {{new}}.{column} IS NOT {{old}}.{column})" for column in spec.updatable
     )
-    row = cur.fetchone()
-    if not row or row[1] < cantidad:
-        return False
-    source_id, stock, stock_min, proveedor, precio = row
-    cur.execute("UPDATE repuestos SET stock = stock - ? WHERE id = ?", (cantidad, source_id))
+    insert = (
+        f"INSERT INTO {spec.table} ({columns}) SELECT {columns} FROM {staging} "
+        f"WHERE true ORDER BY pos ON CONFLICT {target} DO UPDATE SET {updates} "
+        f"WHERE {differs.format(new='excluded', old=spec.table)}"
+    )
+    changes = (
+        f"INSERT OR IGNORE INTO temp.bulk_changed SELECT t.id FROM {staging} s JOIN {spec.table} t "
+        f"ON {spec.key_join} WHERE {differs.format(new='s', old='t')}"
+    )
+    fill = None
+    if spec.defaults:
+        fill = (
+            f"UPDATE {spec.table} SET "
+            + ", ".join(f"{column} = ifnull({column}, {value!r})" for column, value in spec.defaults.items())
+            + " WHERE id > ? AND ("
+            + " OR ".join(f"{column} IS NULL" for column in spec.defaults)
+            + ")"
+        )
+    return stage, insert, resolve, fill, changes
+
+
+def _bulk_chunk(
+    cur: sqlite3.Cursor,
+    spec: _BulkSpec,
+    statements: Tuple[str, str, str, Optional[str], Optional[str]],
+    chunk: List[dict],
+    upsert: bool,
+) -> List[BulkResult]:
+    stage, insert, resolve, fill, changes = statements
+    staging = f"temp.bulk_{spec.table}"
+    rows = [_bulk_row(spec, row) for row in chunk]
+    cur.execute(f"DELETE FROM {staging}")
+    cur.executemany(stage, [(pos, *row) for pos, row in enumerate(rows) if row is not None])
+    staged = [pos for pos, row in enumerate(rows) if row is not None]
+    if spec.references:
+        for column, table in spec.references:
+            cur.execute(
+                f"DELETE FROM {staging} WHERE {column} IS NOT NULL "
+                f"AND NOT EXISTS (SELECT 1 FROM {table} WHERE id = {staging}.{column})"
+            )
+        cur.execute(f"SELECT pos FROM {staging} ORDER BY pos")
+        staged = [pos for (pos,) in cur.fetchall()]
+
+    cur.execute("DELETE FROM temp.bulk_changed")
+    updated: set = set()
+    if changes is not None:
+        # Filas existentes que el upsert va a modificar
+        cur.execute(changes)
+        cur.execute("SELECT id FROM temp.bulk_changed")
+        updated = {row_id for (row_id,) in cur.fetchall()}
+    cur.execute(f"SELECT ifnull(max(id), 0) FROM {spec.table}")
+    before = cur.fetchone()[0]
+    cur.execute(insert)
+    if fill is not None:
+        cur.execute(fill, (before,))
+    cur.execute(resolve)
+    ids = dict(cur.fetchall())
+    _bulk_track(cur, spec, before)
+
+    unkeyed: Iterator[int] = iter(())
+    if len(ids) < len(staged):
+        # Las filas sin clave (productos sin SKU) siempre se insertan, en orden
+        cur.execute(f"SELECT id FROM {spec.table} WHERE id > ? ORDER BY id", (before,))
+        claimed = set(ids.values())
+        unkeyed = (row_id for (row_id,) in cur.fetchall() if row_id not in claimed)
+
+    results = [BulkResult(None, BULK_REJECTED)] * len(rows)
+    # Una misma clave siempre resuelve al mismo id: basta con recordar los ids
+    seen: set = set()
+    for pos in staged:
+        row_id = ids.get(pos)
+        if row_id is None:
+            if spec.key_of(dict(zip(spec.columns, rows[pos]))) is None:
+                results[pos] = BulkResult(next(unkeyed), BULK_INSERTED)
+            # Si tenía clave, chocó con otra clave única (p. ej. número de serie)
+            continue
+        if row_id > before and row_id not in seen:
+            results[pos] = BulkResult(row_id, BULK_INSERTED)
+        else:
+            changed = upsert and (row_id > before or row_id in updated)
+            results[pos] = BulkResult(row_id, BULK_UPDATED if changed else BULK_EXISTING)
+        seen.add(row_id)
+    return results
+
+
+def _bulk_track(cur: sqlite3.Cursor, spec: _BulkSpec, before: int) -> None:
+    """Do for one chunk what the per-row triggers skip during a bulk load.
+
+    The rows inserted (ids above ``before``) and the updated ones already
+    listed in ``temp.bulk_changed`` get their search index entries, one
+    ``table_versions`` bump and their ``row_changes`` entries, each with a
+    single statement.
+    """
+    table = spec.table
+    cur.execute(f"INSERT OR IGNORE INTO temp.bulk_changed SELECT id FROM {table} WHERE id > ?", (before,))
+    cur.execute("SELECT 1 FROM temp.bulk_changed LIMIT 1")
+    if cur.fetchone() is None:
+        return
+
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+    if table in SEARCH_KINDS and cur.fetchone():
+        code = SEARCH_KINDS[table][0]
+        cur.execute(
+            f"DELETE FROM search_index WHERE rowid IN "
+            f"(SELECT id * 4 + {code} FROM temp.bulk_changed WHERE id <= ?)",
+            (before,),
+        )
+        cur.execute(
+            f"INSERT INTO search_index (rowid, kind, titulo, detalle, extra) {_search_rows(table)} "
+            f"WHERE t.id IN (SELECT id FROM temp.bulk_changed)"
+        )
+    cur.execute("UPDATE table_versions SET version = version + 1 WHERE tabla = ?", (table,))
+    # Igual que trg_{tabla}_changes_ai/au: las filas nuevas guardan su seq como creado
     cur.execute(
-        "SELECT id FROM repuestos WHERE nombre = ? AND sucursal_id = ?",
-        (nombre, to_sucursal),
+        """
+        INSERT INTO row_changes (tabla, fila_id, seq, creado, borrado)
+        SELECT ?, id, seq, CASE WHEN id > ? THEN seq ELSE 0 END, 0 FROM (
+            SELECT id, (SELECT ifnull(max(seq), 0) FROM row_changes) + row_number() OVER (ORDER BY id) AS seq
+            FROM temp.bulk_changed
+        )
+        WHERE true
+        ON CONFLICT (tabla, fila_id) DO UPDATE SET
+            seq = excluded.seq,
+            creado = CASE WHEN excluded.creado > 0 THEN excluded.creado ELSE creado END,
+            borrado = 0
+        """,
+        (table, before),
     )
-    dest = cur.fetchone()
-    if dest:
-        cur.execute("UPDATE repuestos SET stock = stock + ? WHERE id = ?", (cantidad, dest[0]))
-    else:
+
+
+def _bulk_load(spec: _BulkSpec, rows: Iterable[dict], upsert: bool) -> List[BulkResult]:
+    """Load ``rows`` through a temporary staging table in one transaction.
+
+    Each chunk is written to the staging table with ``executemany`` and then
+    moved with a single ``INSERT ... SELECT ... ON CONFLICT``. Meanwhile a
+    ``bulk_load`` row makes the per-row triggers of the table (search index,
+    change counters, change log) skip, and :func:`_bulk_track` updates them
+    once per chunk instead.
+    """
+    statements = _bulk_statements(spec, upsert)
+
+    def op(conn: sqlite3.Connection) -> List[BulkResult]:
+        cur = conn.cursor()
         cur.execute(
-            """
-            INSERT INTO repuestos (nombre, stock, stock_min, proveedor, precio, sucursal_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (nombre, cantidad, stock_min, proveedor, precio, to_sucursal),
+            f"CREATE TEMP TABLE IF NOT EXISTS bulk_{spec.table} "
+            f"(pos INTEGER PRIMARY KEY, {', '.join(spec.columns)})"
         )
-    conn.commit()
-    return True
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_changed (id INTEGER PRIMARY KEY)")
+        # Se borra antes del commit: ninguna otra conexión llega a verla
+        cur.execute("INSERT INTO bulk_load (tabla) VALUES (?)", (spec.table,))
+        try:
+            results: List[BulkResult] = []
+            chunk: List[dict] = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= BULK_CHUNK_SIZE:
+                    results.extend(_bulk_chunk(cur, spec, statements, chunk, upsert))
+                    chunk = []
+            if chunk:
+                results.extend(_bulk_chunk(cur, spec, statements, chunk, upsert))
+        finally:
+            cur.execute("DELETE FROM bulk_load WHERE tabla = ?", (spec.table,))
+        cur.execute(f"DELETE FROM temp.bulk_{spec.table}")
+        cur.execute("DELETE FROM temp.bulk_changed")
+        return results
+
+    return _run_write(op)
+
+
+def add_clientes(rows: Iterable[dict], *, upsert: bool = False) -> List[BulkResult]:
+    """Insert many clients in one transaction.
+
+    ``rows`` are mappings with the keyword arguments of :func:`add_cliente`.
+    The client name is the natural key: an existing name is reported as
+    ``existing``, or updated with the non-empty fields when ``upsert`` is
+    true. Rows without a name are ``rejected``. Returns one
+    :class:`BulkResult` per row, in order.
+    """
+    return _bulk_load(_BULK_CLIENTES, rows, upsert)
+
+
+def add_devices(rows: Iterable[dict]) -> List[BulkResult]:
+    """Insert many devices in one transaction.
+
+    ``rows`` are mappings with the arguments of :func:`add_device`; ``marca``
+    and ``modelo`` are required. As in :func:`add_device`, a device already
+    registered for the client is ``existing`` and one whose serial number is
+    taken, or whose client does not exist, is ``rejected``.
+    """
+    return _bulk_load(_BULK_DISPOSITIVOS, rows, False)
+
+
+def add_products_ext(rows: Iterable[dict], *, upsert: bool = False) -> List[BulkResult]:
+    """Insert many products in one transaction.
+
+    ``rows`` are mappings with the arguments of :func:`add_product_ext`;
+    missing quantities and prices default to 0. The SKU is the natural key:
+    with ``upsert`` an existing SKU gets the non-empty fields of the row,
+    otherwise it is reported as ``existing``. Products without SKU are always
+    inserted.
+    """
+    return _bulk_load(_BULK_PRODUCTOS, rows, upsert)
+
+
+def add_repuestos(rows: Iterable[dict], *, upsert: bool = False) -> List[BulkResult]:
+    """Insert many spare parts in one transaction.
+
+    ``rows`` are mappings with the arguments of :func:`add_repuesto`. A part
+    is identified by its name within its branch; with ``upsert`` stock,
+    minimum, supplier and price of an existing part are replaced by the
+    non-empty fields of the row. Rows for unknown branches are ``rejected``.
+    """
+    return _bulk_load(_BULK_REPUESTOS, rows, upsert)
 
 
 # --- Sucursales y Configuración ---
 
 def add_sucursal(nombre: str) -> int:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO sucursales (nombre) VALUES (?)", (nombre,))
-    conn.commit()
-    return cur.lastrowid
+    return _execute_write("INSERT INTO sucursales (nombre) VALUES (?)", (nombre,)).lastrowid
 
 
 def list_sucursales() -> List[Tuple[int, str]]:
@@ -1558,28 +3689,31 @@ def list_sucursales() -> List[Tuple[int, str]]:
 
 
 def transfer_reparacion(reparacion_id: int, to_sucursal: int) -> bool:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         "UPDATE reparaciones SET sucursal_id = ? WHERE id = ?",
         (to_sucursal, reparacion_id),
     )
-    conn.commit()
-    return cur.rowcount > 0
+    return result.rowcount > 0
 
 
 def set_config(clave: str, valor: str, sucursal_id: int | None = None) -> None:
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO config (clave, valor, sucursal_id)
-        VALUES (?, ?, ?)
-        ON CONFLICT(clave, sucursal_id) DO UPDATE SET valor = excluded.valor
-        """,
-        (clave, valor, sucursal_id),
-    )
-    conn.commit()
+    def op(conn: sqlite3.Connection) -> None:
+        if sucursal_id is None:
+            # NULL nunca entra en conflicto con la clave primaria
+            conn.execute(
+                "DELETE FROM config WHERE clave = ? AND sucursal_id IS NULL",
+                (clave,),
+            )
+        conn.execute(
+            """
+            INSERT INTO config (clave, valor, sucursal_id)
+            VALUES (?, ?, ?)
+            ON CONFLICT(clave, sucursal_id) DO UPDATE SET valor = excluded.valor
+            """,
+            (clave, valor, sucursal_id),
+        )
+
+    _run_write(op)
 
 
 def get_config(clave: str, sucursal_id: int | None = None) -> Optional[str]:
@@ -1600,21 +3734,43 @@ def get_config(clave: str, sucursal_id: int | None = None) -> Optional[str]:
     return row[0] if row else None
 
 
+def set_db_profile(name: str) -> None:
+    """Store the SQLite performance profile and apply it to every connection.
+
+    The ``APP_DB_PROFILE`` environment variable, when set, still takes
+    precedence the next time the database is opened.
+    """
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(f"Unknown database profile: {name}")
+    set_config("db_profile", name)
+    _ensure_conn()
+    if _pool is not None:
+        _pool.set_profile(name)
+
+
+def get_db_profile() -> Tuple[str, dict[str, object]]:
+    """Return the active profile name and the pragma values in effect."""
+    conn = _ensure_conn()
+    name = _pool.profile if _pool is not None else DEFAULT_PROFILE
+    values = {
+        pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+        for pragma in PERFORMANCE_PROFILES[name]
+    }
+    return name, values
+
+
 # --- Usuarios ---
 
 def add_usuario(nombre: str, password: str, rol: str) -> int:
     validate_password(password)
     if rol not in {"admin", "tecnico", "recepcionista"}:
         raise ValueError("Invalid role")
-    conn = _ensure_conn()
-    cur = conn.cursor()
     pwd_hash, salt = hash_password(password)
-    cur.execute(
+    result = _execute_write(
         "INSERT INTO usuarios (nombre, password_hash, salt, rol) VALUES (?, ?, ?, ?)",
         (nombre, pwd_hash, salt, rol),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid
 
 
 def get_usuario(nombre: str) -> Optional[Tuple[int, str, str, str]]:
@@ -1635,13 +3791,10 @@ def create_password_reset(nombre: str, ttl_seconds: int = 3600) -> str:
     user_id = user[0]
     token = secrets.token_hex(16)
     expires = int(time.time()) + ttl_seconds
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    _execute_write(
         "INSERT INTO password_resets (usuario_id, token, expira) VALUES (?, ?, ?)",
         (user_id, token, expires),
     )
-    conn.commit()
     return token
 
 
@@ -1649,36 +3802,35 @@ def reset_password(token: str, new_password: str) -> bool:
     """Reset a user's password given a valid token."""
     validate_password(new_password)
     now = int(time.time())
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT usuario_id FROM password_resets WHERE token = ? AND expira > ?",
-        (token, now),
-    )
-    row = cur.fetchone()
-    if row is None:
-        return False
-    user_id = row[0]
     pwd_hash, salt = hash_password(new_password)
-    cur.execute(
-        "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
-        (pwd_hash, salt, user_id),
-    )
-    cur.execute("DELETE FROM password_resets WHERE token = ?", (token,))
-    conn.commit()
-    return True
+
+    def op(conn: sqlite3.Connection) -> bool:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT usuario_id FROM password_resets WHERE token = ? AND expira > ?",
+            (token, now),
+        )
+        row = cur.fetchone()
+        if row is None:
+            return False
+        user_id = row[0]
+        cur.execute(
+            "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
+            (pwd_hash, salt, user_id),
+        )
+        cur.execute("DELETE FROM password_resets WHERE token = ?", (token,))
+        return True
+
+    return _run_write(op)
 
 
 def log_audit(usuario: str, accion: str, tabla: str | None, registro_id: int | None) -> int:
     """Store an audit log entry for a critical action."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         "INSERT INTO auditoria (usuario, accion, tabla, registro_id) VALUES (?, ?, ?, ?)",
         (usuario, accion, tabla, registro_id),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid
 
 
 def get_audit_logs(usuario: str | None = None) -> List[Tuple[int, str, str, str | None, int | None, str]]:
@@ -1693,6 +3845,32 @@ def get_audit_logs(usuario: str | None = None) -> List[Tuple[int, str, str, str
     return cur.fetchall()
 
 
+def get_audit_logs_page(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    usuario: str | None = None,
+    tabla: str | None = None,
+) -> Page:
+    """Return one page of audit log entries filtered by user or table."""
+    conditions: List[str] = []
+    params: List[object] = []
+    if usuario:
+        conditions.append("usuario = ?")
+        params.append(usuario)
+    if tabla:
+        conditions.append("tabla = ?")
+        params.append(tabla)
+    return _fetch_page(
+        "SELECT id, usuario, accion, tabla, registro_id, fecha FROM auditoria",
+        "id",
+        conditions,
+        params,
+        cursor,
+        limit,
+    )
+
+
 # --- Tickets ---
 
 TICKET_STATES = ["recibido", "en reparación", "listo", "entregado"]
@@ -1700,39 +3878,42 @@ TICKET_STATES = ["recibido", "en reparación", "listo", "entregado"]
 
 def create_ticket(cliente: str, dispositivo: str, descripcion: str, fotos: Optional[List[str]] = None) -> int:
     """Create a new ticket and optional associated photos."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO tickets (cliente, dispositivo, descripcion) VALUES (?, ?, ?)",
-        (cliente, dispositivo, descripcion),
-    )
-    ticket_id = cur.lastrowid
-    if fotos:
-        cur.executemany(
-            "INSERT INTO ticket_fotos (ticket_id, ruta) VALUES (?, ?)",
-            [(ticket_id, ruta) for ruta in fotos],
+
+    def op(conn: sqlite3.Connection) -> int:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO tickets (cliente, dispositivo, descripcion) VALUES (?, ?, ?)",
+            (cliente, dispositivo, descripcion),
         )
-    # Estado inicial
-    cur.execute(
-        "INSERT INTO ticket_estados (ticket_id, estado) VALUES (?, ?)",
-        (ticket_id, "recibido"),
-    )
-    conn.commit()
-    return ticket_id
+        ticket_id = cur.lastrowid
+        if fotos:
+            cur.executemany(
+                "INSERT INTO ticket_fotos (ticket_id, ruta) VALUES (?, ?)",
+                [(ticket_id, ruta) for ruta in fotos],
+            )
+        # Estado inicial
+        cur.execute(
+            "INSERT INTO ticket_estados (ticket_id, estado) VALUES (?, ?)",
+            (ticket_id, "recibido"),
+        )
+        return ticket_id
+
+    return _run_write(op)
 
 
 def update_ticket_state(ticket_id: int, estado: str) -> None:
     """Update the ticket's current state and record it in the timeline."""
     if estado not in TICKET_STATES:
         raise ValueError("Estado inválido")
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE tickets SET estado = ? WHERE id = ?", (estado, ticket_id))
-    cur.execute(
-        "INSERT INTO ticket_estados (ticket_id, estado) VALUES (?, ?)",
-        (ticket_id, estado),
-    )
-    conn.commit()
+
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE tickets SET estado = ? WHERE id = ?", (estado, ticket_id))
+        conn.execute(
+            "INSERT INTO ticket_estados (ticket_id, estado) VALUES (?, ?)",
+            (ticket_id, estado),
+        )
+
+    _run_write(op)
 
 
 def get_ticket_timeline(ticket_id: int) -> List[Tuple[str, str]]:
@@ -1746,16 +3927,25 @@ def get_ticket_timeline(ticket_id: int) -> List[Tuple[str, str]]:
 
 
 def search_tickets(cliente: str | None = None, dispositivo: str | None = None, estado: str | None = None) -> List[Tuple[int, str, str, str]]:
-    """Search tickets by client name, device or state."""
+    """Search tickets by client name, device or state.
+
+    Client and device terms match anywhere in the text, like ``LIKE
+    '%texto%'``. The trigram index answers them without scanning every
+    ticket; without it the same ``LIKE`` runs on the table.
+    """
     cur = _ensure_conn().cursor()
     query = "SELECT id, cliente, dispositivo, estado FROM tickets WHERE 1=1"
     params: List[object] = []
-    if cliente:
-        query += " AND cliente LIKE ?"
-        params.append(f"%{cliente}%")
-    if dispositivo:
-        query += " AND dispositivo LIKE ?"
-        params.append(f"%{dispositivo}%")
+    terms = [(column, f"%{value}%") for column, value in (("cliente", cliente), ("dispositivo", dispositivo)) if value]
+    if terms and _has_search_index("search_index_tickets"):
+        query += (
+            " AND id IN (SELECT rowid FROM search_index_tickets WHERE "
+            + " AND ".join(f"{column} LIKE ?" for column, _ in terms)
+            + ")"
+        )
+    else:
+        query += "".join(f" AND {column} LIKE ?" for column, _ in terms)
+    params.extend(pattern for _, pattern in terms)
     if estado:
         query += " AND estado = ?"
         params.append(estado)
@@ -1763,6 +3953,55 @@ def search_tickets(cliente: str | None = None, dispositivo: str | None = None, e
     return cur.fetchall()
 
 
+def search(
+    query: str,
+    kinds: Optional[List[str]] = None,
+    limit: int = 20,
+) -> List[Tuple[str, int, str, float]]:
+    """Full-text search over tickets, clients, devices and repairs.
+
+    Returns ``(kind, id, title, score)`` tuples, best matches first (lower
+    score is better). ``kinds`` restricts the search to some of
+    :data:`SEARCH_KINDS`.
+    """
+    selected = list(kinds) if kinds else list(SEARCH_KINDS)
+    unknown = set(selected) - set(SEARCH_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown search kinds: {', '.join(sorted(unknown))}")
+    match = _match_expression(query)
+    if not match:
+        return []
+    cur = _ensure_conn().cursor()
+    if _has_search_index():
+        placeholders = ", ".join("?" for _ in selected)
+        cur.execute(
+            f"""
+            SELECT kind, rowid / 4, titulo, bm25(search_index, 0.0, 10.0, 5.0, 1.0) AS score
+            FROM search_index
+            WHERE search_index MATCH ? AND kind IN ({placeholders})
+            ORDER BY score
+            LIMIT ?
+            """,
+            [match, *selected, limit],
+        )
+        return cur.fetchall()
+    results: List[Tuple[str, int, str, float]] = []
+    for kind in selected:
+        _code, titulo, detalle, extra = SEARCH_KINDS[kind]
+        columns = titulo + detalle + extra
+        conditions = " AND ".join(
+            "(" + " OR ".join(f"{col} LIKE ?" for col in columns) + ")" for _ in query.split()
+        )
+        params = [f"%{word}%" for word in query.split() for _ in columns]
+        cur.execute(
+            f"SELECT '{kind}', t.id, {_search_text('t', titulo)}, 0.0 FROM {kind} t "
+            f"WHERE {conditions} ORDER BY t.id LIMIT ?",
+            [*params, limit],
+        )
+        results.extend(cur.fetchall())
+    return results[:limit]
+
+
 def add_presupuesto(
     reparacion_id: int,
     repuestos: str,
@@ -1771,60 +4010,52 @@ def add_presupuesto(
     total: float,
 ) -> int:
     """Insert a new budget for a repair."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         """
         INSERT INTO presupuestos (reparacion_id, repuestos, mano_obra, tiempo_estimado, total)
         VALUES (?, ?, ?, ?, ?)
         """,
         (reparacion_id, repuestos, mano_obra, tiempo_estimado, total),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid
 
 
 def aprobar_presupuesto(presupuesto_id: int) -> bool:
     """Mark a budget as approved by the client."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         "UPDATE presupuestos SET aprobado = 1 WHERE id = ?",
         (presupuesto_id,),
     )
-    conn.commit()
-    return cur.rowcount > 0
+    return result.rowcount > 0
 
 
 def crear_factura(reparacion_id: int, cliente_id: int, total: float) -> int:
     """Create an invoice for a repair and client."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         """
         INSERT INTO facturas (reparacion_id, cliente_id, total, pagado, saldo)
         VALUES (?, ?, ?, 0, ?)
         """,
         (reparacion_id, cliente_id, total, total),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid
 
 
 def registrar_pago(factura_id: int, monto: float) -> int:
     """Register a payment for an invoice and update its balance."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO pagos (factura_id, monto) VALUES (?, ?)",
-        (factura_id, monto),
-    )
-    cur.execute(
-        "UPDATE facturas SET pagado = pagado + ?, saldo = saldo - ? WHERE id = ?",
-        (monto, monto, factura_id),
-    )
-    conn.commit()
-    return cur.lastrowid
+
+    def op(conn: sqlite3.Connection) -> int:
+        cur = conn.execute(
+            "INSERT INTO pagos (factura_id, monto) VALUES (?, ?)",
+            (factura_id, monto),
+        )
+        conn.execute(
+            "UPDATE facturas SET pagado = pagado + ?, saldo = saldo - ? WHERE id = ?",
+            (monto, monto, factura_id),
+        )
+        return cur.lastrowid
+
+    return _run_write(op)
 
 
 def obtener_estado_factura(factura_id: int) -> Tuple[float, float, float]:
@@ -1852,14 +4083,16 @@ def deuda_cliente(cliente_id: int) -> float:
 
 
 def log_notification(destinatario: str, canal: str, mensaje: str) -> None:
-    """Store a notification event with timestamp."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    """Store a notification event with timestamp.
+
+    With the group-commit writer active the entry is queued without waiting,
+    so bursts of notifications share a single commit.
+    """
+    _execute_write(
         "INSERT INTO notificaciones (destinatario, canal, mensaje) VALUES (?, ?, ?)",
         (destinatario, canal, mensaje),
+        wait=False,
     )
-    conn.commit()
 
 
 def get_notifications(destinatario: str | None = None) -> List[Tuple[int, str, str, str]]:
@@ -1874,19 +4107,42 @@ def get_notifications(destinatario: str | None = None) -> List[Tuple[int, str, s
     return cur.fetchall()
 
 
+def get_notifications_page(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    destinatario: str | None = None,
+    canal: str | None = None,
+) -> Page:
+    """Return one page of notifications filtered by recipient or channel."""
+    conditions: List[str] = []
+    params: List[object] = []
+    if destinatario:
+        conditions.append("destinatario = ?")
+        params.append(destinatario)
+    if canal:
+        conditions.append("canal = ?")
+        params.append(canal)
+    return _fetch_page(
+        "SELECT id, destinatario, canal, fecha FROM notificaciones",
+        "id",
+        conditions,
+        params,
+        cursor,
+        limit,
+    )
+
+
 def registrar_garantia(reparacion_id: int, descripcion: str, estado: str = "abierta") -> int:
     """Register a warranty claim for a repair."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         """
         INSERT INTO garantias (reparacion_id, descripcion, estado)
         VALUES (?, ?, ?)
         """,
         (reparacion_id, descripcion, estado),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid
 
 
 def listar_garantias() -> List[Tuple[int, int, str, str, str]]:
@@ -1898,19 +4154,42 @@ def listar_garantias() -> List[Tuple[int, int, str, str, str]]:
     return cur.fetchall()
 
 
+def listar_garantias_paginado(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    estado: str | None = None,
+    reparacion_id: int | None = None,
+) -> Page:
+    """Return one page of warranty claims filtered by state or repair."""
+    conditions: List[str] = []
+    params: List[object] = []
+    if estado:
+        conditions.append("estado = ?")
+        params.append(estado)
+    if reparacion_id is not None:
+        conditions.append("reparacion_id = ?")
+        params.append(reparacion_id)
+    return _fetch_page(
+        "SELECT id, reparacion_id, descripcion, estado, fecha FROM garantias",
+        "id",
+        conditions,
+        params,
+        cursor,
+        limit,
+    )
+
+
 def registrar_devolucion(factura_id: int, motivo: str, estado: str = "pendiente") -> int:
     """Register a return associated with an invoice."""
-    conn = _ensure_conn()
-    cur = conn.cursor()
-    cur.execute(
+    result = _execute_write(
         """
         INSERT INTO devoluciones (factura_id, motivo, estado)
         VALUES (?, ?, ?)
         """,
         (factura_id, motivo, estado),
     )
-    conn.commit()
-    return cur.lastrowid
+    return result.lastrowid
 
 
 def listar_devoluciones() -> List[Tuple[int, int, str, str, str]]:
@@ -1920,3 +4199,29 @@ def listar_devoluciones() -> List[Tuple[int, int, str, str, str]]:
         "SELECT id, factura_id, motivo, estado, fecha FROM devoluciones ORDER BY id"
     )
     return cur.fetchall()
+
+
+def listar_devoluciones_paginado(
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    *,
+    estado: str | None = None,
+    factura_id: int | None = None,
+) -> Page:
+    """Return one page of returns filtered by state or invoice."""
+    conditions: List[str] = []
+    params: List[object] = []
+    if estado:
+        conditions.append("estado = ?")
+        params.append(estado)
+    if factura_id is not None:
+        conditions.append("factura_id = ?")
+        params.append(factura_id)
+    return _fetch_page(
+        "SELECT id, factura_id, motivo, estado, fecha FROM devoluciones",
+        "id",
+        conditions,
+        params,
+        cursor,
+        limit,
+    )
@@ -1,9 +1,19 @@
 # -*- coding: utf-8 -*-
-"""Utilities to export database tables to CSV or Excel files."""
+"""Export database tables (CSV, Excel, backup archives, change files) and import CSV files."""
 from __future__ import annotations
 
+import contextlib
 import csv
-from typing import List, Tuple
+import hashlib
+import io
+import itertools
+import json
+import os
+import tarfile
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
 from . import db
 
@@ -17,60 +27,343 @@ ALLOWED_TABLES = (
     "usuarios",
 )
 
+# Filas por hoja de Excel, cabecera incluida
+EXCEL_MAX_ROWS = 1_048_576
+_DATE_TYPES = ("DATE", "DATETIME", "TIMESTAMP")
 
-def _fetch_table(table: str) -> Tuple[List[str], List[Tuple]]:
-    """Return column names and all rows for the given table."""
+EXPORT_FORMATS = ("csv", "jsonl")
+# Modo de tarfile para cada compresión admitida
+ARCHIVE_COMPRESSIONS = {"gzip": "gz", "bz2": "bz2", "xz": "xz", None: ""}
+
+IMPORT_MODES = ("replace", "append", "upsert")
+# Filas por lote confirmado durante una importación
+IMPORT_BATCH_SIZE = 5000
+
+
+class RowError(NamedTuple):
+    """A CSV row that could not be imported."""
+
+    line: int
+    message: str
+
+
+class ImportSummary(NamedTuple):
+    rows: int
+    imported: int
+    errors: int
+
+
+def _stream_table(
+    table: str, chunk_size: int = db.STREAM_CHUNK_SIZE
+) -> Tuple[List[str], Iterator[Tuple]]:
+    """Return column names and a row iterator for the given table."""
     if table not in ALLOWED_TABLES:
         raise ValueError(f"Invalid table name: {table}")
-    conn = db._ensure_conn()
-    cur = conn.cursor()
-    cur.execute(f"SELECT * FROM {table}")
-    rows = cur.fetchall()
-    headers = [col[0] for col in cur.description]
-    return headers, rows
+    return db.table_columns(table), db.iter_table(table, chunk_size)
 
 
 def export_table_to_csv(table: str, filepath: str) -> None:
     """Export the given table to a CSV file."""
-    headers, rows = _fetch_table(table)
+    headers, rows = _stream_table(table)
     with open(filepath, "w", newline="", encoding="utf-8") as fh:
         writer = csv.writer(fh)
         writer.writerow(headers)
         writer.writerows(rows)
 
 
-def export_table_to_excel(table: str, filepath: str) -> None:
-    """Export the given table to an Excel file using openpyxl."""
-    headers, rows = _fetch_table(table)
+def _excel_timestamp(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _excel_converters(table: str) -> List[Optional[Callable]]:
+    """Per-column converters so timestamps are written as Excel dates."""
+    converters: List[Optional[Callable]] = []
+    for column in db.table_schema(table):
+        is_date = column.type in _DATE_TYPES or (column.default or "").upper() == "CURRENT_TIMESTAMP"
+        converters.append(_excel_timestamp if is_date else None)
+    return converters
+
+
+def write_excel(
+    filepath: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    *,
+    title: str = "Datos",
+    converters: Optional[Sequence[Optional[Callable]]] = None,
+) -> int:
+    """Write ``rows`` to an Excel file without keeping them in memory.
+
+    Uses openpyxl's write-only mode, so ``rows`` can be a cursor iterator of
+    any length. When a sheet reaches ``EXCEL_MAX_ROWS`` the rest continues in
+    a new sheet (``title_2``, ``title_3``...) with the same header.
+    ``converters`` optionally maps each column value before writing. Returns
+    the number of data rows written.
+    """
     try:
         from openpyxl import Workbook
     except Exception as exc:  # pragma: no cover - defensive
         raise RuntimeError("openpyxl is required for Excel export") from exc
-    wb = Workbook()
-    ws = wb.active
-    ws.append(headers)
+    convert = [(i, fn) for i, fn in enumerate(converters or ()) if fn is not None]
+    per_sheet = EXCEL_MAX_ROWS - 1
+    wb = Workbook(write_only=True)
+    ws = None
+    written = 0
     for row in rows:
+        if written % per_sheet == 0:
+            sheets = written // per_sheet
+            ws = wb.create_sheet(title if sheets == 0 else f"{title}_{sheets + 1}")
+            ws.append(list(headers))
+        if convert:
+            row = list(row)
+            for i, fn in convert:
+                row[i] = fn(row[i])
         ws.append(row)
+        written += 1
+    if ws is None:
+        wb.create_sheet(title).append(list(headers))
     wb.save(filepath)
+    return written
+
+
+def export_table_to_excel(table: str, filepath: str) -> None:
+    """Export the given table to an Excel file using openpyxl."""
+    headers, rows = _stream_table(table)
+    write_excel(filepath, headers, rows, title=table, converters=_excel_converters(table))
+
+
+class _HashingWriter:
+    """Text sink that writes UTF-8 to a binary file and hashes it on the way."""
 
+    def __init__(self, fh) -> None:
+        self._fh = fh
+        self.sha256 = hashlib.sha256()
+        self.size = 0
 
-def import_table_from_csv(table: str, filepath: str) -> None:
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self.sha256.update(data)
+        self._fh.write(data)
+        self.size += len(data)
+        return len(text)
+
+
+def _dump_table(table: str, path: str, fmt: str) -> dict:
+    """Write ``table`` to ``path`` and return its manifest entry."""
+    rows = 0
+    with open(path, "wb") as fh:
+        headers = db.table_columns(table)
+        out = _HashingWriter(fh)
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(headers)
+            for row in db.iter_table(table):
+                writer.writerow(row)
+                rows += 1
+        else:
+            for row in db.iter_table(table):
+                out.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + "\n")
+                rows += 1
+    return {"file": os.path.basename(path), "rows": rows, "bytes": out.size, "sha256": out.sha256.hexdigest()}
+
+
+def export_all(
+    archive_path: str,
+    format: str = "csv",
+    compression: Optional[str] = "gzip",
+    *,
+    tables: Optional[Sequence[str]] = None,
+) -> dict:
+    """Export every data table into a single tar archive.
+
+    Tables (by default ``db.data_tables()``) are dumped one after another
+    inside a single read-only transaction, so the archive is one consistent
+    snapshot, as ``<table>.csv`` or ``<table>.jsonl``. A ``manifest.json``
+    with the row count, size and SHA-256 of every file is added last. The
+    archive is written next to ``archive_path`` and renamed into place only
+    when complete. Returns the manifest.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format: {format}")
+    if compression not in ARCHIVE_COMPRESSIONS:
+        raise ValueError(f"Invalid compression: {compression}")
+    tables = list(tables) if tables is not None else db.data_tables()
+    for table in tables:
+        db.table_columns(table)  # valida el nombre antes de empezar
+    manifest = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "schema_version": db.SCHEMA_VERSION,
+        "format": format,
+        "tables": {},
+    }
+    directory = os.path.dirname(os.path.abspath(archive_path))
+    partial = archive_path + ".part"
+    try:
+        with tempfile.TemporaryDirectory(dir=directory) as tmp, tarfile.open(
+            partial, f"w:{ARCHIVE_COMPRESSIONS[compression]}"
+        ) as tar, db.read_only():
+            # Cada fichero se añade al archivo en cuanto termina y se borra
+            for table in tables:
+                path = os.path.join(tmp, f"{table}.{format}")
+                entry = _dump_table(table, path, format)
+                tar.add(path, arcname=entry["file"])
+                os.remove(path)
+                manifest["tables"][table] = entry
+            data = json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8")
+            info = tarfile.TarInfo("manifest.json")
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+        os.replace(partial, archive_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return manifest
+
+
+class ChangeSummary(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+    # Posición del registro de cambios hasta la que llega la exportación
+    position: int
+
+
+def export_table_changes(
+    table: str,
+    filepath: str,
+    destination: str,
+    *,
+    format: str = "jsonl",
+    commit: bool = True,
+) -> ChangeSummary:
+    """Export the rows of ``table`` changed since the last export to ``destination``.
+
+    Each line is a change record: ``{"op", "id", "row"}`` in JSONL, or the
+    ``op`` column followed by the table columns in CSV. Deletes only carry
+    the id. The first export to a destination contains every row as an
+    insert. Watermarks are kept per table and destination; with ``commit``
+    the new one is stored once the file is written, otherwise the caller
+    stores ``position`` with ``db.set_export_watermark`` after delivering it.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format: {format}")
+    if table not in db.DELTA_TABLES:
+        raise ValueError(f"Invalid table name: {table}")
+    counts = {db.CHANGE_INSERT: 0, db.CHANGE_UPDATE: 0, db.CHANGE_DELETE: 0}
+    partial = filepath + ".part"
+    held = db.holds_connection()
+    try:
+        # Posición, marca de agua y cambios salen de la misma instantánea
+        with db.read_only(), open(partial, "w", newline="", encoding="utf-8") as fh:
+            position = db.change_log_position()
+            since = db.export_watermark(destination, table)
+            headers = db.table_columns(table)
+            if since is None:
+                changes = (db.RowChange(db.CHANGE_INSERT, row[0], row) for row in db.iter_table(table))
+            else:
+                changes = db.iter_changes(table, since)
+            if format == "csv":
+                writer = csv.writer(fh)
+                writer.writerow(["op", *headers])
+                id_index = headers.index("id")
+            for change in changes:
+                counts[change.op] += 1
+                if format == "jsonl":
+                    record = {"op": change.op, "id": change.id}
+                    if change.row is not None:
+                        record["row"] = dict(zip(headers, change.row))
+                    fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+                else:
+                    row = change.row
+                    if row is None:
+                        row = [None] * len(headers)
+                        row[id_index] = change.id
+                    writer.writerow([change.op, *row])
+        os.replace(partial, filepath)
+        if commit:
+            db.set_export_watermark(destination, table, position)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+        # Solo se devuelve al pool la conexión que se abrió aquí
+        if not held:
+            db.release_conn()
+    return ChangeSummary(
+        counts[db.CHANGE_INSERT], counts[db.CHANGE_UPDATE], counts[db.CHANGE_DELETE], position
+    )
+
+
+def import_table_from_csv(
+    table: str,
+    filepath: str,
+    *,
+    mode: str = "replace",
+    batch_size: int = IMPORT_BATCH_SIZE,
+    on_progress: Optional[Callable[[int, float], None]] = None,
+    on_error: Optional[Callable[[RowError], None]] = None,
+) -> ImportSummary:
     """Import rows from a CSV file into the given table.
 
-    Existing rows in the table will be removed before import.
+    The file is read and written in batches of ``batch_size`` rows, so memory
+    use does not grow with the file. With ``mode="replace"`` existing rows
+    are removed and the whole file is loaded in a single transaction: if the
+    import fails part way the table keeps its original rows. ``"append"``
+    keeps them and ``"upsert"`` updates the rows whose id or unique key is
+    already present; in both modes each batch is committed on its own. Rows
+    that cannot be stored are skipped and passed to ``on_error``;
+    ``on_progress`` receives the rows read so far and the fraction of the
+    file consumed after every batch.
     """
     if table not in ALLOWED_TABLES:
         raise ValueError(f"Invalid table name: {table}")
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Invalid import mode: {mode}")
+    size = os.path.getsize(filepath) or 1
+    read = imported = errors = 0
     with open(filepath, newline="", encoding="utf-8") as fh:
         reader = csv.reader(fh)
-        headers = next(reader)
-        rows = [[None if val == "" else val for val in row] for row in reader]
-    conn = db._ensure_conn()
-    cur = conn.cursor()
-    cur.execute(f"DELETE FROM {table}")
-    placeholders = ", ".join("?" for _ in headers)
-    cur.executemany(
-        f"INSERT INTO {table} ({', '.join(headers)}) VALUES ({placeholders})",
-        rows,
-    )
-    conn.commit()
+        headers = next(reader, None)
+        if not headers:
+            raise ValueError(f"Missing header in {filepath}")
+        clear = mode == "replace"
+
+        def report(line: int, message: str) -> None:
+            nonlocal errors
+            errors += 1
+            if on_error is not None:
+                on_error(RowError(line, message))
+
+        # Al reemplazar, los lotes son savepoints de una única transacción
+        with db.transaction() if mode == "replace" else contextlib.nullcontext():
+            while True:
+                batch: List[list] = []
+                lines: List[int] = []
+                raw = 0
+                for row in itertools.islice(reader, batch_size):
+                    raw += 1
+                    if not row:
+                        continue
+                    if len(row) != len(headers):
+                        report(reader.line_num, f"Expected {len(headers)} fields, got {len(row)}")
+                        continue
+                    batch.append([None if val == "" else val for val in row])
+                    lines.append(reader.line_num)
+                read += raw
+                # Un lote sin filas válidas no termina la importación; solo el fin del fichero
+                if batch or clear:
+                    failed = db.load_rows(table, headers, batch, upsert=mode == "upsert", clear=clear)
+                    clear = False
+                    for position, message in failed:
+                        report(lines[position], message)
+                    imported += len(batch) - len(failed)
+                if raw == 0:
+                    break
+                if on_progress is not None:
+                    on_progress(read, min(1.0, fh.buffer.tell() / size))
+    return ImportSummary(read, imported, errors)
@@ -1,18 +1,28 @@
 """Summary service for dashboard counts."""
 from __future__ import annotations
 
+import threading
 from typing import cast, List, Tuple
 
 from app.data import db
 
 
-def get_counts(sucursal_id: int | None = None) -> tuple[int, int, int, int]:
-    """Return counts of clients, devices, products and pending repairs.
+# Contadores por sucursal: {sucursal_id: (token de versión, contadores)}
+_counts_cache: dict[int | None, tuple[object, tuple[int, int, int, int]]] = {}
+_counts_lock = threading.Lock()
 
-    Returns:
-        tuple: (total_clientes, total_dispositivos, total_productos, total_reparaciones_pendientes)
-        If an error occurs when retrieving a count, the affected value will be ``0``.
-    """
+
+COUNT_TABLES = ("clientes", "dispositivos", "inventario", "reparaciones")
+
+
+def _version_token() -> object | None:
+    try:
+        return db.change_token(*COUNT_TABLES)
+    except Exception:
+        return None
+
+
+def _count_separately(sucursal_id: int | None) -> tuple[int, int, int, int]:
     counts: list[int] = []
     funcs = (
         db.contar_clientes,
@@ -22,17 +32,43 @@ def get_counts(sucursal_id: int | None = None) -> tuple[int, int, int, int]:
     )
     for func in funcs:
         try:
-            import inspect
-            if "sucursal_id" in inspect.signature(func).parameters:
-                counts.append(func(sucursal_id))
-            else:
-                counts.append(func())
+            counts.append(func() if sucursal_id is None else func(sucursal_id))
         except Exception:
             counts.append(0)
-
     return cast(tuple[int, int, int, int], tuple(counts))
 
 
+def get_counts(sucursal_id: int | None = None) -> tuple[int, int, int, int]:
+    """Return counts of clients, devices, products and pending repairs.
+
+    Results are cached per branch until one of the counted tables changes.
+
+    Returns:
+        tuple: (total_clientes, total_dispositivos, total_productos, total_reparaciones_pendientes)
+        If an error occurs when retrieving a count, the affected value will be ``0``.
+    """
+    version = _version_token()
+    if version is not None:
+        with _counts_lock:
+            cached = _counts_cache.get(sucursal_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    try:
+        counts = cast(tuple[int, int, int, int], tuple(db.get_dashboard_counts(sucursal_id)))
+    except Exception:
+        counts = _count_separately(sucursal_id)
+    if version is not None:
+        with _counts_lock:
+            _counts_cache[sucursal_id] = (version, counts)
+    return counts
+
+
+def invalidate_counts() -> None:
+    """Discard the cached dashboard counts."""
+    with _counts_lock:
+        _counts_cache.clear()
+
+
 def get_workload_metrics(sucursal_id: int | None = None) -> List[Tuple[str, int, int]]:
     """Return workload metrics per technician."""
     try:
@@ -15,6 +15,12 @@ warranty_service = WarrantyService()
 return_service = ReturnService()
 
 
+@app.teardown_request
+def release_db_connection(_exc):
+    """Hand the request thread's connection back to the pool."""
+    db.release_conn()
+
+
 @app.route("/tickets/<int:ticket_id>")
 def ticket_status(ticket_id: int):
     """Return timeline for a ticket for clients to consult progress."""
@@ -46,9 +52,24 @@ def api_warranties():
     return jsonify({"garantia_id": wid})
 
 
+def _page_args() -> tuple[str | None, int] | None:
+    """Return (cursor, limit) when the client asked for a paginated listing."""
+    if "cursor" not in request.args and "limit" not in request.args:
+        return None
+    limit = request.args.get("limit", default=db.PAGE_SIZE, type=int)
+    return request.args.get("cursor") or None, max(1, min(limit, 1000))
+
+
 @app.get("/api/warranties")
 def list_warranties():
-    return jsonify({"garantias": warranty_service.list()})
+    paging = _page_args()
+    if paging is None:
+        return jsonify({"garantias": warranty_service.list()})
+    try:
+        page = warranty_service.page(*paging)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"garantias": page.rows, "next_cursor": page.next_cursor})
 
 
 @app.post("/api/returns")
@@ -62,7 +83,14 @@ def api_returns():
 
 @app.get("/api/returns")
 def list_returns():
-    return jsonify({"devoluciones": return_service.list()})
+    paging = _page_args()
+    if paging is None:
+        return jsonify({"devoluciones": return_service.list()})
+    try:
+        page = return_service.page(*paging)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"devoluciones": page.rows, "next_cursor": page.next_cursor})
 
 
 if __name__ == "__main__":
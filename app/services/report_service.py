@@ -1,9 +1,12 @@
 """Service functions for generating and exporting reports."""
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Callable, Iterable, List, Tuple
+import hashlib
+import io
 import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
 
 try:  # pragma: no cover - optional dependency checked at runtime
     from reportlab.lib.pagesizes import letter
@@ -11,44 +14,100 @@ try:  # pragma: no cover - optional dependency checked at runtime
 except Exception:  # pragma: no cover
     canvas = None  # type: ignore
 
-import matplotlib
-matplotlib.use("Agg")  # Use non-GUI backend for tests
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
-from app.data import summary_service
+from app.data import db, export_service, summary_service
 
 FinancialRow = Tuple[str, float, float, float]
+REPORT_HEADERS = ("Periodo", "Ingresos", "Costos", "Margen")
+
+# Tamaño máximo de los PNG guardados en la caché de gráficos
+CHART_CACHE_BYTES = 8 * 1024 * 1024
+
+
+class _ChartCache:
+    """PNG images keyed by a hash of their data, evicting least recently used."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+            return png
+
+    def put(self, key: str, png: bytes) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = png
+            self._size += len(png)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_chart_cache = _ChartCache(CHART_CACHE_BYTES)
+
+
+def clear_chart_cache() -> None:
+    _chart_cache.clear()
+
+
+def _draw_financial_chart(rows: List[FinancialRow]) -> bytes:
+    # Figura propia sin pyplot: se puede dibujar desde cualquier hilo
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    periods = [row[0] or "Sin fecha" for row in rows]
+    ax.plot(periods, [row[1] for row in rows], label="Ingresos")
+    ax.plot(periods, [row[2] for row in rows], label="Costos")
+    ax.plot(periods, [row[3] for row in rows], label="Margen")
+    ax.legend()
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def render_financial_chart(data: Iterable[FinancialRow]) -> bytes:
+    """Return a PNG line chart of ingresos, costos and margen.
+
+    Safe to call from several threads at once. Charts are cached by a hash
+    of ``data``, so the same summary is only rendered once.
+    """
+    rows = [tuple(row) for row in data]
+    key = hashlib.sha256(repr(rows).encode("utf-8")).hexdigest()
+    png = _chart_cache.get(key)
+    if png is None:
+        png = _draw_financial_chart(rows)
+        _chart_cache.put(key, png)
+    return png
 
 
 def create_financial_chart(data: Iterable[FinancialRow], filepath: str) -> None:
     """Generate a line chart of ingresos, costos and margen."""
-    periods = [row[0] for row in data]
-    incomes = [row[1] for row in data]
-    costs = [row[2] for row in data]
-    margins = [row[3] for row in data]
-
-    plt.figure()
-    plt.plot(periods, incomes, label="Ingresos")
-    plt.plot(periods, costs, label="Costos")
-    plt.plot(periods, margins, label="Margen")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(filepath)
-    plt.close()
+    Path(filepath).write_bytes(render_financial_chart(data))
 
 
 def export_report_to_excel(data: Iterable[FinancialRow], filepath: str) -> None:
     """Export financial summary to an Excel file."""
-    try:
-        from openpyxl import Workbook
-    except Exception as exc:  # pragma: no cover - defensive
-        raise RuntimeError("openpyxl is required for Excel export") from exc
-    wb = Workbook()
-    ws = wb.active
-    ws.append(["Periodo", "Ingresos", "Costos", "Margen"])
-    for row in data:
-        ws.append(list(row))
-    wb.save(filepath)
+    export_service.write_excel(filepath, REPORT_HEADERS, data, title="Reporte")
 
 
 def export_report_to_pdf(data: Iterable[FinancialRow], filepath: str) -> None:
@@ -97,7 +156,10 @@ def schedule_periodic_report(
         def _run(self) -> None:
             if self._stopped:
                 return
-            task(output_dir, sucursal_id)
+            try:
+                task(output_dir, sucursal_id)
+            finally:
+                db.release_conn()
             self._timer = threading.Timer(interval_seconds, self._run)
             self._timer.daemon = True
             self._timer.start()
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from app.data import db
 
@@ -13,3 +13,6 @@ class ReturnService:
 
     def list(self) -> List[Tuple[int, int, str, str, str]]:
         return db.listar_devoluciones()
+
+    def page(self, cursor: Optional[str] = None, limit: int = db.PAGE_SIZE) -> db.Page:
+        return db.listar_devoluciones_paginado(cursor, limit)
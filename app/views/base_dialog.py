@@ -8,6 +8,12 @@ from PySide6.QtWidgets import (
     QMainWindow,
 )
 from PySide6.QtGui import QIcon
+from PySide6.QtCore import QTimer, Qt
+
+# Espera tras la última tecla antes de aplicar los filtros
+FILTER_DELAY_MS = 250
+# Hasta este número de filas se filtra en memoria; por encima, en SQL (mismo criterio: prefijo)
+PROXY_MAX_ROWS = 5000
 
 
 class BaseDialog(QDialog):
@@ -33,23 +39,83 @@ class BaseDialog(QDialog):
 
         Args:
             layout: Layout where the filter row will be inserted.
-            specs: Iterable of (label, column) pairs.
+            specs: Iterable of (label, column) or (label, column, field) tuples;
+                ``field`` is the keyword the model's fetch function filters on.
             insert_index: Position to insert the filter row.
         """
-        self._filter_widgets: list[QLineEdit] = []
+        self._filter_widgets: list[tuple[QLineEdit, int, str | None]] = []
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self._apply_filters)
         row = QHBoxLayout()
-        for label, column in specs:
+        for label, column, *field in specs:
             edit = QLineEdit(self)
             row.addWidget(QLabel(f"{label}:"))
             row.addWidget(edit)
-            edit.textChanged.connect(lambda text, col=column: self.proxy.setFilterForColumn(col, text))
-            self._filter_widgets.append(edit)
+            edit.textChanged.connect(self._filter_timer.start)
+            self._filter_widgets.append((edit, column, field[0] if field else None))
         btn_clear = QPushButton("Limpiar filtros", self)
         row.addWidget(btn_clear)
         btn_clear.clicked.connect(self._clear_filters)
         layout.insertLayout(insert_index, row)
 
+    def _filter_in_memory(self) -> bool:
+        model = self.proxy.sourceModel()
+        if not hasattr(model, "set_filters"):
+            return True
+        # Decide con el listado sin filtrar: completo y pequeño -> proxy en memoria
+        return not model.filters and model.is_complete and model.rowCount() <= PROXY_MAX_ROWS
+
+    def _apply_filters(self) -> None:
+        self._filter_timer.stop()
+        widgets = getattr(self, "_filter_widgets", [])
+        if self._filter_in_memory():
+            self.proxy.setFilters({column: edit.text().strip() for edit, column, _ in widgets})
+            return
+        self.proxy.clearFilters()
+        self.proxy.sourceModel().set_filters(
+            {field: edit.text().strip() for edit, _, field in widgets if field}
+        )
+
     def _clear_filters(self) -> None:
-        for edit in getattr(self, "_filter_widgets", []):
+        for edit, _, _ in getattr(self, "_filter_widgets", []):
+            edit.blockSignals(True)
             edit.clear()
-        self.proxy.clearFilters()
+            edit.blockSignals(False)
+        self._apply_filters()
+
+    def _select_source_row(self, view, row) -> None:
+        """Select and scroll to source ``row`` of the proxy shown in ``view``."""
+        if row is None:
+            return
+        index = self.proxy.mapFromSource(self.proxy.sourceModel().index(row, 0))
+        if index.isValid():
+            view.selectRow(index.row())
+            view.scrollTo(index)
+
+    def _sort_when_complete(self, view, model) -> None:
+        """Allow header sorting only while every row of ``model`` is loaded.
+
+        The proxy can only sort loaded rows; with pages still pending the
+        order shown would not be the real one.
+        """
+        def update(complete: bool) -> None:
+            if not complete:
+                view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+                self.proxy.sort(-1)
+            view.setSortingEnabled(complete)
+
+        model.complete_changed.connect(update)
+        update(model.is_complete)
+
+    def _resize_on_first_page(self, view, model) -> None:
+        """Fit ``view``'s columns once the first page of ``model`` arrives."""
+        model.page_loaded.connect(lambda first: first == 0 and view.resizeColumnsToContents())
+
+    def done(self, result: int) -> None:  # type: ignore[override]
+        # Las consultas pendientes ya no tienen a quién entregar el resultado
+        runner = getattr(self, "runner", None)
+        if runner is not None:
+            runner.cancel_all()
+        super().done(result)
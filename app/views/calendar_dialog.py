@@ -1,8 +1,30 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
+
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QCalendarWidget, QListWidget
-from PySide6.QtCore import QDate
+from PySide6.QtCore import QDate, Qt
 
 from app.data import db
+from .workers import QueryRunner
+
+
+class TaskCalendar(QCalendarWidget):
+    """Calendar that paints the number of repairs in each day cell."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.counts: dict[str, int] = {}
+
+    def paintCell(self, painter, rect, date):
+        super().paintCell(painter, rect, date)
+        count = self.counts.get(date.toString("yyyy-MM-dd"))
+        if count:
+            painter.save()
+            font = painter.font()
+            font.setPointSizeF(font.pointSizeF() * 0.75)
+            painter.setFont(font)
+            painter.drawText(rect.adjusted(0, 0, -3, -1), Qt.AlignRight | Qt.AlignBottom, str(count))
+            painter.restore()
 
 
 class CalendarDialog(QDialog):
@@ -12,17 +34,41 @@ class CalendarDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Calendario de tareas")
         layout = QVBoxLayout(self)
-        self.calendar = QCalendarWidget(self)
+        self.calendar = TaskCalendar(self)
         self.tasks = QListWidget(self)
         layout.addWidget(self.calendar)
         layout.addWidget(self.tasks)
-        self.calendar.selectionChanged.connect(self._load_tasks)
-        self._load_tasks()
+        self._by_day: dict[str, list] = {}
+        self.runner = QueryRunner(self, busy_widget=self)
+        self.calendar.currentPageChanged.connect(self._load_month)
+        self.calendar.selectionChanged.connect(self._show_tasks)
+        self._load_month(self.calendar.yearShown(), self.calendar.monthShown())
+
+    def _load_month(self, year: int, month: int) -> None:
+        # Una sola consulta para todos los días visibles del mes
+        first = QDate(year, month, 1)
+        start = first.addDays(-7)
+        end = first.addMonths(1).addDays(14)
+        self.runner.run(
+            "month",
+            db.get_tasks_by_range,
+            start.toString("yyyy-MM-dd"),
+            end.toString("yyyy-MM-dd"),
+            on_result=self._show_month,
+        )
+
+    def _show_month(self, rows) -> None:
+        self._by_day = defaultdict(list)
+        for _id, desc, tech, fecha in rows:
+            self._by_day[fecha[:10]].append((desc, tech))
+        self.calendar.counts = {day: len(tasks) for day, tasks in self._by_day.items()}
+        self.calendar.updateCells()
+        self._show_tasks()
 
-    def _load_tasks(self) -> None:
+    def _show_tasks(self) -> None:
         date = self.calendar.selectedDate().toString("yyyy-MM-dd")
         self.tasks.clear()
-        for _id, desc, tech in db.get_tasks_by_date(date):
+        for desc, tech in self._by_day.get(date, []):
             if tech:
                 self.tasks.addItem(f"{desc} ({tech})")
             else:
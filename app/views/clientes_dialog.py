@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from PySide6.QtWidgets import QMessageBox, QAbstractItemView
-from PySide6.QtGui import QRegularExpressionValidator, QStandardItemModel, QStandardItem, QIcon
-from PySide6.QtCore import QRegularExpression, Qt
+from PySide6.QtGui import QRegularExpressionValidator, QIcon
+from PySide6.QtCore import QRegularExpression
 
 from app.resources import icons_rc  # noqa: F401
 
@@ -9,6 +9,11 @@ from app.ui.ui_clientes import Ui_ClientesDialog
 from app.data import db
 from .filter_proxy import MultiFilterProxyModel
 from .base_dialog import BaseDialog
+from .table_model import Column, PagedTableModel
+from .workers import QueryRunner
+
+# Tupla de db.listar_clientes_paginado: (id, nombre, telefono, email, direccion, nif, notas)
+COLUMNS = [Column("ID", 0), Column("Nombre", 1), Column("Teléfono", 2), Column("Email", 3)]
 
 
 class ClientesDialog(BaseDialog):
@@ -34,49 +39,31 @@ class ClientesDialog(BaseDialog):
         self.ui.btnCerrar.clicked.connect(self.close)
 
         # Model + proxy for filtering
-        self.model = QStandardItemModel(0, 4, self)
-        self.model.setHorizontalHeaderLabels(["ID", "Nombre", "Teléfono", "Email"])
+        self.runner = QueryRunner(self, busy_widget=self)
+        self.model = PagedTableModel(
+            COLUMNS, db.listar_clientes_paginado, runner=self.runner, parent=self
+        )
         self.proxy = MultiFilterProxyModel(self)
         self.proxy.setSourceModel(self.model)
         self.ui.tableClientes.setModel(self.proxy)
-        self.ui.tableClientes.setSortingEnabled(True)
+        self._sort_when_complete(self.ui.tableClientes, self.model)
         self.ui.tableClientes.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self._resize_on_first_page(self.ui.tableClientes, self.model)
         self.ui.tableClientes.selectionModel().selectionChanged.connect(
             lambda *_: self.cargar_seleccion()
         )
 
         self._build_filters(
             self.ui.verticalLayout,
-            [("Nombre", 1), ("Teléfono", 2), ("Email", 3)],
+            [("Nombre", 1, "nombre"), ("Teléfono", 2, "telefono"), ("Email", 3, "email")],
             2,
         )
 
-        self._clientes = {}
         self._load_clientes()
 
 
     def _load_clientes(self) -> None:
-        self.model.setRowCount(0)
-        self._clientes = {}
-        for cid, nombre, telefono, email, direccion, nif, notas in db.listar_clientes_detallado():
-            self._clientes[cid] = {
-                "nombre": nombre or "",
-                "telefono": telefono or "",
-                "email": email or "",
-                "direccion": direccion or "",
-                "nif": nif or "",
-                "notas": notas or "",
-            }
-            row = [
-                QStandardItem(str(cid)),
-                QStandardItem(nombre or ""),
-                QStandardItem(telefono or ""),
-                QStandardItem(email or ""),
-            ]
-            for item in row:
-                item.setEditable(False)
-            self.model.appendRow(row)
-        self.ui.tableClientes.resizeColumnsToContents()
+        self.model.reload()
 
     def _clear_form(self) -> None:
         self.ui.lineEditNombre.clear()
@@ -123,7 +110,8 @@ class ClientesDialog(BaseDialog):
             QMessageBox.warning(self, "Agregar", "El cliente ya existe.")
             return
         self._clear_form()
-        self._load_clientes()
+        row = self.model.append_row(db.get_cliente_detallado(cid))
+        self._select_source_row(self.ui.tableClientes, row)
         self._show_status("Cliente agregado")
 
     def cargar_seleccion(self) -> None:
@@ -131,29 +119,21 @@ class ClientesDialog(BaseDialog):
         if not index.isValid():
             return
         source = self.proxy.mapToSource(index)
-        cid_item = self.model.item(source.row(), 0)
-        if cid_item is None:
-            return
-        cid = int(cid_item.text())
-        cliente = self._clientes.get(cid)
-        if not cliente:
-            return
-        self.ui.lineEditNombre.setText(cliente["nombre"])
-        self.ui.lineEditTelefono.setText(cliente["telefono"])
-        self.ui.lineEditEmail.setText(cliente["email"])
-        self.ui.lineEditDireccion.setText(cliente["direccion"])
-        self.ui.lineEditNif.setText(cliente["nif"])
-        self.ui.plainTextEditNotas.setPlainText(cliente["notas"])
+        _cid, nombre, telefono, email, direccion, nif, notas = self.model.row_data(source.row())
+        self.ui.lineEditNombre.setText(nombre or "")
+        self.ui.lineEditTelefono.setText(telefono or "")
+        self.ui.lineEditEmail.setText(email or "")
+        self.ui.lineEditDireccion.setText(direccion or "")
+        self.ui.lineEditNif.setText(nif or "")
+        self.ui.plainTextEditNotas.setPlainText(notas or "")
 
     def guardar_cambios(self) -> None:
         index = self.ui.tableClientes.currentIndex()
         if not index.isValid():
             QMessageBox.warning(self, "Guardar", "Seleccione un cliente.")
             return
-        cid_item = self.model.item(self.proxy.mapToSource(index).row(), 0)
-        if cid_item is None:
-            return
-        cid = int(cid_item.text())
+        source_row = self.proxy.mapToSource(index).row()
+        cid = self.model.row_id(source_row)
 
         nombre = self.ui.lineEditNombre.text().strip()
         telefono = self.ui.lineEditTelefono.text().strip()
@@ -178,7 +158,7 @@ class ClientesDialog(BaseDialog):
             return
         self._set_error(self.ui.lineEditTelefono, False)
 
-        db.update_cliente(
+        updated = db.update_cliente(
             cid,
             nombre=nombre,
             telefono=telefono or None,
@@ -187,8 +167,11 @@ class ClientesDialog(BaseDialog):
             nif=nif or None,
             notas=notas or None,
         )
+        if not updated:
+            QMessageBox.warning(self, "Duplicado", "Ya existe un cliente con ese nombre.")
+            return
         self._clear_form()
-        self._load_clientes()
+        self.model.replace_row(source_row, db.get_cliente_detallado(cid))
         self._show_status("Cliente actualizado")
 
     def eliminar(self) -> None:
@@ -196,13 +179,11 @@ class ClientesDialog(BaseDialog):
         if not index.isValid():
             QMessageBox.warning(self, "Eliminar", "Seleccione un cliente.")
             return
-        cid_item = self.model.item(self.proxy.mapToSource(index).row(), 0)
-        if cid_item is None:
-            return
-        cid = int(cid_item.text())
+        source_row = self.proxy.mapToSource(index).row()
+        cid = self.model.row_id(source_row)
         if QMessageBox.question(self, "Confirmar", "¿Eliminar cliente seleccionado?") == QMessageBox.Yes:
             db.delete_cliente(cid)
             self._clear_form()
-            self._load_clientes()
+            self.model.remove_row(source_row)
             self._show_status("Cliente eliminado")
 
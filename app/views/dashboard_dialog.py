@@ -1,7 +1,6 @@
 """Dialog displaying productivity indicators and financial charts."""
 from __future__ import annotations
 
-import tempfile
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import (
@@ -13,10 +12,23 @@ from PySide6.QtWidgets import (
     QTableWidgetItem,
     QVBoxLayout,
     QFileDialog,
+    QMessageBox,
 )
 
 from app.data import summary_service
 from app.services import report_service
+from .workers import QueryRunner
+
+
+def _load_dashboard_data():
+    """Fetch the productivity metrics and the financial summary and render its chart."""
+    fin_data = summary_service.get_financial_summary()
+    chart = report_service.render_financial_chart(fin_data) if fin_data else None
+    return summary_service.get_productivity_metrics(), chart
+
+
+def _export_financial(export, path: str) -> None:
+    export(summary_service.get_financial_summary(), path)
 
 
 class DashboardDialog(QDialog):
@@ -42,10 +54,19 @@ class DashboardDialog(QDialog):
         self.btn_pdf.clicked.connect(self._export_pdf)
         self.btn_excel.clicked.connect(self._export_excel)
 
+        self.runner = QueryRunner(self, busy_widget=self)
+        self.runner.busy_changed.connect(self._set_busy)
         self.refresh()
 
     def refresh(self) -> None:
-        data = summary_service.get_productivity_metrics()
+        self.runner.run("refresh", _load_dashboard_data, on_result=self._show_data)
+
+    def _set_busy(self, busy: bool) -> None:
+        self.btn_pdf.setEnabled(not busy)
+        self.btn_excel.setEnabled(not busy)
+
+    def _show_data(self, result) -> None:
+        data, chart = result
         self.table.setRowCount(len(data))
         self.table.setColumnCount(4)
         self.table.setHorizontalHeaderLabels([
@@ -61,25 +82,30 @@ class DashboardDialog(QDialog):
             self.table.setItem(row, 3, QTableWidgetItem(f"{avg:.1f}"))
         self.table.resizeColumnsToContents()
 
-        fin_data = summary_service.get_financial_summary()
-        if fin_data:
-            tmp = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-            tmp.close()
-            report_service.create_financial_chart(fin_data, tmp.name)
-            self.chart_label.setPixmap(QPixmap(tmp.name))
-            self._last_chart = tmp.name
+        if chart:
+            pixmap = QPixmap()
+            pixmap.loadFromData(chart, "PNG")
+            self.chart_label.setPixmap(pixmap)
         else:
             self.chart_label.setText("Sin datos financieros")
-            self._last_chart = None
 
     def _export_pdf(self) -> None:
         path, _ = QFileDialog.getSaveFileName(self, "Guardar PDF", "reporte.pdf", "PDF (*.pdf)")
         if path:
-            data = summary_service.get_financial_summary()
-            report_service.export_report_to_pdf(data, path)
+            self._run_export(report_service.export_report_to_pdf, path)
 
     def _export_excel(self) -> None:
         path, _ = QFileDialog.getSaveFileName(self, "Guardar Excel", "reporte.xlsx", "Excel (*.xlsx)")
         if path:
-            data = summary_service.get_financial_summary()
-            report_service.export_report_to_excel(data, path)
+            self._run_export(report_service.export_report_to_excel, path)
+
+    def _run_export(self, export, path: str) -> None:
+        # Cada ruta es una clave distinta: exportar PDF y Excel a la vez no se cancelan
+        self.runner.run(
+            ("export", path),
+            _export_financial,
+            export,
+            path,
+            on_result=lambda _: QMessageBox.information(self, "Exportar", "Reporte exportado correctamente"),
+            on_error=lambda exc: QMessageBox.critical(self, "Error", str(exc)),
+        )
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
+from typing import Optional
+
 from PySide6.QtWidgets import QMessageBox
-from PySide6.QtGui import QStandardItemModel, QStandardItem, QIcon
-from PySide6.QtCore import Qt
+from PySide6.QtGui import QIcon
 
 from app.resources import icons_rc  # noqa: F401
 
@@ -9,6 +10,20 @@ from app.ui.ui_dispositivos import Ui_DispositivosDialog
 from app.data import db
 from .filter_proxy import MultiFilterProxyModel
 from .base_dialog import BaseDialog
+from .table_model import Column, PagedTableModel
+from .workers import QueryRunner
+
+# Tupla de db.listar_dispositivos_paginado:
+# (id, cliente_id, cliente, marca, modelo, imei, n_serie, color, accesorios)
+COLUMNS = [
+    Column("Cliente", 2),
+    Column("Marca", 3),
+    Column("Modelo", 4, editable=True),
+    Column("IMEI", 5, editable=True),
+    Column("N° Serie", 6, editable=True),
+    Column("Color", 7, editable=True),
+    Column("Accesorios", 8, editable=True),
+]
 
 
 class DispositivosDialog(BaseDialog):
@@ -22,7 +37,6 @@ class DispositivosDialog(BaseDialog):
         self._set_button_icon(self.ui.btnEliminar, ":/icons/exit.svg")
         self._set_button_icon(self.ui.btnCerrar, ":/icons/exit.svg")
 
-        self._updating = False
         self._changed = False
 
         self.ui.btnAgregar.clicked.connect(self.agregar)
@@ -31,25 +45,20 @@ class DispositivosDialog(BaseDialog):
         self.ui.comboCliente.currentIndexChanged.connect(self._load_dispositivos)
 
         # Model + proxy
-        self.model = QStandardItemModel(0, 7, self)
-        self.model.setHorizontalHeaderLabels([
-            "Cliente",
-            "Marca",
-            "Modelo",
-            "IMEI",
-            "N° Serie",
-            "Color",
-            "Accesorios",
-        ])
-        self.model.itemChanged.connect(self._item_changed)
+        self.runner = QueryRunner(self, busy_widget=self)
+        self._cliente_id = None
+        self.model = PagedTableModel(
+            COLUMNS, self._fetch_page, on_edit=self._edit_device, runner=self.runner, parent=self
+        )
         self.proxy = MultiFilterProxyModel(self)
         self.proxy.setSourceModel(self.model)
         self.ui.tableDispositivos.setModel(self.proxy)
-        self.ui.tableDispositivos.setSortingEnabled(True)
+        self._sort_when_complete(self.ui.tableDispositivos, self.model)
+        self._resize_on_first_page(self.ui.tableDispositivos, self.model)
 
         self._build_filters(
             self.ui.verticalLayout,
-            [("Cliente", 0), ("Marca", 1), ("Modelo", 2), ("IMEI", 3)],
+            [("Cliente", 0, "cliente"), ("Marca", 1, "marca_prefix"), ("Modelo", 2, "modelo"), ("IMEI", 3, "imei")],
             1,
         )
 
@@ -63,42 +72,13 @@ class DispositivosDialog(BaseDialog):
         for cid, nombre in db.listar_clientes():
             combo.addItem(nombre, cid)
 
+    def _fetch_page(self, cursor, limit, **filters):
+        # Se ejecuta en un hilo de trabajo: no se leen widgets aquí
+        return db.listar_dispositivos_paginado(cursor, limit, cliente_id=self._cliente_id, **filters)
+
     def _load_dispositivos(self):
-        self._updating = True
-        self.model.blockSignals(True)
-        self.model.setRowCount(0)
-        cid = self.ui.comboCliente.currentData()
-        if cid is None:
-            dispositivos = db.listar_dispositivos_detallado()
-        else:
-            dispositivos = db.listar_dispositivos_por_cliente(cid)
-        for (
-            did,
-            cid,
-            cname,
-            marca,
-            modelo,
-            imei,
-            n_serie,
-            color,
-            accesorios,
-        ) in dispositivos:
-            row = [
-                QStandardItem(cname),
-                QStandardItem(marca or ""),
-                QStandardItem(modelo or ""),
-                QStandardItem(imei or ""),
-                QStandardItem(n_serie or ""),
-                QStandardItem(color or ""),
-                QStandardItem(accesorios or ""),
-            ]
-            row[0].setEditable(False)
-            row[1].setEditable(False)
-            row[1].setData(did, Qt.UserRole)
-            self.model.appendRow(row)
-        self.ui.tableDispositivos.resizeColumnsToContents()
-        self.model.blockSignals(False)
-        self._updating = False
+        self._cliente_id = self.ui.comboCliente.currentData()
+        self.model.reload()
 
     def agregar(self):
         cid = self.ui.comboCliente.currentData()
@@ -118,6 +98,11 @@ class DispositivosDialog(BaseDialog):
             return
         self._set_error(self.ui.lineEditMarca, False)
         self._set_error(self.ui.lineEditModelo, False)
+        existing = db.find_device(cid, marca, modelo, imei or None)
+        if existing is not None:
+            self._select_source_row(self.ui.tableDispositivos, self.model.find_row(existing))
+            QMessageBox.warning(self, "Validación", "Dispositivo ya registrado para este cliente.")
+            return
         did = db.add_device(
             cid,
             marca,
@@ -138,43 +123,32 @@ class DispositivosDialog(BaseDialog):
         self.ui.lineEditSerie.clear()
         self.ui.lineEditColor.clear()
         self.ui.lineEditAccesorios.clear()
-        self._load_dispositivos()
+        row = self.model.append_row(db.get_dispositivo_detallado(did))
+        self._select_source_row(self.ui.tableDispositivos, row)
         self._show_status("Dispositivo agregado")
 
-    def _item_changed(self, item):
-        if self._updating or item.column() not in (2, 3, 4, 5, 6):
-            return
-        row = item.row()
-        marca_item = self.model.item(row, 1)
-        did = marca_item.data(Qt.UserRole)
-        modelo = self.model.item(row, 2).text().strip()
-        imei_item = self.model.item(row, 3)
-        imei = imei_item.text().strip() if imei_item else ""
-        serie_item = self.model.item(row, 4)
-        n_serie = serie_item.text().strip() if serie_item else ""
-        color_item = self.model.item(row, 5)
-        color = color_item.text().strip() if color_item else ""
-        accesorios_item = self.model.item(row, 6)
-        accesorios = accesorios_item.text().strip() if accesorios_item else ""
+    def _edit_device(self, row: tuple, column: int, value: str) -> Optional[tuple]:
+        new_row = list(row)
+        new_row[COLUMNS[column].index] = value.strip() or None
+        did, _cid, _cname, _marca, modelo, imei, n_serie, color, accesorios = new_row
         if not modelo:
             QMessageBox.warning(self, "Validación", "Modelo no puede estar vacío.")
-            self._load_dispositivos()
-            return
+            return None
         updated = db.update_device(
             did,
             modelo=modelo,
-            imei=imei or None,
-            n_serie=n_serie or None,
-            color=color or None,
-            accesorios=accesorios or None,
+            imei=imei,
+            n_serie=n_serie,
+            color=color,
+            accesorios=accesorios,
         )
         if not updated:
             QMessageBox.warning(
-                self, "Validación", "Número de serie ya registrado.")
-            self._load_dispositivos()
-            return
+                self, "Validación", "Número de serie ya registrado o dispositivo duplicado.")
+            return None
         self._changed = True
         self._show_status("Dispositivo actualizado")
+        return tuple(new_row)
 
     def eliminar(self):
         index = self.ui.tableDispositivos.currentIndex()
@@ -182,12 +156,11 @@ class DispositivosDialog(BaseDialog):
             QMessageBox.warning(self, "Eliminar", "Seleccione un dispositivo.")
             return
         source = self.proxy.mapToSource(index)
-        marca_item = self.model.item(source.row(), 1)
-        did = marca_item.data(Qt.UserRole)
+        did = self.model.row_id(source.row())
         if QMessageBox.question(self, "Confirmar", "¿Eliminar dispositivo seleccionado?") == QMessageBox.Yes:
             db.delete_device(did)
             self._changed = True
-            self._load_dispositivos()
+            self.model.remove_row(source.row())
             self._show_status("Dispositivo eliminado")
 
     def cerrar(self):
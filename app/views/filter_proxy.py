@@ -1,28 +1,71 @@
+import string
+
 from PySide6.QtCore import QSortFilterProxyModel, Qt
 
+# Igual que LIKE y COLLATE NOCASE en SQLite: solo se ignoran mayúsculas ASCII
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _fold(text: str) -> str:
+    return text.translate(_ASCII_LOWER)
+
 
 class MultiFilterProxyModel(QSortFilterProxyModel):
-    """Proxy model allowing case-insensitive contains filtering on multiple columns."""
+    """Proxy model filtering several columns by case-insensitive prefix.
+
+    Matching is the same as the prefix filters of the ``db.*_paginado``
+    functions, so a table filtered in memory shows the same rows as one
+    filtered in SQL. The folded text of each filtered cell is computed once
+    and cached until the source rows change.
+    """
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self._filters: dict[int, str] = {}
+        self._folded: dict[tuple[int, int], str] = {}
         self.setFilterCaseSensitivity(Qt.CaseInsensitive)
 
+    def setSourceModel(self, model) -> None:  # type: ignore[override]
+        old = self.sourceModel()
+        if old is not None:
+            for signal in self._cache_signals(old):
+                signal.disconnect(self._drop_cache)
+        super().setSourceModel(model)
+        for signal in self._cache_signals(model):
+            signal.connect(self._drop_cache)
+
+    @staticmethod
+    def _cache_signals(model):
+        return (model.modelReset, model.rowsInserted, model.rowsRemoved, model.dataChanged)
+
+    def _drop_cache(self, *_args) -> None:
+        self._folded.clear()
+
     def setFilterForColumn(self, column: int, pattern: str) -> None:
-        self._filters[column] = pattern.lower()
+        self._filters[column] = _fold(pattern)
+        self.invalidateFilter()
+
+    def setFilters(self, filters: dict[int, str]) -> None:
+        """Replace every column filter at once with a single re-filter."""
+        self._filters = {column: _fold(pattern) for column, pattern in filters.items() if pattern}
         self.invalidateFilter()
 
     def clearFilters(self) -> None:
         self._filters.clear()
         self.invalidateFilter()
 
+    def _folded_text(self, source_row: int, column: int, source_parent) -> str:
+        key = (source_row, column)
+        value = self._folded.get(key)
+        if value is None:
+            model = self.sourceModel()
+            data = model.data(model.index(source_row, column, source_parent), Qt.DisplayRole)
+            value = "" if data is None else _fold(str(data))
+            self._folded[key] = value
+        return value
+
     def filterAcceptsRow(self, source_row: int, source_parent):  # type: ignore[override]
-        model = self.sourceModel()
         for column, pattern in self._filters.items():
-            if pattern:
-                index = model.index(source_row, column, source_parent)
-                data = model.data(index, Qt.DisplayRole)
-                if data is None or pattern not in str(data).lower():
-                    return False
+            if pattern and not self._folded_text(source_row, column, source_parent).startswith(pattern):
+                return False
         return True
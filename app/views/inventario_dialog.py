@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+from typing import Optional
+
 from PySide6.QtWidgets import QMessageBox
-from PySide6.QtGui import QStandardItemModel, QStandardItem, QIcon
+from PySide6.QtGui import QIcon
 from PySide6.QtCore import Qt
 
 from app.resources import icons_rc  # noqa: F401
@@ -9,6 +11,32 @@ from app.ui.ui_inventario import Ui_InventarioDialog
 from app.data import db
 from .filter_proxy import MultiFilterProxyModel
 from .base_dialog import BaseDialog
+from .table_model import Column, PagedTableModel, money
+from .pending_edits import PendingEdits
+from .workers import QueryRunner
+
+RIGHT = Qt.AlignRight | Qt.AlignVCenter
+
+
+def _margin(row: tuple) -> str:
+    return f"Margen: {(row[7] or 0) - (row[6] or 0):.2f}"
+
+
+# Columnas sobre la tupla de db.listar_productos_paginado:
+# (id, sku, nombre, categoria, cantidad, stock_min, costo, precio, ubicacion, proveedor, notas)
+COLUMNS = [
+    Column("SKU", 1),
+    Column("Nombre", 2),
+    Column("Categoría", 3),
+    Column("Cantidad", 4, editable=True, align=RIGHT),
+    Column("Stock mín", 5, editable=True, align=RIGHT),
+    Column("Costo", 6, money, editable=True, align=RIGHT),
+    Column("Precio", 7, money, editable=True, align=RIGHT, tooltip=_margin),
+    Column("Ubicación", 8, editable=True),
+    Column("Proveedor", 9, editable=True),
+]
+# Columna de la vista -> campo de update_products_ext
+EDIT_FIELDS = {3: "cantidad", 4: "stock_min", 5: "costo", 6: "precio", 7: "ubicacion", 8: "proveedor"}
 
 
 class InventarioDialog(BaseDialog):
@@ -22,36 +50,33 @@ class InventarioDialog(BaseDialog):
         self._set_button_icon(self.ui.btnEliminar, ":/icons/exit.svg")
         self._set_button_icon(self.ui.btnCerrar, ":/icons/exit.svg")
 
-        self._updating = False
-
         self.ui.btnAgregar.clicked.connect(self.agregar)
         self.ui.btnEliminar.clicked.connect(self.eliminar)
         self.ui.btnCerrar.clicked.connect(self.close)
 
+        # Las ediciones de celdas se guardan juntas tras una pausa
+        self.pending = PendingEdits(db.update_products_ext, self)
+        self.pending.saved.connect(lambda n: self._show_status(f"{n} producto(s) actualizado(s)"))
+        self.pending.failed.connect(self._edits_failed)
+
         # Model + proxy
-        self.model = QStandardItemModel(0, 9, self)
-        self.model.setHorizontalHeaderLabels(
-            [
-                "SKU",
-                "Nombre",
-                "Categoría",
-                "Cantidad",
-                "Stock mín",
-                "Costo",
-                "Precio",
-                "Ubicación",
-                "Proveedor",
-            ]
+        self.runner = QueryRunner(self, busy_widget=self)
+        self.model = PagedTableModel(
+            COLUMNS,
+            db.listar_productos_paginado,
+            on_edit=self._edit_product,
+            runner=self.runner,
+            parent=self,
         )
-        self.model.itemChanged.connect(self._item_changed)
         self.proxy = MultiFilterProxyModel(self)
         self.proxy.setSourceModel(self.model)
         self.ui.tableProductos.setModel(self.proxy)
-        self.ui.tableProductos.setSortingEnabled(True)
+        self._sort_when_complete(self.ui.tableProductos, self.model)
+        self._resize_on_first_page(self.ui.tableProductos, self.model)
 
         self._build_filters(
             self.ui.verticalLayout,
-            [("Nombre", 1), ("SKU", 0), ("Categoría", 2), ("Proveedor", 8)],
+            [("Nombre", 1, "nombre"), ("SKU", 0, "sku"), ("Categoría", 2, "categoria_prefix"), ("Proveedor", 8, "proveedor")],
             1,
         )
 
@@ -70,42 +95,17 @@ class InventarioDialog(BaseDialog):
 
 
     def _load_products(self) -> None:
-        self._updating = True
-        self.model.blockSignals(True)
-        self.model.setRowCount(0)
-        for (
-            pid,
-            sku,
-            nombre,
-            categoria,
-            cantidad,
-            stock_min,
-            costo,
-            precio,
-            ubicacion,
-            proveedor,
-            _notas,
-        ) in db.listar_productos_detallado():
-            row = [
-                QStandardItem(sku or ""),
-                QStandardItem(nombre),
-                QStandardItem(categoria or ""),
-                QStandardItem(str(cantidad)),
-                QStandardItem(str(stock_min)),
-                QStandardItem(f"{costo:.2f}"),
-                QStandardItem(f"{precio:.2f}"),
-                QStandardItem(ubicacion or ""),
-                QStandardItem(proveedor or ""),
-            ]
-            row[0].setEditable(False)
-            row[0].setData(pid, Qt.UserRole)
-            row[1].setEditable(False)
-            row[2].setEditable(False)
-            row[6].setToolTip(f"Margen: {precio - costo:.2f}")
-            self.model.appendRow(row)
-        self.ui.tableProductos.resizeColumnsToContents()
-        self.model.blockSignals(False)
-        self._updating = False
+        self.pending.flush()
+        self.model.reload()
+
+    def _apply_filters(self) -> None:
+        # Recargar desde SQL mostraría valores aún sin guardar
+        self.pending.flush()
+        super()._apply_filters()
+
+    def done(self, result: int) -> None:  # type: ignore[override]
+        self.pending.flush()
+        super().done(result)
 
     def agregar(self) -> None:
         sku = self.ui.lineEditSKU.text().strip() or None
@@ -142,54 +142,49 @@ class InventarioDialog(BaseDialog):
             QMessageBox.warning(self, "Duplicado", "Ya existe un producto con ese SKU.")
             return
         self._clear_inputs()
-        self._load_products()
+        row = self.model.append_row(db.get_producto_detallado(pid))
+        self._select_source_row(self.ui.tableProductos, row)
         self._show_status("Producto agregado")
 
-    def _item_changed(self, item) -> None:
-        if self._updating:
-            return
-        row = item.row()
-        pid_item = self.model.item(row, 0)
-        if not pid_item:
-            return
-        pid = pid_item.data(Qt.UserRole)
-        col = item.column()
+    def _edit_product(self, row: tuple, column: int, value: str) -> Optional[tuple]:
+        field = EDIT_FIELDS.get(column)
+        if field is None:
+            return None
         try:
-            if col == 3:
-                val = int(item.text())
-                if val < 0:
-                    raise ValueError
-                db.update_product_ext(pid, cantidad=val)
-            elif col == 4:
-                val = int(item.text())
-                if val < 0:
-                    raise ValueError
-                db.update_product_ext(pid, stock_min=val)
-            elif col == 5:
-                val = float(item.text())
-                if val < 0:
-                    raise ValueError
-                db.update_product_ext(pid, costo=val)
-            elif col == 6:
-                val = float(item.text())
-                if val < 0:
-                    raise ValueError
-                db.update_product_ext(pid, precio=val)
-            elif col == 7:
-                db.update_product_ext(pid, ubicacion=item.text().strip() or None)
-            elif col == 8:
-                db.update_product_ext(pid, proveedor=item.text().strip() or None)
+            if field in ("cantidad", "stock_min"):
+                val = int(value)
+            elif field in ("costo", "precio"):
+                val = float(value)
             else:
-                return
+                val = value.strip() or None
+            if isinstance(val, (int, float)) and val < 0:
+                raise ValueError
         except ValueError:
             QMessageBox.warning(self, "Validación", "Valor inválido.")
-            self._load_products()
-            return
-        if col in (5, 6):
-            costo = float(self.model.item(row, 5).text())
-            precio = float(self.model.item(row, 6).text())
-            self.model.item(row, 6).setToolTip(f"Margen: {precio - costo:.2f}")
-        self._show_status("Producto actualizado")
+            return None
+        self.pending.add(row[0], field, val)
+        new_row = list(row)
+        new_row[COLUMNS[column].index] = val
+        return tuple(new_row)
+
+    def _edits_failed(self, ids: list) -> None:
+        # Se vuelve a mostrar lo que hay realmente en la base de datos
+        names = []
+        for pid in ids:
+            current = db.get_producto_detallado(pid)
+            if current is not None:
+                names.append(current[2])
+            row = self.model.find_row(pid)
+            if row is None:
+                continue
+            if current is None:
+                self.model.remove_row(row)
+            else:
+                self.model.replace_row(row, current)
+        if names:
+            QMessageBox.warning(
+                self, "Validación", "No se pudieron guardar los cambios de: " + ", ".join(names)
+            )
 
     def eliminar(self) -> None:
         index = self.ui.tableProductos.currentIndex()
@@ -197,16 +192,14 @@ class InventarioDialog(BaseDialog):
             QMessageBox.warning(self, "Eliminar", "Seleccione un producto.")
             return
         source = self.proxy.mapToSource(index)
-        id_item = self.model.item(source.row(), 0)
-        if not id_item:
-            return
-        pid = id_item.data(Qt.UserRole)
+        pid = self.model.row_id(source.row())
         if (
             QMessageBox.question(
                 self, "Confirmar", "¿Eliminar producto seleccionado?"
             )
             == QMessageBox.Yes
         ):
+            self.pending.discard(pid)
             db.delete_product(pid)
-            self._load_products()
+            self.model.remove_row(source.row())
             self._show_status("Producto eliminado")
@@ -13,9 +13,10 @@ from PySide6.QtWidgets import (
     QFileDialog,
     QMainWindow,
     QMessageBox,
+    QProgressBar,
     QTableWidgetItem,
 )
-from PySide6.QtCore import QSettings, Qt, QTimer
+from PySide6.QtCore import QObject, QSettings, Qt, QTimer, Signal
 
 from app.resources import icons_rc  # noqa: F401
 from app.ui.ui_main_window import Ui_MainWindow
@@ -23,10 +24,28 @@ from app.data import db, export_service, summary_service
 from .notificaciones import notify_low_stock, notify_pending_repairs
 from .calendar_dialog import CalendarDialog
 from .dashboard_dialog import DashboardDialog
+from .workers import QueryRunner, thread_pool
 from app.services import report_service
 
 logger = logging.getLogger(__name__)
 
+# Tablas de las que depende cada panel del resumen
+SUMMARY_TABLES = frozenset(summary_service.COUNT_TABLES)
+LOW_STOCK_TABLES = frozenset({"inventario"})
+RECENT_REPAIRS_TABLES = frozenset({"reparaciones", "dispositivos", "clientes"})
+NOTIFICATION_TABLES = frozenset({"inventario", "reparaciones"})
+WATCHED_TABLES = SUMMARY_TABLES | LOW_STOCK_TABLES | RECENT_REPAIRS_TABLES
+# Los cambios de este proceso llegan al momento; el sondeo solo cubre otros procesos
+FALLBACK_POLL_MS = 120000
+# Agrupa ráfagas de cambios en una sola actualización
+REFRESH_DELAY_MS = 200
+
+
+class _DbChangeRelay(QObject):
+    """Carries data-layer change callbacks to the GUI thread."""
+
+    changed = Signal(dict)
+
 
 class MainWindow(QMainWindow):
     def __init__(self, settings: QSettings, user_role: str):
@@ -71,6 +90,9 @@ class MainWindow(QMainWindow):
         }
         for table, action in export_actions.items():
             action.triggered.connect(lambda _=False, t=table: self._export_table(t))
+        self._export_menu.addSeparator()
+        self.actionBackup = self._export_menu.addAction("Copia de seguridad...")
+        self.actionBackup.triggered.connect(self._export_backup)
 
         # Acciones rápidas
         self.ui.btnClientes.clicked.connect(self._open_clientes)
@@ -82,9 +104,20 @@ class MainWindow(QMainWindow):
         # Permisos según rol
         self._apply_role_permissions()
 
+        # Tareas en segundo plano con indicador en la barra de estado
+        self.runner = QueryRunner(self)
+        self._busy_bar = QProgressBar(self)
+        self._busy_bar.setRange(0, 0)
+        self._busy_bar.setMaximumWidth(120)
+        self._busy_bar.hide()
+        self.statusBar().addPermanentWidget(self._busy_bar)
+        self.runner.busy_changed.connect(self._busy_bar.setVisible)
+
         # Resumen inicial
+        self._panel_data: dict[str, list] = {}
         self.refresh_all()
         self._setup_notification_timer()
+        self._setup_change_listener()
         self._report_timer = report_service.schedule_periodic_report(86400, "reports")
 
     def _apply_role_permissions(self) -> None:
@@ -101,6 +134,8 @@ class MainWindow(QMainWindow):
                 self.ui.btnInventario,
             ]:
                 btn.setEnabled(False)
+            # La copia incluye usuarios y configuración
+            self.actionBackup.setEnabled(False)
 
     def _load_dialog_class(self, base: str, class_name: str) -> Optional[Type[QDialog]]:
         """Try to import a dialog class handling plural/singular variations."""
@@ -126,8 +161,7 @@ class MainWindow(QMainWindow):
             self._no_impl('Clientes')
             return
         dlg = dlg_cls(self)
-        if dlg.exec() == QDialog.Accepted:
-            self.refresh_all()
+        dlg.exec()
 
     def _open_inventario(self):
         dlg_cls = self._load_dialog_class('inventario', 'InventarioDialog')
@@ -135,8 +169,7 @@ class MainWindow(QMainWindow):
             self._no_impl('Inventario')
             return
         dlg = dlg_cls(self)
-        if dlg.exec() == QDialog.Accepted:
-            self.refresh_all()
+        dlg.exec()
 
     def _open_reparaciones(self):
         dlg_cls = self._load_dialog_class('reparaciones', 'ReparacionesDialog')
@@ -144,8 +177,7 @@ class MainWindow(QMainWindow):
             self._no_impl('Reparaciones')
             return
         dlg = dlg_cls(self)
-        if dlg.exec() == QDialog.Accepted:
-            self.refresh_all()
+        dlg.exec()
 
     def _open_dispositivos(self):
         dlg_cls = self._load_dialog_class('dispositivos', 'DispositivosDialog')
@@ -153,8 +185,7 @@ class MainWindow(QMainWindow):
             self._no_impl('Dispositivos')
             return
         dlg = dlg_cls(self)
-        if dlg.exec() == QDialog.Accepted:
-            self.refresh_all()
+        dlg.exec()
 
     def _open_calendar(self):
         dlg = CalendarDialog(self)
@@ -173,19 +204,53 @@ class MainWindow(QMainWindow):
         )
         if not file_path:
             return
-        try:
-            if selected_filter.startswith("Excel") or file_path.endswith(".xlsx"):
-                if not file_path.endswith(".xlsx"):
-                    file_path += ".xlsx"
-                export_service.export_table_to_excel(table, file_path)
-            else:
-                if not file_path.endswith(".csv"):
-                    file_path += ".csv"
-                export_service.export_table_to_csv(table, file_path)
-            QMessageBox.information(self, "Exportar", "Datos exportados correctamente")
-        except Exception as exc:  # pragma: no cover - GUI feedback
-            logger.exception("Error al exportar %s", table)
-            QMessageBox.critical(self, "Error", str(exc))
+        if selected_filter.startswith("Excel") or file_path.endswith(".xlsx"):
+            if not file_path.endswith(".xlsx"):
+                file_path += ".xlsx"
+            export = export_service.export_table_to_excel
+        else:
+            if not file_path.endswith(".csv"):
+                file_path += ".csv"
+            export = export_service.export_table_to_csv
+        self.statusBar().showMessage(f"Exportando {table}...")
+        # Cada exportación es una clave distinta: no se cancelan entre sí
+        self.runner.run(
+            ("export", file_path),
+            export,
+            table,
+            file_path,
+            on_result=lambda _: self._export_finished(),
+            on_error=lambda exc: self._export_failed(table, exc),
+        )
+
+    def _export_backup(self) -> None:
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Copia de seguridad",
+            "",
+            "Archivo comprimido (*.tar.gz)",
+        )
+        if not file_path:
+            return
+        if not file_path.endswith(".tar.gz"):
+            file_path += ".tar.gz"
+        self.statusBar().showMessage("Exportando copia de seguridad...")
+        self.runner.run(
+            ("export", file_path),
+            export_service.export_all,
+            file_path,
+            on_result=lambda _: self._export_finished(),
+            on_error=lambda exc: self._export_failed("copia de seguridad", exc),
+        )
+
+    def _export_finished(self) -> None:
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, "Exportar", "Datos exportados correctamente")
+
+    def _export_failed(self, table: str, exc: Exception) -> None:  # pragma: no cover - GUI feedback
+        self.statusBar().clearMessage()
+        logger.error("Error al exportar %s", table, exc_info=exc)
+        QMessageBox.critical(self, "Error", str(exc))
 
     def refresh_all(self):
         self.refresh_summary()
@@ -200,8 +265,16 @@ class MainWindow(QMainWindow):
         self._set_label_text(["label_total_productos", "labelTotalProductos"], total_productos)
         self._set_label_text(["label_total_reparaciones", "labelTotalReparaciones"], total_reparaciones)
 
+    def _unchanged(self, panel: str, data: list) -> bool:
+        if self._panel_data.get(panel) == data:
+            return True
+        self._panel_data[panel] = data
+        return False
+
     def load_low_stock(self):
         data = db.get_low_stock_products()
+        if self._unchanged("low_stock", data):
+            return
         table = self.ui.tableLowStock
         table.setRowCount(len(data))
         table.setColumnCount(3)
@@ -221,6 +294,8 @@ class MainWindow(QMainWindow):
 
     def load_recent_repairs(self):
         data = db.get_recent_repairs()
+        if self._unchanged("recent_repairs", data):
+            return
         table = self.ui.tableRecentRepairs
         table.setRowCount(len(data))
         table.setColumnCount(5)
@@ -241,18 +316,46 @@ class MainWindow(QMainWindow):
     def _setup_notification_timer(self) -> None:
         self._last_low_stock = []
         self._last_pending_count = 0
+        self._check_notifications()
+
+    def _setup_change_listener(self) -> None:
+        self._dirty_tables: set[str] = set()
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(REFRESH_DELAY_MS)
+        self._refresh_timer.timeout.connect(self._refresh_changed)
+        self._db_changes = _DbChangeRelay(self)
+        self._db_changes.changed.connect(self._on_tables_changed)
+        self._unsubscribe_db = db.subscribe(self._db_changes.changed.emit, WATCHED_TABLES)
+        # Respaldo para cambios hechos por otros procesos
         self._timer = QTimer(self)
-        self._timer.setInterval(60000)  # 1 minuto
-        self._timer.timeout.connect(self._check_notifications)
+        self._timer.setInterval(FALLBACK_POLL_MS)
+        self._timer.timeout.connect(db.check_for_changes)
         self._timer.start()
-        self._check_notifications()
+
+    def _on_tables_changed(self, changes: dict) -> None:
+        self._dirty_tables.update(changes)
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def _refresh_changed(self) -> None:
+        dirty, self._dirty_tables = self._dirty_tables, set()
+        if dirty & SUMMARY_TABLES:
+            self.refresh_summary()
+        if dirty & LOW_STOCK_TABLES:
+            self.load_low_stock()
+        if dirty & RECENT_REPAIRS_TABLES:
+            self.load_recent_repairs()
+        if dirty & NOTIFICATION_TABLES:
+            self._check_notifications()
 
     def _check_notifications(self) -> None:
-        low_stock = db.get_low_stock_products()
+        # Reutiliza los datos ya cargados por los paneles
+        low_stock = self._panel_data.get("low_stock", [])
         if low_stock and low_stock != self._last_low_stock:
             notify_low_stock(self, low_stock)
             self._last_low_stock = low_stock
-        pending = db.contar_reparaciones_pendientes()
+        pending = summary_service.get_counts()[3]
         if pending and pending != self._last_pending_count:
             notify_pending_repairs(self, pending)
             self._last_pending_count = pending
@@ -289,6 +392,10 @@ class MainWindow(QMainWindow):
             )
 
     def closeEvent(self, event):  # pragma: no cover - GUI event
+        self._unsubscribe_db()
+        # Deja terminar las exportaciones en curso o en cola antes de salir
+        self.runner.cancel_all(keep=lambda key: isinstance(key, tuple) and key[0] == "export")
+        thread_pool().waitForDone()
         try:
             self._report_timer.cancel()
         except Exception:
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+from typing import Callable, Hashable, List, Sequence, Tuple
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+logger = logging.getLogger(__name__)
+
+# Pausa sin ediciones antes de guardar los cambios acumulados
+FLUSH_DELAY_MS = 800
+
+# save([(id, {campo: valor}), ...]) -> [ok, ...]
+Save = Callable[[Sequence[Tuple[Hashable, dict]]], List[bool]]
+
+
+class PendingEdits(QObject):
+    """Buffer of cell edits saved together after a short idle period.
+
+    Edits to the same row are merged into one change. :meth:`flush` hands
+    every pending change to ``save`` (e.g. ``db.update_products_ext``) in a
+    single call; ``saved`` carries the number of rows stored and ``failed``
+    the ids whose changes were rejected.
+    """
+
+    saved = Signal(int)
+    failed = Signal(list)
+
+    def __init__(self, save: Save, parent=None, *, delay_ms: int = FLUSH_DELAY_MS):
+        super().__init__(parent)
+        self._save = save
+        self._pending: dict[Hashable, dict] = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, row_id: Hashable, field: str, value) -> None:
+        self._pending.setdefault(row_id, {})[field] = value
+        self._timer.start()
+
+    def discard(self, row_id: Hashable) -> None:
+        """Forget the pending change of a row (e.g. it was deleted)."""
+        self._pending.pop(row_id, None)
+
+    def flush(self) -> List[Hashable]:
+        """Save every pending change now and return the ids that failed."""
+        self._timer.stop()
+        if not self._pending:
+            return []
+        changes = list(self._pending.items())
+        self._pending = {}
+        try:
+            results = self._save(changes)
+        except Exception:
+            logger.exception("Error al guardar %d cambios", len(changes))
+            results = [False] * len(changes)
+        failed = [row_id for (row_id, _), ok in zip(changes, results) if not ok]
+        if len(failed) < len(changes):
+            self.saved.emit(len(changes) - len(failed))
+        if failed:
+            self.failed.emit(failed)
+        return failed
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+
+from app.data import db
+from .workers import QueryRunner
+
+logger = logging.getLogger(__name__)
+
+
+def text(value) -> str:
+    return "" if value is None else str(value)
+
+
+def money(value) -> str:
+    return f"{value or 0:.2f}"
+
+
+class Column(NamedTuple):
+    header: str
+    # Posición del valor dentro de la tupla devuelta por la base de datos
+    index: int
+    fmt: Callable[[object], str] = text
+    editable: bool = False
+    tooltip: Optional[Callable[[tuple], str]] = None
+    align: Optional[Qt.AlignmentFlag] = None
+
+
+# fetch(cursor, limit, **filtros) -> db.Page
+Fetch = Callable[..., "db.Page"]
+# Recibe (fila, columna, valor editado) y devuelve la fila nueva o None si se rechaza
+EditHandler = Callable[[tuple, int, str], Optional[tuple]]
+
+
+class PagedTableModel(QAbstractTableModel):
+    """Read-only-by-default table model fed page by page from the database.
+
+    Rows are kept as the tuples returned by ``fetch`` (a keyset-paginated
+    ``db.*_paginado`` function); display text is produced on demand. More
+    rows are requested through ``canFetchMore``/``fetchMore`` as the view
+    scrolls. :meth:`set_filters` passes keyword filters on to ``fetch``.
+    With a ``runner`` pages are fetched on a worker thread and appended when
+    they arrive; ``page_loaded`` carries the first row of each new page and
+    ``complete_changed`` reports when :attr:`is_complete` flips.
+    """
+
+    batch_size = 200
+    page_loaded = Signal(int)
+    complete_changed = Signal(bool)
+
+    def __init__(
+        self,
+        columns: Sequence[Column],
+        fetch: Fetch,
+        *,
+        id_index: int = 0,
+        on_edit: Optional[EditHandler] = None,
+        runner: Optional[QueryRunner] = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self._fetch = fetch
+        self._id_index = id_index
+        self._on_edit = on_edit
+        self._runner = runner
+        self._loading = False
+        self._rows: List[tuple] = []
+        self._cursor: Optional[str] = None
+        self._exhausted = False
+        # Ids añadidos a mano antes de terminar la carga; se omiten al llegar su página
+        self._appended: set = set()
+        self.filters: dict[str, str] = {}
+
+    # --- Carga -------------------------------------------------------------
+    def set_filters(self, filters: dict[str, str]) -> None:
+        """Reload keeping only rows matching ``filters`` (empty values are ignored)."""
+        self.filters = {name: value for name, value in filters.items() if value}
+        self.reload()
+
+    @property
+    def is_complete(self) -> bool:
+        """True once every row of the current query has been loaded."""
+        return self._exhausted
+
+    def reload(self) -> None:
+        """Drop the loaded rows and fetch the first page again."""
+        if self._runner is not None:
+            self._runner.cancel(self)
+        self.beginResetModel()
+        self._rows = []
+        self._cursor = None
+        was_complete = self._exhausted
+        self._exhausted = False
+        self._loading = False
+        self._appended = set()
+        self.endResetModel()
+        if was_complete:
+            self.complete_changed.emit(False)
+        self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:  # type: ignore[override]
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()) -> None:  # type: ignore[override]
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        if self._runner is None:
+            self._add_page(self._fetch(self._cursor, self.batch_size, **self.filters))
+            return
+        self._loading = True
+        self._runner.run(
+            self,
+            self._fetch,
+            self._cursor,
+            self.batch_size,
+            on_result=self._add_page,
+            on_error=self._fetch_failed,
+            **self.filters,
+        )
+
+    def _fetch_failed(self, exc: Exception) -> None:
+        logger.error("Error al cargar filas", exc_info=exc)
+        # Se deja de pedir páginas hasta la próxima recarga
+        self._loading = False
+        self._exhausted = True
+
+    def _add_page(self, page: "db.Page") -> None:
+        self._loading = False
+        self._cursor = page.next_cursor
+        self._exhausted = page.next_cursor is None
+        if self._exhausted:
+            self.complete_changed.emit(True)
+        rows = page.rows
+        if self._appended:
+            rows = [r for r in rows if r[self._id_index] not in self._appended]
+        if rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+            self.page_loaded.emit(first)
+
+    # --- Acceso a filas ----------------------------------------------------
+    def row_data(self, row: int) -> tuple:
+        return self._rows[row]
+
+    def row_id(self, row: int):
+        return self._rows[row][self._id_index]
+
+    def find_row(self, row_id) -> Optional[int]:
+        """Return the position of the loaded row with ``row_id``, if any."""
+        for row, data in enumerate(self._rows):
+            if data[self._id_index] == row_id:
+                return row
+        return None
+
+    def append_row(self, data: tuple) -> Optional[int]:
+        """Add a newly created row without reloading and return its position.
+
+        A row already loaded is updated in place instead. With SQL filters
+        active the model reloads, since the row may not match them; then
+        ``None`` is returned.
+        """
+        if self.filters:
+            self.reload()
+            return None
+        row = self.find_row(data[self._id_index])
+        if row is not None:
+            self.replace_row(row, data)
+            return row
+        if not self._exhausted:
+            self._appended.add(data[self._id_index])
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first)
+        self._rows.append(data)
+        self.endInsertRows()
+        return first
+
+    def replace_row(self, row: int, data: tuple) -> None:
+        self._rows[row] = data
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.columns) - 1))
+
+    def remove_row(self, row: int) -> None:
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+
+    # --- API de QAbstractTableModel ----------------------------------------
+    def rowCount(self, parent=QModelIndex()) -> int:  # type: ignore[override]
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:  # type: ignore[override]
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):  # type: ignore[override]
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section].header
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):  # type: ignore[override]
+        if not index.isValid():
+            return None
+        column = self.columns[index.column()]
+        row = self._rows[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return column.fmt(row[column.index])
+        if role == Qt.UserRole:
+            return row[self._id_index]
+        if role == Qt.ToolTipRole and column.tooltip is not None:
+            return column.tooltip(row)
+        if role == Qt.TextAlignmentRole and column.align is not None:
+            return int(column.align)
+        return None
+
+    def flags(self, index):  # type: ignore[override]
+        flags = super().flags(index)
+        if index.isValid() and self._on_edit is not None and self.columns[index.column()].editable:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):  # type: ignore[override]
+        if role != Qt.EditRole or not index.isValid() or self._on_edit is None:
+            return False
+        row = index.row()
+        new_row = self._on_edit(self._rows[row], index.column(), str(value))
+        if new_row is None:
+            return False
+        self.replace_row(row, new_row)
+        return True
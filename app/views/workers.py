@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Run database queries and file exports off the GUI thread."""
+from __future__ import annotations
+
+import itertools
+import logging
+from typing import Any, Callable, Hashable, Optional
+
+from PySide6.QtCore import QObject, QRunnable, Qt, QThreadPool, Signal
+from PySide6.QtWidgets import QWidget
+
+from app.data import db
+
+logger = logging.getLogger(__name__)
+
+# Menos hilos que conexiones en el pool para no dejar sin conexión al hilo de la GUI
+WORKER_THREADS = max(1, min(4, db.POOL_SIZE - 1))
+
+_job_ids = itertools.count(1)
+_thread_pool: Optional[QThreadPool] = None
+
+
+def thread_pool() -> QThreadPool:
+    """Return the thread pool shared by every :class:`QueryRunner`."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = QThreadPool()
+        _thread_pool.setMaxThreadCount(WORKER_THREADS)
+    return _thread_pool
+
+
+class _Job(QRunnable):
+    def __init__(self, runner: "QueryRunner", key: Hashable, func, args, kwargs, on_result, on_error):
+        super().__init__()
+        # El runner conserva la referencia hasta entregar el resultado
+        self.setAutoDelete(False)
+        self.id = next(_job_ids)
+        self.key = key
+        self.cancelled = False
+        self._runner = runner
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self.on_result = on_result
+        self.on_error = on_error
+
+    def run(self) -> None:
+        ok, value = True, None
+        if not self.cancelled:
+            try:
+                value = self._func(*self._args, **self._kwargs)
+            except Exception as exc:
+                ok, value = False, exc
+            finally:
+                # Cada hilo usa su propia conexión del pool; se devuelve al terminar
+                db.release_conn()
+        try:
+            self._runner._done.emit(self.id, ok, value)
+        except RuntimeError:
+            pass  # el diálogo dueño ya se destruyó
+
+
+class QueryRunner(QObject):
+    """Run callables on a worker thread and deliver results on the GUI thread.
+
+    Every call is tagged with a key; starting a new call with the same key
+    cancels the previous one, whose result is then discarded. Calls still
+    queued are dropped without running. ``busy_changed`` is emitted when the
+    first call starts and when the last one finishes; if ``busy_widget`` is
+    given it also shows a busy cursor meanwhile.
+    """
+
+    busy_changed = Signal(bool)
+    _done = Signal(int, bool, object)
+
+    def __init__(self, parent=None, *, busy_widget: Optional[QWidget] = None):
+        super().__init__(parent)
+        self._jobs: dict[int, _Job] = {}
+        self._latest: dict[Hashable, int] = {}
+        self._busy = False
+        self._busy_widget = busy_widget
+        self._done.connect(self._deliver, Qt.QueuedConnection)
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    def is_pending(self, key: Hashable) -> bool:
+        return key in self._latest
+
+    def run(
+        self,
+        key: Hashable,
+        func: Callable[..., Any],
+        *args,
+        on_result: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        **kwargs,
+    ) -> None:
+        """Call ``func(*args, **kwargs)`` in the background.
+
+        ``on_result`` receives the return value and ``on_error`` the raised
+        exception, both on the GUI thread. Errors without handler are logged.
+        """
+        self.cancel(key)
+        job = _Job(self, key, func, args, kwargs, on_result, on_error)
+        self._jobs[job.id] = job
+        self._latest[key] = job.id
+        thread_pool().start(job)
+        self._update_busy()
+
+    def cancel(self, key: Hashable) -> None:
+        """Discard the pending call for ``key``, if any."""
+        job = self._jobs.get(self._latest.pop(key, None))
+        if job is None:
+            return
+        job.cancelled = True
+        if thread_pool().tryTake(job):
+            del self._jobs[job.id]
+        self._update_busy()
+
+    def cancel_all(self, keep: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """Cancel every pending call, except those whose key ``keep`` accepts."""
+        for key in list(self._latest):
+            if keep is None or not keep(key):
+                self.cancel(key)
+
+    def _deliver(self, job_id: int, ok: bool, value) -> None:
+        job = self._jobs.pop(job_id, None)
+        if job is None or job.cancelled:
+            return
+        del self._latest[job.key]
+        self._update_busy()
+        if ok:
+            if job.on_result is not None:
+                job.on_result(value)
+        elif job.on_error is not None:
+            job.on_error(value)
+        else:
+            logger.error("Error en tarea en segundo plano", exc_info=value)
+
+    def _update_busy(self) -> None:
+        busy = bool(self._latest)
+        if busy == self._busy:
+            return
+        self._busy = busy
+        if self._busy_widget is not None:
+            if busy:
+                self._busy_widget.setCursor(Qt.BusyCursor)
+            else:
+                self._busy_widget.unsetCursor()
+        self.busy_changed.emit(busy)
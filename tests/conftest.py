@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of the database opened by :func:`setup_db`."""
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture
+def db_options():
+    """Keyword arguments for ``db.init_db``; a test module can override it."""
+    return {}
+
+
+@pytest.fixture(autouse=True)
+def setup_db(db_path, db_options):
+    db.init_db(db_path, **db_options)
+    yield
+    db.close_db()
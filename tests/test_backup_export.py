@@ -0,0 +1,110 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tarfile
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db, export_service
+
+
+def _read_archive(path):
+    with tarfile.open(path) as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar.getmembers()}
+
+
+def test_export_all_writes_every_table_and_manifest(tmp_path):
+    cid = db.add_cliente("Ana")
+    db.add_device(cid, "M", "X")
+    db.add_repuesto("Pantalla", 3, None, 1.0)
+    path = str(tmp_path / "copia.tar.gz")
+    manifest = export_service.export_all(path)
+    files = _read_archive(path)
+    tables = db.data_tables()
+    assert "facturas" in tables and "pagos" in tables and "meta" not in tables
+    assert set(files) == {f"{t}.csv" for t in tables} | {"manifest.json"}
+    assert json.loads(files["manifest.json"]) == manifest
+    assert list(manifest["tables"]) == tables
+    for table, entry in manifest["tables"].items():
+        data = files[entry["file"]]
+        assert hashlib.sha256(data).hexdigest() == entry["sha256"]
+        assert len(data) == entry["bytes"]
+    rows = list(csv.reader(io.StringIO(files["clientes.csv"].decode("utf-8"))))
+    assert rows[0] == db.table_columns("clientes") and rows[1][1] == "Ana"
+    assert manifest["tables"]["clientes"]["rows"] == 1
+    assert not os.path.exists(path + ".part")
+
+
+def test_export_all_jsonl_uncompressed(tmp_path):
+    db.add_cliente("Ana")
+    db.add_cliente("Luis")
+    path = str(tmp_path / "copia.tar")
+    export_service.export_all(path, "jsonl", None, tables=["clientes"])
+    lines = _read_archive(path)["clientes.jsonl"].decode("utf-8").splitlines()
+    assert [json.loads(line)["nombre"] for line in lines] == ["Ana", "Luis"]
+
+
+def test_export_all_validates_arguments(tmp_path):
+    path = str(tmp_path / "copia.tar.gz")
+    with pytest.raises(ValueError):
+        export_service.export_all(path, "xml")
+    with pytest.raises(ValueError):
+        export_service.export_all(path, compression="zip")
+    with pytest.raises(ValueError):
+        export_service.export_all(path, tables=["clientes; DROP TABLE clientes"])
+    assert not os.path.exists(path)
+
+
+def test_failed_export_leaves_no_archive(tmp_path, db_path, monkeypatch):
+    dump = export_service._dump_table
+
+    def failing(table, *args):
+        if table == "pagos":
+            raise sqlite3.OperationalError("disk I/O error")
+        return dump(table, *args)
+
+    monkeypatch.setattr(export_service, "_dump_table", failing)
+    with pytest.raises(sqlite3.OperationalError):
+        export_service.export_all(str(tmp_path / "copia.tar.gz"))
+    assert sorted(os.listdir(tmp_path)) == sorted(n for n in os.listdir(tmp_path) if n.startswith(os.path.basename(db_path)))
+
+
+def test_read_only_refuses_writes():
+    with db.read_only() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO clientes (nombre) VALUES ('Ana')")
+    assert db.add_cliente("Ana")
+
+
+def test_archive_is_one_snapshot(tmp_path, monkeypatch):
+    db.add_cliente("Ana")
+    dump = export_service._dump_table
+
+    def dump_then_write(table, *args):
+        entry = dump(table, *args)
+        if table == "clientes":
+            # Lo escrito mientras se exporta no entra en ninguna tabla de la copia
+            writer = threading.Thread(target=lambda: (db.add_repuesto("Pantalla", 1, None, 1.0), db.release_conn()))
+            writer.start()
+            writer.join()
+        return entry
+
+    monkeypatch.setattr(export_service, "_dump_table", dump_then_write)
+    manifest = export_service.export_all(str(tmp_path / "copia.tar"), "csv", None, tables=["clientes", "repuestos"])
+    assert manifest["tables"]["clientes"]["rows"] == 1
+    assert manifest["tables"]["repuestos"]["rows"] == 0
+    assert db._ensure_conn().execute("SELECT COUNT(*) FROM repuestos").fetchone()[0] == 1
+
+
+def test_read_only_keeps_the_threads_connection():
+    conn = db._ensure_conn()
+    with db.read_only():
+        db.contar_clientes()
+    assert db._pool.holds_connection()
+    assert db._ensure_conn() is conn
@@ -0,0 +1,249 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def _product(sku, nombre):
+    return db.add_product_ext(sku, nombre, None, 1, 0, 1.0, 2.0, None, None, None)
+
+
+def test_update_products_ext_reports_each_row_and_commits_once():
+    a = _product("A", "Pantalla")
+    b = _product("B", "Batería")
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    results = db.update_products_ext(
+        [
+            (a, {"precio": 9.5}),
+            (b, {"sku": "A"}),  # SKU duplicado
+            (b, {"nombre": None}),  # NOT NULL
+            (999, {"precio": 1.0}),
+            (b, {"desconocido": 1}),
+            (b, {"cantidad": 7}),
+        ]
+    )
+    conn.set_trace_callback(None)
+    assert results == [True, False, False, False, False, True]
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 1
+    assert db.get_producto_detallado(a)[7] == 9.5
+    row = db.get_producto_detallado(b)
+    assert row[1] == "B" and row[2] == "Batería" and row[4] == 7
+
+
+def test_update_products_ext_empty():
+    assert db.update_products_ext([]) == []
+
+
+def test_add_clientes_reports_inserted_existing_and_rejected():
+    ana = db.add_cliente("Ana")
+    results = db.add_clientes(
+        [
+            {"nombre": "Luis", "telefono": "600"},
+            {"nombre": "Ana", "email": "ana@example.com"},
+            {"nombre": ""},
+            {"nombre": "Luis"},
+        ]
+    )
+    luis = results[0].id
+    assert results == [
+        db.BulkResult(luis, db.BULK_INSERTED),
+        db.BulkResult(ana, db.BULK_EXISTING),
+        db.BulkResult(None, db.BULK_REJECTED),
+        db.BulkResult(luis, db.BULK_EXISTING),
+    ]
+    assert db.get_cliente_detallado(ana)[3] is None
+
+    results = db.add_clientes([{"nombre": "Ana", "email": "ana@example.com"}], upsert=True)
+    assert results == [db.BulkResult(ana, db.BULK_UPDATED)]
+    # Los campos vacíos no borran los existentes
+    db.add_clientes([{"nombre": "Luis", "email": "l@example.com"}], upsert=True)
+    assert db.get_cliente_detallado(luis)[2:4] == ("600", "l@example.com")
+
+
+def test_add_devices_matches_add_device_rules():
+    cid = db.add_cliente("Ana")
+    existing = db.add_device(cid, "Samsung", "S21", None, "SN-1", None, None)
+    results = db.add_devices(
+        [
+            {"cliente_id": cid, "marca": "Samsung", "modelo": "S21"},
+            {"cliente_id": cid, "marca": "Apple", "modelo": "X", "n_serie": "SN-1"},
+            {"cliente_id": str(cid), "marca": "Apple", "modelo": "X", "imei": "123"},
+            {"cliente_id": 999, "marca": "Apple", "modelo": "X"},
+            {"cliente_id": cid, "marca": "Apple"},
+        ]
+    )
+    assert [r.status for r in results] == [
+        db.BULK_EXISTING,
+        db.BULK_REJECTED,
+        db.BULK_INSERTED,
+        db.BULK_REJECTED,
+        db.BULK_REJECTED,
+    ]
+    assert results[0].id == existing
+    assert db.find_device(cid, "Apple", "X", "123") == results[2].id
+
+
+def test_add_products_ext_upserts_by_sku_and_keeps_unkeyed_order():
+    pid = db.add_product_ext("AB-1", "Pantalla", None, 3, 1, 1.0, 2.0, None, None, None)
+    results = db.add_products_ext(
+        [
+            {"nombre": "Sin SKU 1"},
+            {"sku": "AB-1", "nombre": "Pantalla", "precio": "9.5"},
+            {"sku": "CD-2", "nombre": "Batería", "cantidad": "4"},
+            {"nombre": "Sin SKU 2", "cantidad": "x"},
+            {"nombre": "Sin SKU 3"},
+        ],
+        upsert=True,
+    )
+    assert [r.status for r in results] == [
+        db.BULK_INSERTED,
+        db.BULK_UPDATED,
+        db.BULK_INSERTED,
+        db.BULK_REJECTED,
+        db.BULK_INSERTED,
+    ]
+    assert results[1].id == pid
+    assert db.get_producto_detallado(results[0].id)[2] == "Sin SKU 1"
+    assert db.get_producto_detallado(results[4].id)[2] == "Sin SKU 3"
+    # Cantidad no indicada: se conserva la existente
+    assert db.get_producto_detallado(pid)[4:8] == (3, 1, 1.0, 9.5)
+    assert db.get_producto_detallado(results[2].id)[4] == 4
+
+
+def test_add_repuestos_keyed_by_name_and_branch():
+    s1 = db.add_sucursal("Centro")
+    results = db.add_repuestos(
+        [
+            {"nombre": "Pantalla", "stock": 5},
+            {"nombre": "Pantalla", "stock": 2, "sucursal_id": s1},
+            {"nombre": "Pantalla", "stock": 7, "sucursal_id": 999},
+        ]
+    )
+    assert [r.status for r in results] == [db.BULK_INSERTED, db.BULK_INSERTED, db.BULK_REJECTED]
+    results = db.add_repuestos([{"nombre": "Pantalla", "stock": 9, "sucursal_id": s1}], upsert=True)
+    assert results[0].status == db.BULK_UPDATED
+    assert db.transfer_repuesto("Pantalla", s1, s1, 9)
+
+
+def test_bulk_load_spans_chunks_in_one_commit(monkeypatch):
+    monkeypatch.setattr(db, "BULK_CHUNK_SIZE", 3)
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    results = db.add_clientes({"nombre": f"C{i % 7}"} for i in range(10))
+    conn.set_trace_callback(None)
+    assert [r.status for r in results].count(db.BULK_INSERTED) == 7
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 1
+    assert db.contar_clientes() == 7
+
+
+def test_single_row_writes_refuse_duplicate_keys():
+    a = db.add_cliente("Ana")
+    db.add_cliente("Luis")
+    assert db.add_cliente("Luis") is None
+    assert db.update_cliente(a, nombre="Luis") is False
+    assert db.get_cliente_detallado(a)[1] == "Ana"
+
+    s1 = db.add_sucursal("Centro")
+    rid = db.add_repuesto("Pantalla", 5, None, 1.0)
+    assert db.add_repuesto("Pantalla", 2, None, 1.0) is None
+    assert db.add_repuesto("Pantalla", 2, None, 1.0, sucursal_id=s1) not in (None, rid)
+
+    d1 = db.add_device(a, "Apple", "X", None, "SN-1", None, None)
+    d2 = db.add_device(a, "Apple", "X", "123", None, None, None)
+    assert db.update_device(d2, imei="") is False
+    assert db.update_device(d2, n_serie="SN-1") is False
+    assert db.update_device(d2, modelo="XS") is True
+    assert db.update_device(d1, imei="456") is True
+
+
+def test_migration_renames_legacy_duplicates(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    db.close_db()
+    db.init_db(path)
+    conn = db._ensure_conn()
+    for name, *_ in db.UNIQUE_KEYS:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("INSERT INTO clientes (id, nombre) VALUES (1, 'Ana'), (2, 'Ana'), (3, 'Luis')")
+    conn.execute(
+        "INSERT INTO dispositivos (id, cliente_id, marca, modelo, n_serie) "
+        "VALUES (1, 1, 'Apple', 'X', 'SN'), (2, 1, 'Apple', 'X', NULL), (3, 3, 'Apple', 'X', 'SN')"
+    )
+    conn.execute("INSERT INTO inventario (id, sku, nombre) VALUES (1, 'A', 'P'), (2, 'A', 'Q'), (3, '', 'R'), (4, '', 'S')")
+    conn.execute("INSERT INTO repuestos (id, nombre, stock) VALUES (1, 'Pantalla', 2), (2, 'Pantalla', 3)")
+    conn.execute("UPDATE meta SET schema_version = 24")
+    conn.execute("PRAGMA user_version = 24")
+    conn.commit()
+    db.close_db()
+
+    db.init_db(path)
+    conn = db._ensure_conn()
+    assert [r[0] for r in conn.execute("SELECT nombre FROM clientes ORDER BY id")] == ["Ana", "Ana (2)", "Luis"]
+    assert conn.execute("SELECT modelo, n_serie FROM dispositivos ORDER BY id").fetchall() == [
+        ("X", "SN"),
+        ("X (2)", None),
+        ("X", "SN (3)"),
+    ]
+    assert [r[0] for r in conn.execute("SELECT sku FROM inventario ORDER BY id")] == ["A", "A (2)", "", ""]
+    assert [r[0] for r in conn.execute("SELECT nombre FROM repuestos ORDER BY id")] == ["Pantalla", "Pantalla (2)"]
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {name for name, *_ in db.UNIQUE_KEYS} <= indexes
+    assert db.add_clientes([{"nombre": "Ana"}]) == [db.BulkResult(1, db.BULK_EXISTING)]
+
+
+def test_bulk_load_keeps_search_versions_and_change_log_in_step(monkeypatch):
+    monkeypatch.setattr(db, "BULK_CHUNK_SIZE", 2)
+    ana = db.add_cliente("Ana", telefono="600")
+    since = db.change_log_position()
+    version = db.table_version("clientes")
+
+    results = db.add_clientes(
+        [{"nombre": "Ana", "telefono": "611"}, {"nombre": "Luis", "email": "luis@example.com"}, {"nombre": "Eva"}],
+        upsert=True,
+    )
+    luis, eva = results[1].id, results[2].id
+    assert [r.status for r in results] == [db.BULK_UPDATED, db.BULK_INSERTED, db.BULK_INSERTED]
+    assert [hit[1] for hit in db.search("611", ["clientes"])] == [ana]
+    assert db.search("600", ["clientes"]) == []
+    assert [hit[1] for hit in db.search("luis@example", ["clientes"])] == [luis]
+    # Un incremento por lote, no por fila
+    assert db.table_version("clientes") == version + 2
+    changes = list(db.iter_changes("clientes", since))
+    assert [(c.op, c.id) for c in changes] == [
+        (db.CHANGE_UPDATE, ana),
+        (db.CHANGE_INSERT, luis),
+        (db.CHANGE_INSERT, eva),
+    ]
+
+    # Sin nada que cambiar, el upsert no toca las filas
+    since = db.change_log_position()
+    version = db.table_version("clientes")
+    results = db.add_clientes([{"nombre": "Luis", "email": "luis@example.com"}], upsert=True)
+    assert results == [db.BulkResult(luis, db.BULK_EXISTING)]
+    assert db.change_log_position() == since and db.table_version("clientes") == version
+
+    # Fuera de la carga masiva los triggers por fila siguen activos
+    conn = db._ensure_conn()
+    assert conn.execute("SELECT COUNT(*) FROM bulk_load").fetchone()[0] == 0
+    db.update_cliente(eva, telefono="622")
+    assert [hit[1] for hit in db.search("622", ["clientes"])] == [eva]
+    assert [c.id for c in db.iter_changes("clientes", since)] == [eva]
+
+
+def test_failed_bulk_load_leaves_the_triggers_on():
+    def rows():
+        yield {"nombre": "Luis"}
+        raise RuntimeError("origen caído")
+
+    with pytest.raises(RuntimeError):
+        db.add_clientes(rows())
+    conn = db._ensure_conn()
+    assert conn.execute("SELECT COUNT(*) FROM bulk_load").fetchone()[0] == 0
+    assert db.contar_clientes() == 0
+    ana = db.add_cliente("Ana")
+    assert [hit[1] for hit in db.search("Ana", ["clientes"])] == [ana]
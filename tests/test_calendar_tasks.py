@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def _repair_on(fecha, descripcion, tecnico=None):
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    conn = db._ensure_conn()
+    conn.execute(
+        "INSERT INTO reparaciones (dispositivo_id, descripcion, tecnico, fecha) VALUES (?, ?, ?, ?)",
+        (did, descripcion, tecnico, fecha),
+    )
+    conn.commit()
+
+
+def test_tasks_by_date_and_range():
+    _repair_on("2024-02-28 23:59:59", "a")
+    _repair_on("2024-02-29 00:00:00", "b", "tech1")
+    _repair_on("2024-02-29 18:30:00", "c")
+    _repair_on("2024-03-01 00:00:00", "d")
+
+    assert [r[1] for r in db.get_tasks_by_date("2024-02-29")] == ["b", "c"]
+    assert [r[1] for r in db.get_tasks_by_date("2024-02-29 12:00:00")] == ["b", "c"]
+    rows = db.get_tasks_by_range("2024-02-01", "2024-03-01")
+    assert [r[1] for r in rows] == ["a", "b", "c"]
+    assert rows[1][2:] == ("tech1", "2024-02-29 00:00:00")
+
+
+def test_malformed_date_has_no_tasks():
+    _repair_on("2024-02-29 10:00:00", "a")
+    assert db.get_tasks_by_date("29/02/2024") == []
+    assert db.get_tasks_by_date("") == []
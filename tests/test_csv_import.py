@@ -0,0 +1,112 @@
+import csv
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db, export_service
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        csv.writer(fh).writerows(rows)
+    return str(path)
+
+
+def _clientes():
+    return db._ensure_conn().execute("SELECT id, nombre, telefono FROM clientes ORDER BY id").fetchall()
+
+
+def test_import_reports_bad_rows_and_commits_per_batch(tmp_path):
+    path = _write_csv(
+        tmp_path / "c.csv",
+        [
+            ["id", "nombre", "telefono"],
+            ["1", "Ana", ""],
+            ["2", "", "600"],  # NOT NULL
+            ["3", "Luis"],  # faltan campos
+            ["4", "Eva", "700"],
+            ["4", "Otra", ""],  # id repetido
+            ["5", "Juan", ""],
+        ],
+    )
+    errors, progress = [], []
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    summary = export_service.import_table_from_csv(
+        "clientes",
+        path,
+        mode="append",
+        batch_size=2,
+        on_error=errors.append,
+        on_progress=lambda rows, fraction: progress.append((rows, fraction)),
+    )
+    conn.set_trace_callback(None)
+    assert summary == export_service.ImportSummary(rows=6, imported=3, errors=3)
+    assert [e.line for e in errors] == [3, 4, 6]
+    assert progress[-1] == (6, 1.0)
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 3
+    assert _clientes() == [(1, "Ana", None), (4, "Eva", "700"), (5, "Juan", None)]
+
+
+def test_import_modes(tmp_path):
+    db.add_cliente("Previo")
+    path = _write_csv(tmp_path / "c.csv", [["id", "nombre"], ["10", "Ana"]])
+    export_service.import_table_from_csv("clientes", path, mode="append")
+    assert [r[1] for r in _clientes()] == ["Previo", "Ana"]
+
+    path = _write_csv(tmp_path / "u.csv", [["id", "nombre", "telefono"], ["10", "Ana", "600"]])
+    summary = export_service.import_table_from_csv("clientes", path, mode="upsert")
+    assert summary.imported == 1
+    assert _clientes()[-1] == (10, "Ana", "600")
+
+    path = _write_csv(tmp_path / "empty.csv", [["id", "nombre"]])
+    export_service.import_table_from_csv("clientes", path)
+    assert _clientes() == []
+
+
+def test_import_rejects_unknown_columns_and_modes(tmp_path):
+    path = _write_csv(tmp_path / "c.csv", [["nombre", "x) --"], ["Ana", "1"]])
+    with pytest.raises(ValueError):
+        export_service.import_table_from_csv("clientes", path)
+    with pytest.raises(ValueError):
+        export_service.import_table_from_csv("clientes", path, mode="merge")
+    with pytest.raises(ValueError):
+        export_service.import_table_from_csv("meta", path)
+
+
+def test_rejected_batch_does_not_stop_import(tmp_path):
+    path = _write_csv(
+        tmp_path / "c.csv",
+        [["nombre", "telefono"], ["x"], ["y"], ["z"], ["Ana", "1"], ["Luis", "2"]],
+    )
+    errors = []
+    summary = export_service.import_table_from_csv(
+        "clientes", path, mode="append", batch_size=3, on_error=errors.append
+    )
+    assert summary == export_service.ImportSummary(rows=5, imported=2, errors=3)
+    assert [e.line for e in errors] == [2, 3, 4]
+    assert [r[1] for r in _clientes()] == ["Ana", "Luis"]
+
+
+def test_failed_replace_keeps_original_rows(tmp_path):
+    db.add_cliente("Previo")
+    path = tmp_path / "c.csv"
+    _write_csv(path, [["nombre"]] + [[f"Cliente {i}"] for i in range(2000)])
+    with open(path, "ab") as fh:
+        fh.write(b"Jos\xe9\n")  # Latin-1 tras varios lotes válidos
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    with pytest.raises(UnicodeDecodeError):
+        export_service.import_table_from_csv("clientes", str(path), batch_size=100)
+    conn.set_trace_callback(None)
+    assert [r[1] for r in _clientes()] == ["Previo"]
+    assert not any(s.strip().upper() == "COMMIT" for s in statements)
+
+    path = _write_csv(tmp_path / "ok.csv", [["nombre"], ["Ana"], ["Luis"], ["Eva"]])
+    summary = export_service.import_table_from_csv("clientes", path, batch_size=2)
+    assert summary.imported == 3
+    assert [r[1] for r in _clientes()] == ["Ana", "Luis", "Eva"]
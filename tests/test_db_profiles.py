@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+@pytest.fixture
+def db_options(monkeypatch):
+    # El perfil de la variable de entorno no debe colarse en los tests
+    monkeypatch.delenv("APP_DB_PROFILE", raising=False)
+    return {}
+
+
+def test_default_profile_enables_wal():
+    name, values = db.get_db_profile()
+    assert name == db.DEFAULT_PROFILE
+    assert values["journal_mode"] == "wal"
+    assert values["cache_size"] == db.PERFORMANCE_PROFILES[name]["cache_size"]
+
+
+def test_set_db_profile_applies_to_all_threads(db_path):
+    db.set_db_profile("server")
+    assert db.get_db_profile()[1]["cache_size"] == -64000
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(db.get_db_profile()))
+    t.start()
+    t.join()
+    assert seen[0][0] == "server"
+    assert seen[0][1]["busy_timeout"] == 15000
+
+    # The choice is persisted for the next start
+    db.init_db(db_path)
+    assert db.get_db_profile()[0] == "server"
+
+
+def test_env_overrides_stored_profile(db_path, monkeypatch):
+    db.set_db_profile("server")
+    monkeypatch.setenv("APP_DB_PROFILE", "bulk-load")
+    db.init_db(db_path)
+    name, values = db.get_db_profile()
+    assert name == "bulk-load"
+    assert values["synchronous"] == 0
+
+
+def test_unknown_profile_rejected():
+    with pytest.raises(ValueError):
+        db.set_db_profile("turbo")
+
+
+def test_set_config_global_overwrites():
+    db.set_config("moneda", "USD")
+    db.set_config("moneda", "EUR")
+    assert db.get_config("moneda") == "EUR"
+    cur = db._ensure_conn().execute("SELECT COUNT(*) FROM config WHERE clave = 'moneda'")
+    assert cur.fetchone()[0] == 1
@@ -0,0 +1,93 @@
+import csv
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db, export_service
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_changes_since_watermark_per_destination(tmp_path):
+    ana = db.add_cliente("Ana")
+    luis = db.add_cliente("Luis")
+    path = str(tmp_path / "c.jsonl")
+
+    summary = export_service.export_table_changes("clientes", path, "contabilidad")
+    assert summary[:3] == (2, 0, 0)
+    assert [r["row"]["nombre"] for r in _records(path)] == ["Ana", "Luis"]
+
+    summary = export_service.export_table_changes("clientes", path, "contabilidad")
+    assert summary[:3] == (0, 0, 0) and _records(path) == []
+
+    db.update_cliente(ana, telefono="600")
+    db.delete_cliente(luis)
+    eva = db.add_cliente("Eva")
+    temporal = db.add_cliente("Temporal")
+    db.delete_cliente(temporal)
+    db.update_cliente(eva, email="eva@example.com")
+    export_service.export_table_changes("clientes", path, "contabilidad")
+    records = _records(path)
+    assert [(r["op"], r["id"]) for r in records] == [
+        ("update", ana),
+        ("delete", luis),
+        ("insert", eva),
+    ]
+    assert records[0]["row"]["telefono"] == "600" and "row" not in records[1]
+    assert records[2]["row"]["email"] == "eva@example.com"
+
+    # Otro destino empieza con una exportación completa
+    summary = export_service.export_table_changes("clientes", path, "web")
+    assert summary[:3] == (2, 0, 0)
+
+
+def test_watermark_only_advances_when_committed(tmp_path):
+    db.add_cliente("Ana")
+    path = str(tmp_path / "c.csv")
+    export_service.export_table_changes("clientes", path, "erp")
+    db.add_cliente("Luis")
+    summary = export_service.export_table_changes("clientes", path, "erp", format="csv", commit=False)
+    assert summary.inserted == 1
+    with open(path, newline="", encoding="utf-8") as fh:
+        rows = list(csv.reader(fh))
+    assert rows[0][:2] == ["op", "id"] and rows[1][0] == "insert" and rows[1][2] == "Luis"
+    assert export_service.export_table_changes("clientes", path, "erp", commit=False).inserted == 1
+    db.set_export_watermark("erp", "clientes", summary.position)
+    assert export_service.export_table_changes("clientes", path, "erp").inserted == 0
+
+
+def test_rows_existing_before_the_log_are_updates():
+    cid = db.add_cliente("Ana")
+    conn = db._ensure_conn()
+    conn.execute("DELETE FROM row_changes")
+    conn.commit()
+    db.update_cliente(cid, telefono="600")
+    assert [c.op for c in db.iter_changes("clientes", 0)] == [db.CHANGE_UPDATE]
+
+
+def test_delta_export_rejects_tables_without_change_log(tmp_path):
+    with pytest.raises(ValueError):
+        export_service.export_table_changes("config", str(tmp_path / "x.jsonl"), "erp")
+
+
+def test_delta_export_leaves_the_callers_connection_alone(tmp_path):
+    db.add_cliente("Ana")
+    conn = db._ensure_conn()
+    export_service.export_table_changes("clientes", str(tmp_path / "c.jsonl"), "erp")
+    assert db.holds_connection() and db._ensure_conn() is conn
+
+    def worker():
+        export_service.export_table_changes("clientes", str(tmp_path / "w.jsonl"), "web")
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert db._pool.stats()["in_use"] == 1
+    assert db.export_watermark("web", "clientes") == db.change_log_position()
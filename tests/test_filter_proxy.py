@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from PySide6.QtCore import QCoreApplication
+
+from app.data import db
+from app.views.clientes_dialog import ClientesDialog
+from app.views.workers import thread_pool
+
+
+@pytest.fixture(autouse=True)
+def qapp():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def _settle():
+    thread_pool().waitForDone()
+    QCoreApplication.sendPostedEvents()
+
+
+def _shown(dialog, text):
+    dialog._filter_widgets[0][0].setText(text)
+    dialog._apply_filters()
+    _settle()
+    proxy = dialog.proxy
+    return sorted(proxy.data(proxy.index(row, 1)) for row in range(proxy.rowCount()))
+
+
+def test_filters_match_the_same_rows_before_and_after_full_load():
+    names = [f"Cliente {i:03d}" for i in range(300)] + ["Juan", "juana", "Ana Juan", "JUANITO", "Ángel"]
+    db.add_clientes([{"nombre": name} for name in names])
+    dialog = ClientesDialog()
+    _settle()
+    assert not dialog.model.is_complete and not dialog._filter_in_memory()
+
+    searches = ["juan", "uan", "cliente 29", "ángel"]
+    in_sql = {text: _shown(dialog, text) for text in searches}
+    assert in_sql["juan"] == ["JUANITO", "Juan", "juana"]
+
+    _shown(dialog, "")
+    while dialog.model.canFetchMore():
+        dialog.model.fetchMore()
+        _settle()
+    assert dialog._filter_in_memory()
+    assert {text: _shown(dialog, text) for text in searches} == in_sql
+    dialog.close()
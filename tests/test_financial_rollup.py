@@ -0,0 +1,123 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def _aggregate(sucursal_id=None):
+    # Cálculo de referencia sobre las tablas base
+    cur = db._ensure_conn().cursor()
+    where = "" if sucursal_id is None else f" WHERE sucursal_id = {int(sucursal_id)}"
+    cur.execute(f"SELECT strftime('%Y-%m', fecha), SUM(total) FROM facturas{where} GROUP BY 1")
+    ingresos = dict(cur.fetchall())
+    cur.execute(
+        "SELECT strftime('%Y-%m', fecha), SUM(COALESCE(costo, 0) + COALESCE(costo_mano_obra, 0)) "
+        f"FROM reparaciones{where} GROUP BY 1"
+    )
+    costos = dict(cur.fetchall())
+    return [
+        (p, ingresos.get(p, 0.0), costos.get(p, 0.0), ingresos.get(p, 0.0) - costos.get(p, 0.0))
+        for p in sorted(set(ingresos) | set(costos))
+    ]
+
+
+def _repair(did, fecha, costo, mano_obra, sucursal_id=None):
+    conn = db._ensure_conn()
+    cur = conn.execute(
+        "INSERT INTO reparaciones (dispositivo_id, fecha, costo, costo_mano_obra, sucursal_id) VALUES (?, ?, ?, ?, ?)",
+        (did, fecha, costo, mano_obra, sucursal_id),
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def test_rollup_tracks_inserts_updates_and_deletes():
+    s1 = db.add_sucursal("Centro")
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    r1 = _repair(did, "2024-01-15 10:00:00", 10.0, 5.0, s1)
+    r2 = _repair(did, "2024-02-03 09:00:00", 20.0, None)
+    _repair(did, "2024-02-20 09:00:00", 1.0, 1.0, s1)
+    conn = db._ensure_conn()
+    f1 = conn.execute(
+        "INSERT INTO facturas (reparacion_id, cliente_id, total, fecha, sucursal_id) VALUES (?, ?, ?, ?, ?)",
+        (r1, cid, 100.0, "2024-01-16 12:00:00", s1),
+    ).lastrowid
+    conn.execute(
+        "INSERT INTO facturas (reparacion_id, cliente_id, total, fecha) VALUES (?, ?, ?, ?)",
+        (r2, cid, 40.0, "2024-02-04 12:00:00"),
+    )
+    conn.commit()
+    assert db.get_financial_summary() == _aggregate()
+    assert db.get_financial_summary(s1) == _aggregate(s1)
+
+    conn.execute("UPDATE facturas SET fecha = '2024-03-01 00:00:00', total = 80 WHERE id = ?", (f1,))
+    conn.execute("UPDATE reparaciones SET costo = 12 WHERE id = ?", (r2,))
+    conn.execute("DELETE FROM reparaciones WHERE id = ?", (r1,))
+    conn.commit()
+    assert db.get_financial_summary() == _aggregate()
+    assert "2024-01" not in [row[0] for row in db.get_financial_summary()]
+
+    # ON DELETE SET NULL mueve las reparaciones restantes al grupo sin sucursal
+    conn.execute("DELETE FROM sucursales WHERE id = ?", (s1,))
+    conn.commit()
+    assert db.get_financial_summary(s1) == []
+    assert db.get_financial_summary() == _aggregate()
+
+
+def test_rebuild_restores_rollup():
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    _repair(did, "2024-05-01 10:00:00", 3.0, 2.0)
+    conn = db._ensure_conn()
+    conn.execute("DELETE FROM resumen_mensual")
+    conn.commit()
+    assert db.get_financial_summary() == []
+    assert db.rebuild_financial_rollup() == 1
+    assert db.get_financial_summary() == [("2024-05", 0.0, 5.0, -5.0)]
+
+
+def test_rollup_does_not_drift_with_repeated_updates():
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    rid = _repair(did, "2024-06-01 10:00:00", 0.1, 0.2)
+    conn = db._ensure_conn()
+    ids = [
+        conn.execute(
+            "INSERT INTO facturas (reparacion_id, cliente_id, total, fecha) VALUES (?, ?, ?, ?)",
+            (rid, cid, 0.1, "2024-06-02 10:00:00"),
+        ).lastrowid
+        for _ in range(50)
+    ]
+    for i in range(200):
+        conn.execute("UPDATE facturas SET total = ? WHERE id = ?", (0.1 + (i % 7) * 0.01, ids[i % 50]))
+        conn.execute("UPDATE reparaciones SET costo = ? WHERE id = ?", (0.1 + (i % 3) * 0.1, rid))
+    for fid in ids[:20]:
+        conn.execute("DELETE FROM facturas WHERE id = ?", (fid,))
+    conn.commit()
+    cur = conn.execute("SELECT ROUND(SUM(total), 2) FROM facturas")
+    ingresos = cur.fetchone()[0]
+    cur = conn.execute("SELECT ROUND(SUM(costo + costo_mano_obra), 2) FROM reparaciones")
+    costos = cur.fetchone()[0]
+    assert db.get_financial_summary() == [("2024-06", ingresos, costos, round(ingresos - costos, 2))]
+    before = db.get_financial_summary()
+    db.rebuild_financial_rollup()
+    assert db.get_financial_summary() == before
+
+
+def test_undated_records_keep_their_own_period():
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    _repair(did, None, 4.0, 1.0)
+    _repair(did, "sin fecha", 2.0, 0.0)
+    rid = _repair(did, "2024-07-01 10:00:00", 1.0, 0.0)
+    conn = db._ensure_conn()
+    conn.execute(
+        "INSERT INTO facturas (reparacion_id, cliente_id, total, fecha) VALUES (?, ?, ?, NULL)", (rid, cid, 9.5)
+    )
+    conn.commit()
+    expected = [(None, 9.5, 7.0, 2.5), ("2024-07", 0.0, 1.0, -1.0)]
+    assert db.get_financial_summary() == expected
+    db.rebuild_financial_rollup()
+    assert db.get_financial_summary() == expected
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def test_submitted_writes_share_batches(monkeypatch):
+    batches: list[int] = []
+    original = db.GroupCommitWriter._commit_batch
+
+    def counting(self, batch):
+        batches.append(len(batch))
+        original(self, batch)
+
+    monkeypatch.setattr(db.GroupCommitWriter, "_commit_batch", counting)
+    db.start_writer(window=0.05)
+    futures = [
+        db.submit_write(
+            "INSERT INTO auditoria (usuario, accion) VALUES (?, ?)", ("u", f"a{i}")
+        )
+        for i in range(50)
+    ]
+    ids = [f.result().lastrowid for f in futures]
+    assert len(set(ids)) == 50
+    assert sum(batches) == 50
+    assert len(batches) < 50
+
+
+def test_failed_job_does_not_discard_batch():
+    db.start_writer(window=0.05)
+    ok = db.submit_write("INSERT INTO sucursales (nombre) VALUES (?)", ("Centro",))
+    dup = db.submit_write("INSERT INTO sucursales (nombre) VALUES (?)", ("Centro",))
+    other = db.submit_write("INSERT INTO sucursales (nombre) VALUES (?)", ("Norte",))
+    assert ok.result().lastrowid
+    with pytest.raises(sqlite3.IntegrityError):
+        dup.result()
+    assert other.result().rowcount == 1
+    assert [n for _, n in db.list_sucursales()] == ["Centro", "Norte"]
+
+
+def test_mutators_from_many_threads_go_through_writer():
+    db.start_writer()
+
+    def worker(n):
+        for i in range(10):
+            db.log_audit(f"user{n}", "create", "clientes", i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(db.get_audit_logs()) == 40
+
+
+def test_notifications_are_queued_and_flushed():
+    db.start_writer()
+    for i in range(20):
+        db.log_notification("user", "sms", f"msg {i}")
+    db.flush_writes()
+    assert len(db.get_notifications("user")) == 20
+
+
+def test_failed_unwaited_write_is_logged(caplog):
+    db.start_writer()
+    with caplog.at_level("ERROR", logger=db.logger.name):
+        db.log_notification(None, "sms", "sin destinatario")
+        db.log_notification("user", "sms", "hola")
+        db.flush_writes()
+    assert [n[1] for n in db.get_notifications()] == ["user"]
+    errors = [r for r in caplog.records if r.levelname == "ERROR"]
+    assert len(errors) == 1
+    assert errors[0].exc_info[0] is sqlite3.IntegrityError
+
+
+def test_compound_mutation_runs_in_one_job():
+    db.start_writer()
+    repair_id = db.add_repair(
+        "Juan", "X", "Y", "", "", "", "", 0.0, 0.0, 0.0, 0.0, 0.0,
+        "Pendiente", "Normal", "", 0, 0, "", False, "",
+    )
+    assert repair_id is not None
+    assert db.contar_clientes() == 1
+    assert db.contar_dispositivos() == 1
+
+
+def test_stop_writer_commits_pending_writes():
+    db.start_writer(window=0.2)
+    future = db.submit_write("INSERT INTO sucursales (nombre) VALUES (?)", ("Sur",))
+    db.stop_writer()
+    assert future.done()
+    assert db.list_sucursales()[0][1] == "Sur"
@@ -27,3 +27,65 @@ def test_init_db_switches_connection(tmp_path):
         conn1.execute("SELECT 1")
 
     db.close_db()
+
+
+def test_current_schema_skips_migrations(tmp_path, monkeypatch):
+    path = str(tmp_path / "fast.db")
+    db.init_db(path)
+    assert db._ensure_conn().execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+
+    def fail(_conn):
+        raise AssertionError("schema should not be rebuilt")
+
+    monkeypatch.setattr(db, "_create_tables", fail)
+    monkeypatch.setattr(db, "migrate_if_needed", fail)
+    db.init_db(path)
+    assert db.contar_clientes() == 0
+    db.close_db()
+
+
+def test_outdated_schema_migrates_in_one_transaction(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL)")
+    conn.execute("CREATE TABLE meta (schema_version INTEGER NOT NULL)")
+    conn.execute("INSERT INTO meta VALUES (1)")
+    conn.commit()
+    conn.close()
+
+    def broken(_conn):
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(db, "migrate_if_needed", broken)
+    with pytest.raises(RuntimeError):
+        db.init_db(str(path))
+    db.close_db()
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert "usuarios" not in tables
+
+    monkeypatch.undo()
+    db.init_db(str(path))
+    cur = db._ensure_conn().cursor()
+    cur.execute("SELECT schema_version FROM meta")
+    assert cur.fetchone()[0] == db.SCHEMA_VERSION
+    cur.execute("PRAGMA table_info(clientes)")
+    assert "telefono" in [row[1] for row in cur.fetchall()]
+    db.close_db()
+
+
+def test_newer_schema_is_refused_untouched(tmp_path):
+    path = tmp_path / "newer.db"
+    db.init_db(str(path))
+    db.close_db()
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA user_version = {db.SCHEMA_VERSION + 1}")
+    conn.close()
+
+    with pytest.raises(sqlite3.DatabaseError, match="newer"):
+        db.init_db(str(path))
+    db.close_db()
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION + 1
+    conn.close()
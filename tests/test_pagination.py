@@ -0,0 +1,141 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def _all_pages(func, limit, **filters):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page = func(cursor, limit, **filters)
+        rows.extend(page.rows)
+        pages += 1
+        if page.next_cursor is None:
+            return rows, pages
+        cursor = page.next_cursor
+
+
+def test_clientes_pages_match_full_listing():
+    for i in range(25):
+        db.add_cliente(f"Cliente {i:02d}")
+    rows, pages = _all_pages(db.listar_clientes_paginado, 10)
+    assert rows == db.listar_clientes_detallado()
+    assert pages == 3
+
+
+def test_exact_multiple_has_no_empty_trailing_page():
+    for i in range(10):
+        db.add_cliente(f"C{i}")
+    page = db.listar_clientes_paginado(limit=10)
+    assert len(page.rows) == 10
+    assert page.next_cursor is None
+
+
+def test_filters_are_applied():
+    db.add_cliente("Ana")
+    db.add_cliente("Andrés")
+    db.add_cliente("Luis")
+    db.add_cliente("A_b")
+    rows, _ = _all_pages(db.listar_clientes_paginado, 1, nombre="An")
+    assert [r[1] for r in rows] == ["Ana", "Andrés"]
+    rows, _ = _all_pages(db.listar_clientes_paginado, 5, nombre="A_")
+    assert [r[1] for r in rows] == ["A_b"]
+
+    for i in range(6):
+        db.log_audit("ana" if i % 2 else "luis", "create", "clientes", i)
+    rows, _ = _all_pages(db.get_audit_logs_page, 2, usuario="ana")
+    assert rows == db.get_audit_logs("ana")
+
+
+def test_products_and_devices_pages():
+    for i in range(7):
+        db.add_product_ext(f"S{i}", f"Prod {i}", "cat" if i < 4 else None, 1, 0, 1.0, 2.0, None, None, None)
+    rows, _ = _all_pages(db.listar_productos_paginado, 3)
+    assert rows == db.listar_productos_detallado()
+    rows, _ = _all_pages(db.listar_productos_paginado, 3, categoria="cat")
+    assert len(rows) == 4
+
+    cid = db.add_cliente("Ana")
+    for i in range(5):
+        db.add_device(cid, "Marca", f"M{i}")
+    rows, _ = _all_pages(db.listar_dispositivos_paginado, 2, cliente_id=cid)
+    assert rows == db.listar_dispositivos_detallado()
+
+
+def test_invalid_cursor_rejected():
+    with pytest.raises(ValueError):
+        db.listar_garantias_paginado("not-a-cursor!")
+
+
+def test_prefix_filters_are_case_insensitive_and_indexed():
+    db.add_cliente("Ana", email="ana@example.com", telefono="600")
+    db.add_cliente("luis", email="LUIS@example.com")
+    rows, _ = _all_pages(db.listar_clientes_paginado, 5, nombre="L")
+    assert [r[1] for r in rows] == ["luis"]
+    rows, _ = _all_pages(db.listar_clientes_paginado, 5, email="luis@")
+    assert [r[1] for r in rows] == ["luis"]
+
+    db.add_product_ext("AB-1", "Pantalla", "Repuestos", 1, 0, 1.0, 2.0, None, "Acme", None)
+    db.add_product_ext("CD-2", "Batería", "Repuestos", 1, 0, 1.0, 2.0, None, "Other", None)
+    rows, _ = _all_pages(db.listar_productos_paginado, 5, sku="ab", proveedor="ac")
+    assert [r[2] for r in rows] == ["Pantalla"]
+
+    cid = db.add_cliente("Marta")
+    db.add_device(cid, "Samsung", "S21", "3561", None, None, None)
+    rows, _ = _all_pages(db.listar_dispositivos_paginado, 5, cliente="mar", imei="356")
+    assert [r[4] for r in rows] == ["S21"]
+
+
+
+def test_exact_filters_do_not_match_prefixes():
+    db.add_product_ext(None, "A", "Pantalla", 1, 0, 1.0, 2.0, None, None, None)
+    db.add_product_ext(None, "B", "Pantallas OLED", 1, 0, 1.0, 2.0, None, None, None)
+    rows, _ = _all_pages(db.listar_productos_paginado, 5, categoria="Pantalla")
+    assert [r[2] for r in rows] == ["A"]
+    rows, _ = _all_pages(db.listar_productos_paginado, 5, categoria_prefix="pantalla")
+    assert [r[2] for r in rows] == ["A", "B"]
+
+    cid = db.add_cliente("Ana")
+    db.add_device(cid, "Sam", "X")
+    db.add_device(cid, "Samsung", "Y")
+    rows, _ = _all_pages(db.listar_dispositivos_paginado, 5, marca="Sam")
+    assert [r[4] for r in rows] == ["X"]
+    rows, _ = _all_pages(db.listar_dispositivos_paginado, 5, marca_prefix="sam")
+    assert [r[4] for r in rows] == ["X", "Y"]
+
+
+def test_prefix_pages_follow_column_order_and_seek_the_index():
+    names = ["Zoe", "ana", "Ana", "Bea", "andrés", "ANA", "alba", "Al_x", "Alz"]
+    for i, nombre in enumerate(names):
+        db.add_product_ext(f"S{i}", nombre, None, 1, 0, 1.0, 2.0, None, None, None)
+    rows, pages = _all_pages(db.listar_productos_paginado, 2, nombre="a")
+    assert pages == 4
+    assert [r[2] for r in rows] == ["Al_x", "alba", "Alz", "ana", "Ana", "ANA", "andrés"]
+    rows, _ = _all_pages(db.listar_productos_paginado, 2, nombre="al_")
+    assert [r[2] for r in rows] == ["Al_x"]
+
+    first = db.listar_productos_paginado(None, 2, nombre="a")
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    db.listar_productos_paginado(first.next_cursor, 2, nombre="a", proveedor="x")
+    conn.set_trace_callback(None)
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statements[-1]}")]
+    assert any("idx_inventario_nombre_nocase" in step for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+    with pytest.raises(ValueError):
+        db.listar_productos_paginado(db._encode_cursor(5), 2, nombre="a")
+
+
+def test_detail_getters_match_listing_rows():
+    cid = db.add_cliente("Ana", telefono="600")
+    did = db.add_device(cid, "Samsung", "S21", "3561", None, None, None)
+    pid = db.add_product_ext("AB-1", "Pantalla", "Repuestos", 3, 1, 1.0, 2.0, None, "Acme", None)
+    assert db.get_cliente_detallado(cid) == db.listar_clientes_paginado().rows[0]
+    assert db.get_dispositivo_detallado(did) == db.listar_dispositivos_paginado().rows[0]
+    assert db.get_producto_detallado(pid) == db.listar_productos_paginado().rows[0]
+    assert db.get_cliente_detallado(9999) is None
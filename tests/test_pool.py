@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+@pytest.fixture
+def db_options():
+    return {"pool_size": 3}
+
+
+def _in_thread(func):
+    result: dict[str, object] = {}
+
+    def run():
+        try:
+            result["value"] = func()
+        except Exception as exc:  # pragma: no cover - reported below
+            result["error"] = exc
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    if "error" in result:
+        raise result["error"]  # type: ignore[misc]
+    return result.get("value")
+
+
+def test_each_thread_gets_its_own_connection():
+    main_conn = db._ensure_conn()
+    assert db._ensure_conn() is main_conn
+    other = _in_thread(db._ensure_conn)
+    assert other is not main_conn
+
+
+def test_threads_read_concurrently():
+    db.add_cliente("Ana")
+    barrier = threading.Barrier(3)
+    results = []
+
+    def reader():
+        barrier.wait()
+        results.append(db.contar_clientes())
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [1, 1, 1]
+
+
+def test_connections_of_finished_threads_are_reused():
+    for _ in range(10):
+        assert _in_thread(db.contar_clientes) == 0
+    assert db._pool.stats()["in_use"] <= 3
+
+
+def test_release_returns_connection_to_pool():
+    def work():
+        db.contar_clientes()
+        db.release_conn()
+
+    _in_thread(work)
+    assert db._pool.stats()["idle"] == 1
+
+
+def test_pool_exhausted_raises(monkeypatch):
+    monkeypatch.setattr(db._pool, "timeout", 0.1)
+    hold = threading.Event()
+    ready = threading.Barrier(3)
+
+    def holder():
+        db._ensure_conn()
+        ready.wait()
+        hold.wait()
+
+    threads = [threading.Thread(target=holder) for _ in range(2)]
+    for t in threads:
+        t.start()
+    db._ensure_conn()
+    ready.wait()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            _in_thread(db._ensure_conn)
+    finally:
+        hold.set()
+        for t in threads:
+            t.join()
+
+
+def test_close_db_closes_connections_from_all_threads():
+    other = _in_thread(db._ensure_conn)
+    db.close_db()
+    with pytest.raises(sqlite3.ProgrammingError):
+        other.execute("SELECT 1")
+
+
+def test_memory_database_is_shared_between_threads():
+    db.init_db(":memory:")
+    db.add_cliente("Ana")
+    assert _in_thread(db.contar_clientes) == 1
+
+
+def test_released_connections_keep_their_pragmas(monkeypatch):
+    def work():
+        db.contar_clientes()
+        db.release_conn()
+
+    _in_thread(work)  # abre la conexión que reutilizan los siguientes hilos
+    applied = []
+    apply = db._apply_pragmas
+    monkeypatch.setattr(
+        db, "_apply_pragmas", lambda conn, profile=None: applied.append(profile) or apply(conn, profile)
+    )
+    for _ in range(5):
+        _in_thread(work)
+    assert applied == []
+    db._pool.set_profile("server")
+    for _ in range(5):
+        _in_thread(work)
+    assert applied == ["server"]
@@ -0,0 +1,51 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+# Consultas frecuentes que deben resolverse con índices
+HOT_QUERIES = {
+    "recent_repairs": lambda: db.get_recent_repairs(),
+    "device_by_serial": lambda: db.find_device_by_serial("SN-1"),
+    "ticket_timeline": lambda: db.get_ticket_timeline(1),
+    "client_debt": lambda: db.deuda_cliente(1),
+    "audit_by_user": lambda: db.get_audit_logs("ana"),
+    "notifications_by_recipient": lambda: db.get_notifications("ana@example.com"),
+    "tasks_by_date": lambda: db.get_tasks_by_date("2024-01-01"),
+    "tasks_by_month": lambda: db.get_tasks_by_range("2024-01-01", "2024-02-01"),
+    "part_by_name_and_branch": lambda: db.transfer_repuesto("Pantalla", 1, 2, 1),
+}
+
+FULL_SCAN = re.compile(r"^SCAN \w+$")
+
+
+def _traced_selects(func):
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(name):
+    selects = _traced_selects(HOT_QUERIES[name])
+    assert selects
+    conn = db._ensure_conn()
+    for sql in selects:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        bad = [step for step in plan if FULL_SCAN.match(step) or "USE TEMP B-TREE" in step]
+        assert not bad, f"{name}: {sql}\n{plan}"
+
+
+def test_migration_creates_indexes():
+    cur = db._ensure_conn().execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    names = {row[0] for row in cur.fetchall()}
+    assert {"idx_reparaciones_fecha", "idx_pagos_factura", "idx_repuestos_nombre_sucursal"} <= names
@@ -1,6 +1,7 @@
 import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pytest
@@ -123,3 +124,42 @@ def test_schedule_periodic_report(tmp_path):
     timer.cancel()
     # Expect at least one file created
     assert any(out_dir.iterdir())
+
+
+def _chart_rows(n):
+    return [(f"2024-{m:02d}", 100.0 * m + n, 60.0 * m, 40.0 * m + n) for m in range(1, 7)]
+
+
+def test_chart_cache_renders_each_summary_once(monkeypatch):
+    report_service.clear_chart_cache()
+    draws = []
+    draw = report_service._draw_financial_chart
+    monkeypatch.setattr(
+        report_service, "_draw_financial_chart", lambda rows: draws.append(rows) or draw(rows)
+    )
+    first = report_service.render_financial_chart(_chart_rows(0))
+    assert first.startswith(b"\x89PNG")
+    assert report_service.render_financial_chart(iter(_chart_rows(0))) is first
+    report_service.render_financial_chart(_chart_rows(1))
+    # Solo cuentan los gráficos de esta prueba; el temporizador de otra puede seguir dibujando
+    own = [_chart_rows(0), _chart_rows(1)]
+    assert [rows for rows in draws if rows in own] == own
+
+
+def test_chart_cache_evicts_least_recently_used():
+    cache = report_service._ChartCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    cache.put("d", b"x" * 20)  # mayor que el límite: se queda solo
+    assert len(cache) == 1 and cache.get("d")
+
+
+def test_charts_render_concurrently():
+    report_service.clear_chart_cache()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pngs = list(pool.map(report_service.render_financial_chart, [_chart_rows(i) for i in range(8)]))
+    assert all(png.startswith(b"\x89PNG") for png in pngs)
+    assert len(set(pngs)) == 8
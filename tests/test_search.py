@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def test_search_finds_all_kinds():
+    cid = db.add_cliente("José Pérez", telefono="555123", email="jose@example.com")
+    db.add_device(cid, "Apple", "iPhone 12", imei="35693803")
+    db.create_ticket("José Pérez", "iPhone", "Pantalla rota")
+    db.add_repair(
+        "Ana", "Samsung", "S21", "Pantalla rota", "Cambio de display", "", "",
+        0.0, 0.0, 0.0, 0.0, 0.0, "Pendiente", "Normal", "", 0, 0, "", False, "",
+    )
+    kinds = {kind for kind, *_ in db.search("perez")}
+    assert kinds == {"clientes", "tickets"}
+    assert db.search("iph", kinds=["dispositivos"])[0][2] == "Apple iPhone 12"
+    assert {k for k, *_ in db.search("pantalla")} == {"tickets", "reparaciones"}
+    assert db.search("3569")[0][:2] == ("dispositivos", 1)
+
+
+def test_index_follows_updates_and_deletes():
+    cid = db.add_cliente("Laura")
+    db.update_cliente(cid, nombre="Lucía")
+    assert db.search("laura") == []
+    assert db.search("lucia")[0][1] == cid
+    db.delete_cliente(cid)
+    assert db.search("lucia") == []
+
+
+def test_search_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        db.search("x", kinds=["facturas"])
+
+
+def test_backfill_on_migration(db_path):
+    db.add_cliente("Marta")
+    conn = db._ensure_conn()
+    conn.execute("DROP TABLE search_index")
+    conn.execute("UPDATE meta SET schema_version = 15")
+    conn.execute("PRAGMA user_version = 15")
+    conn.commit()
+    db.init_db(db_path)
+    assert db.search("marta")[0][:2] == ("clientes", 1)
+
+
+def test_search_tickets_uses_column_filters():
+    t1 = db.create_ticket("Samsung Store", "iPhone", "")
+    t2 = db.create_ticket("Ana", "Samsung", "")
+    assert {t[0] for t in db.search_tickets(dispositivo="Samsung")} == {t2}
+    assert {t[0] for t in db.search_tickets(cliente="samsung")} == {t1}
+
+
+def test_search_tickets_matches_substrings_with_and_without_index(monkeypatch):
+    ids = [
+        db.create_ticket(cliente, dispositivo, "")
+        for cliente, dispositivo in [("Juan Pérez", "iPhone 12"), ("Ana", "Galaxy S9"), ("JUANA", "Moto G")]
+    ]
+    cases = [("uan", None), ("UAN", "phone"), (None, "s9"), ("a", None), ("PÉREZ", None), ("zz", None)]
+    indexed = [{t[0] for t in db.search_tickets(c, d)} for c, d in cases]
+    assert indexed[:3] == [{ids[0], ids[2]}, {ids[0]}, {ids[1]}]
+    assert indexed[4:] == [set(), set()]  # LIKE distingue mayúsculas fuera de ASCII, como antes
+
+    conn = db._ensure_conn()
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    db.search_tickets(cliente="uan")
+    conn.set_trace_callback(None)
+    sql = next(s for s in statements if "FROM tickets" in s)
+    plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "search_index_tickets VIRTUAL TABLE" in plan and "SCAN tickets" not in plan
+
+    monkeypatch.setattr(db, "_has_search_index", lambda name="search_index": False)
+    assert [{t[0] for t in db.search_tickets(c, d)} for c, d in cases] == indexed
+
+
+def test_ticket_trigrams_follow_changes_and_backfill(db_path):
+    tid = db.create_ticket("Marta", "Nokia", "")
+    conn = db._ensure_conn()
+    conn.execute("UPDATE tickets SET cliente = 'Lucía' WHERE id = ?", (tid,))
+    conn.commit()
+    assert db.search_tickets(cliente="art") == []
+    assert db.search_tickets(cliente="ucí")[0][0] == tid
+
+    conn.execute("DROP TABLE search_index_tickets")
+    conn.execute("UPDATE meta SET schema_version = 22")
+    conn.execute("PRAGMA user_version = 22")
+    conn.commit()
+    db.init_db(db_path)
+    assert db._has_search_index("search_index_tickets")
+    assert db.search_tickets(dispositivo="oki")[0][0] == tid
+    conn = db._ensure_conn()
+    conn.execute("DELETE FROM tickets WHERE id = ?", (tid,))
+    conn.commit()
+    assert db.search_tickets(dispositivo="oki") == []
@@ -0,0 +1,68 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db, export_service
+
+
+def test_iter_table_yields_every_row():
+    for i in range(25):
+        db.add_repuesto(f"R{i}", i, None, 1.0)
+    rows = db.iter_table("repuestos", chunk_size=4)
+    assert isinstance(rows, types.GeneratorType)
+    assert [r[1] for r in rows] == [f"R{i}" for i in range(25)]
+    assert db.table_columns("repuestos")[:3] == ["id", "nombre", "stock"]
+
+
+def test_iter_table_rejects_unknown_table():
+    with pytest.raises(ValueError):
+        db.iter_table("clientes; DROP TABLE clientes")
+
+
+def test_iter_reparaciones_filters_by_sucursal():
+    s1 = db.add_sucursal("Centro")
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    conn = db._ensure_conn()
+    conn.execute("INSERT INTO reparaciones (dispositivo_id, sucursal_id) VALUES (?, ?)", (did, s1))
+    conn.execute("INSERT INTO reparaciones (dispositivo_id) VALUES (?)", (did,))
+    conn.commit()
+    assert len(list(db.iter_reparaciones(chunk_size=1))) == 2
+    assert len(list(db.iter_reparaciones(s1))) == 1
+
+
+def test_excel_export_splits_sheets_and_types_dates(tmp_path, monkeypatch):
+    from openpyxl import load_workbook
+
+    monkeypatch.setattr(export_service, "EXCEL_MAX_ROWS", 3)
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    conn = db._ensure_conn()
+    for i in range(5):
+        conn.execute(
+            "INSERT INTO reparaciones (dispositivo_id, fecha, total) VALUES (?, ?, ?)",
+            (did, f"2024-01-0{i + 1} 10:00:00", i * 1.5),
+        )
+    conn.commit()
+    path = tmp_path / "rep.xlsx"
+    export_service.export_table_to_excel("reparaciones", str(path))
+    wb = load_workbook(path, read_only=True)
+    assert wb.sheetnames == ["reparaciones", "reparaciones_2", "reparaciones_3"]
+    sheets = [list(ws.values) for ws in wb.worksheets]
+    assert [len(rows) for rows in sheets] == [3, 3, 2]
+    headers = db.table_columns("reparaciones")
+    assert all(rows[0] == tuple(headers) for rows in sheets)
+    first = dict(zip(headers, sheets[0][1]))
+    assert first["fecha"].year == 2024 and first["total"] == 0
+    assert dict(zip(headers, sheets[2][1]))["total"] == 6.0
+
+
+def test_excel_export_of_empty_table_keeps_header(tmp_path):
+    from openpyxl import load_workbook
+
+    path = tmp_path / "empty.xlsx"
+    export_service.export_table_to_excel("clientes", str(path))
+    assert list(load_workbook(path).active.values) == [tuple(db.table_columns("clientes"))]
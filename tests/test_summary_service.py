@@ -33,3 +33,50 @@ def test_get_counts_handles_exceptions(monkeypatch):
     monkeypatch.setattr(summary_service, "db", fake_db)
 
     assert summary_service.get_counts() == (0, 2, 0, 4)
+
+
+@pytest.fixture
+def real_db(tmp_path):
+    from app.data import db
+
+    db.init_db(str(tmp_path / "summary.db"))
+    summary_service.invalidate_counts()
+    yield db
+    db.close_db()
+
+
+def test_get_counts_single_query_and_cache(real_db):
+    db = real_db
+    s1 = db.add_sucursal("Centro")
+    cid = db.add_client("Juan")
+    did = db.add_device(cid, "M", "X")
+    db.add_device(cid, "M", "Y")
+    conn = db._ensure_conn()
+    conn.execute("INSERT INTO reparaciones (dispositivo_id, sucursal_id) VALUES (?, ?)", (did, s1))
+    conn.execute("INSERT INTO reparaciones (dispositivo_id, sucursal_id) VALUES (?, ?)", (did, s1))
+    conn.commit()
+
+    assert summary_service.get_counts() == (1, 2, 0, 2)
+    assert summary_service.get_counts(s1) == (
+        db.contar_clientes(s1),
+        db.contar_dispositivos(s1),
+        db.contar_productos(s1),
+        db.contar_reparaciones_pendientes(s1),
+    ) == (1, 1, 0, 2)
+
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    summary_service.get_counts()
+    conn.set_trace_callback(None)
+    assert not any("COUNT" in s for s in statements)
+
+    db.add_client("Ana")
+    assert summary_service.get_counts()[0] == 2
+
+    # Cambios confirmados desde otra conexión también invalidan la caché
+    import threading
+
+    t = threading.Thread(target=lambda: db.add_client("Luis"))
+    t.start()
+    t.join()
+    assert summary_service.get_counts()[0] == 3
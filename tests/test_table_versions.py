@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def test_versions_bump_per_table():
+    before = db.table_versions()
+    cid = db.add_client("Juan")
+    assert db.table_version("clientes") == before["clientes"] + 1
+    assert db.table_version("inventario") == before["inventario"]
+    db.update_cliente(cid, nombre="Juan P.")
+    db.delete_cliente(cid)
+    assert db.table_version("clientes") == before["clientes"] + 3
+    with pytest.raises(ValueError):
+        db.table_version("meta")
+
+
+def test_external_connection_changes_are_seen(db_path):
+    version = db.table_version("inventario")
+    other = sqlite3.connect(db_path)
+    other.execute("INSERT INTO inventario (nombre, cantidad) VALUES ('x', 1)")
+    other.commit()
+    other.close()
+    assert db.table_version("inventario") == version + 1
+
+
+def test_subscribers_are_notified_once():
+    seen = []
+    unsubscribe = db.subscribe(seen.append, tables=["clientes"])
+    try:
+        db.add_client("Ana")
+        db.add_sucursal("Centro")
+        assert seen == [{"clientes": db.table_version("clientes")}]
+
+        t = threading.Thread(target=lambda: db.add_client("Luis"))
+        t.start()
+        t.join()
+        assert len(seen) == 2
+        assert db.check_for_changes() == {}
+    finally:
+        unsubscribe()
+    db.add_client("Eva")
+    assert len(seen) == 2
+
+
+def test_subscriber_errors_do_not_break_writes():
+    def boom(_changes):
+        raise RuntimeError("boom")
+
+    unsubscribe = db.subscribe(boom)
+    try:
+        assert db.add_client("Ana") is not None
+    finally:
+        unsubscribe()
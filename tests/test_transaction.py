@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.data import db
+
+
+def _count_commits(conn):
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_transaction_commits_once():
+    conn = db._ensure_conn()
+    statements = _count_commits(conn)
+    with db.transaction():
+        cid = db.add_cliente("Ana")
+        db.add_device(cid, "M", "X")
+        db.log_audit("admin", "create", "clientes", cid)
+    conn.set_trace_callback(None)
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 1
+    assert db.contar_clientes() == 1
+    assert db.contar_dispositivos() == 1
+
+
+def test_add_repair_commits_once():
+    conn = db._ensure_conn()
+    statements = _count_commits(conn)
+    db.add_repair(
+        "Juan", "X", "Y", "", "", "", "", 0.0, 0.0, 0.0, 0.0, 0.0,
+        "Pendiente", "Normal", "", 0, 0, "", False, "",
+    )
+    conn.set_trace_callback(None)
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 1
+
+
+def test_transaction_rolls_back_on_error():
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            cid = db.add_cliente("Ana")
+            db.add_device(cid, "M", "X")
+            raise RuntimeError("boom")
+    assert db.contar_clientes() == 0
+    assert db.contar_dispositivos() == 0
+
+
+def test_nested_transaction_uses_savepoint():
+    with db.transaction():
+        db.add_cliente("Ana")
+        with pytest.raises(ValueError):
+            with db.transaction():
+                db.add_cliente("Luis")
+                raise ValueError("inner")
+    assert [n for _, n in db.listar_clientes()] == ["Ana"]
+
+
+def test_failed_nested_write_is_undone():
+    def compound(conn):
+        conn.execute("INSERT INTO clientes (nombre) VALUES ('Parcial')")
+        raise ValueError("fallo a mitad")
+
+    with db.transaction():
+        db.add_cliente("Ana")
+        with pytest.raises(ValueError):
+            db._run_write(compound)
+        db.add_cliente("Luis")
+    nombres = [r[1] for r in db.listar_clientes_paginado().rows]
+    assert nombres == ["Ana", "Luis"]
@@ -49,3 +49,16 @@ def test_warranty_and_returns(tmp_path):
     assert garantias[0][2] == "fallo pantalla"
     assert devoluciones[0][2] == "defecto"
     db.close_db()
+
+
+def test_portal_rejects_malformed_cursor(tmp_path):
+    from app.portal import app
+
+    db.init_db(str(tmp_path / "test.db"))
+    client = app.test_client()
+    for url in ("/api/warranties?cursor=not-a-cursor!", "/api/returns?cursor=%%%"):
+        resp = client.get(url)
+        assert resp.status_code == 400
+        assert resp.get_json()["error"] == "Invalid page cursor"
+    assert client.get("/api/warranties?limit=5").status_code == 200
+    db.close_db()
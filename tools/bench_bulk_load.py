@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Measure the throughput of the bulk insert/upsert APIs.
+
+Each case loads the requested number of rows into a fresh temporary database
+through ``add_clientes``, ``add_devices``, ``add_products_ext`` or
+``add_repuestos`` (all of them ``db._bulk_load`` in one transaction) and
+reports rows per second. The upsert cases load the same rows a second time
+so every row hits an existing key. The exit status is non-zero if any case
+stays under ``--target``.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _clientes(db, rows: int) -> list:
+    return [
+        {"nombre": f"Cliente {i}", "telefono": f"6{i:08d}", "email": f"c{i}@example.com"} for i in range(rows)
+    ]
+
+
+def _dispositivos(db, rows: int) -> list:
+    cid = db.add_cliente("Benchmark")
+    return [
+        {"cliente_id": cid, "marca": "Marca", "modelo": f"Modelo {i}", "imei": f"35{i:013d}"}
+        for i in range(rows)
+    ]
+
+
+def _productos(db, rows: int) -> list:
+    return [
+        {"sku": f"SKU-{i:07d}", "nombre": f"Producto {i}", "categoria": "Pantallas", "cantidad": i % 50, "precio": 9.5}
+        for i in range(rows)
+    ]
+
+
+def _repuestos(db, rows: int) -> list:
+    return [{"nombre": f"Repuesto {i}", "stock": i % 20, "precio": 3.25} for i in range(rows)]
+
+
+# nombre -> (generador de filas, función bulk, upsert)
+CASES = {
+    "clientes": (_clientes, "add_clientes", False),
+    "clientes-upsert": (_clientes, "add_clientes", True),
+    "dispositivos": (_dispositivos, "add_devices", None),
+    "productos": (_productos, "add_products_ext", False),
+    "productos-upsert": (_productos, "add_products_ext", True),
+    "repuestos": (_repuestos, "add_repuestos", False),
+}
+
+
+def _run(db, name: str, rows: int) -> float:
+    make_rows, func_name, upsert = CASES[name]
+    func = getattr(db, func_name)
+    data = make_rows(db, rows)
+    kwargs = {} if upsert is None else {"upsert": upsert}
+    if upsert:
+        func(data)
+    start = time.perf_counter()
+    results = func(data, **kwargs)
+    elapsed = time.perf_counter() - start
+    rejected = sum(1 for r in results if r.status == "rejected")
+    if rejected:
+        raise RuntimeError(f"{name}: {rejected} rows rejected")
+    return rows / elapsed
+
+
+def main() -> int:
+    from app.data import db
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000, help="rows per case (default: %(default)s)")
+    parser.add_argument("--target", type=float, default=50_000, help="minimum rows/s (default: %(default)s)")
+    parser.add_argument("cases", nargs="*", metavar="case", help=f"cases to run: {', '.join(CASES)} (default: all)")
+    args = parser.parse_args()
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case: {', '.join(unknown)}")
+
+    slow = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.cases or CASES:
+            db.init_db(os.path.join(tmp, f"bench_{name}.db"))
+            try:
+                rate = _run(db, name, args.rows)
+            finally:
+                db.close_db()
+            mark = "" if rate >= args.target else "  < objetivo"
+            print(f"{name:>17}: {args.rows} filas, {rate:9,.0f} filas/s{mark}")
+            if rate < args.target:
+                slow.append(name)
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Measure time and peak memory of the Excel export of ``reparaciones``.
+
+Each requested row count runs in a fresh subprocess so no size inherits the
+allocations of the previous one. Inside it a temporary database is filled and
+exported twice with ``export_service.export_table_to_excel``: once untraced
+for the wall time and once under ``tracemalloc`` for the peak of Python
+memory allocated by the export itself. That peak should stay flat whatever
+the row count.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _fill(db, rows: int) -> None:
+    cid = db.add_client("Benchmark")
+    did = db.add_device(cid, "Marca", "Modelo")
+    conn = db._ensure_conn()
+    conn.execute(
+        """
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO reparaciones (dispositivo_id, descripcion, costo, total, estado)
+        SELECT ?, 'Cambio de pantalla ' || i, i % 100, i % 250 + 0.5, 'Entregado' FROM n
+        """,
+        (rows, did),
+    )
+    conn.commit()
+
+
+def _measure(rows: int) -> None:
+    """Fill, export and print one result line (runs in the child process)."""
+    from app.data import db, export_service
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.init_db(os.path.join(tmp, "bench.db"))
+        try:
+            _fill(db, rows)
+            path = os.path.join(tmp, "reparaciones.xlsx")
+            start = time.perf_counter()
+            export_service.export_table_to_excel("reparaciones", path)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+
+            # segunda pasada solo para medir memoria: tracemalloc ralentiza la exportación
+            tracemalloc.start()
+            try:
+                export_service.export_table_to_excel("reparaciones", path)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        finally:
+            db.close_db()
+    print(f"{rows:>9} filas: {elapsed:6.1f} s, pico {peak / 2**20:6.1f} MiB, archivo {size / 2**20:6.1f} MiB")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[50_000, 300_000], help="row counts (default: %(default)s)"
+    )
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        _measure(args.child)
+        return 0
+    for rows in args.rows:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(rows)])
+        if proc.returncode:
+            return proc.returncode
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Export every data table into one compressed archive with a manifest."""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main() -> int:
+    from app.data import db, export_service
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("archive", help="output file, e.g. backup.tar.gz")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--format", choices=export_service.EXPORT_FORMATS, default="csv")
+    parser.add_argument(
+        "--compression",
+        choices=[c for c in export_service.ARCHIVE_COMPRESSIONS if c] + ["none"],
+        default="gzip",
+    )
+    parser.add_argument("--tables", nargs="+", help="tables to export (default: all)")
+    args = parser.parse_args()
+
+    db.init_db(args.db)
+    try:
+        manifest = export_service.export_all(
+            args.archive,
+            args.format,
+            None if args.compression == "none" else args.compression,
+            tables=args.tables,
+        )
+    finally:
+        db.close_db()
+    for table, entry in manifest["tables"].items():
+        print(f"{table}: {entry['rows']} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Export the rows changed since the last run for one destination.
+
+Writes ``<table>.<format>`` change files into the output directory and
+advances the destination's watermark of each table.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main() -> int:
+    from app.data import db, export_service
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("destination", help="name of the receiving system, e.g. contabilidad")
+    parser.add_argument("output_dir")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--format", choices=export_service.EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--tables", nargs="+", default=list(db.DELTA_TABLES), choices=db.DELTA_TABLES)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    db.init_db(args.db)
+    try:
+        for table in args.tables:
+            path = os.path.join(args.output_dir, f"{table}.{args.format}")
+            summary = export_service.export_table_changes(table, path, args.destination, format=args.format)
+            print(f"{table}: {summary.inserted} altas, {summary.updated} cambios, {summary.deleted} bajas")
+    finally:
+        db.close_db()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Report full table scans and temporary B-trees in the queries of db.py.
+
+Every literal SQL statement passed to ``execute``/``executemany`` (or to the
+write helpers) in ``app/data/db.py`` is run through ``EXPLAIN QUERY PLAN``
+against a freshly migrated database. Statements built with f-strings are
+skipped.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import os
+import re
+import sqlite3
+import sys
+from typing import Iterator, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DB_SOURCE = os.path.join(ROOT, "app", "data", "db.py")
+SQL_CALLS = {"execute", "executemany", "_execute_write", "_statement", "submit_write", "_iter_query"}
+ANALYZED = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def collect_statements(path: str = DB_SOURCE) -> Iterator[Tuple[str, int, str]]:
+    """Yield ``(function, line, sql)`` for each literal statement in ``path``."""
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), path)
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        for node in ast.walk(func):
+            if not isinstance(node, ast.Call) or not node.args:
+                continue
+            target = node.func
+            name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", "")
+            first = node.args[0]
+            if name in SQL_CALLS and isinstance(first, ast.Constant) and isinstance(first.value, str):
+                sql = " ".join(first.value.split())
+                if sql.upper().startswith(ANALYZED):
+                    yield func.name, node.lineno, sql
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Return the detail column of ``EXPLAIN QUERY PLAN`` for ``sql``."""
+    named = re.findall(r"[:@$](\w+)", sql)
+    params = dict.fromkeys(named) if named else [None] * sql.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def problems(plan: List[str]) -> List[str]:
+    """Return the plan steps that read a whole table or sort in a temp B-tree."""
+    found = []
+    for step in plan:
+        if FULL_SCAN.match(step) or "USE TEMP B-TREE" in step:
+            found.append(step)
+    return found
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=":memory:", help="database to analyse (default: fresh schema)")
+    parser.add_argument("--all", action="store_true", help="also list statements without issues")
+    args = parser.parse_args(argv)
+
+    from app.data import db
+
+    db.init_db(args.db)
+    conn = db._ensure_conn()
+    flagged = 0
+    total = 0
+    seen = set()
+    for func, line, sql in collect_statements():
+        if sql in seen:
+            continue
+        seen.add(sql)
+        total += 1
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as exc:
+            print(f"{func}:{line}: cannot explain ({exc})")
+            continue
+        issues = problems(plan)
+        if issues:
+            flagged += 1
+        if issues or args.all:
+            print(f"{func} (db.py:{line})")
+            print(f"  {sql}")
+            for step in plan:
+                marker = "!!" if step in issues else "  "
+                print(f"  {marker} {step}")
+    db.close_db()
+    print(f"{total} statements analysed, {flagged} with full scans or temp B-trees.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""Recompute the monthly financial rollup (``resumen_mensual``)."""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main() -> int:
+    from app.data import db
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args()
+
+    db.init_db(args.db)
+    try:
+        rows = db.rebuild_financial_rollup()
+    finally:
+        db.close_db()
+    print(f"resumen_mensual: {rows} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())